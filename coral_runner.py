@@ -6,11 +6,14 @@ from coralai.substrate.substrate import Substrate
 from coralai.evolution.ecosystem import Ecosystem
 from coralai.evolution.hyper_organism import HyperOrganism
 from coralai.substrate.visualization import Visualization
+from coralai.substrate.render_scheduler import RenderScheduler
+from coralai.substrate.telemetry import Telemetry
 
 class CoralVis(Visualization):
     def __init__(self, substrate, ecosystem, vis_chs):
         super().__init__(substrate, vis_chs)
         self.ecosystem = ecosystem
+        self.telemetry = Telemetry(substrate, ["energy", "infra", "genome"])
 
     def render_opt_window(self):
         inds = self.substrate.ti_indices[None]
@@ -20,17 +23,20 @@ class CoralVis(Visualization):
         with self.gui.sub_window("Options", 0.05, 0.05, opt_w, opt_h) as sub_w:
             self.opt_window(sub_w)
             current_pos = self.window.get_cursor_pos()
-            pos_x = int(current_pos[0] * self.w) % self.w
-            pos_y = int(current_pos[1] * self.h) % self.h
+            self.telemetry.set_probe(*self.screen_to_cell(current_pos))
+            stats = self.telemetry.latest()
+            if not stats:
+                return
+            pos_x, pos_y = stats["probe_xy"]
             sub_w.text(f"Stats at ({pos_x}, {pos_y}):")
             sub_w.text(
-                f"Energy: {self.substrate.mem[0, inds.energy, pos_x, pos_y]:.2f}," +
-                f"Infra: {self.substrate.mem[0, inds.infra, pos_x, pos_y]:.2f}," +
-                f"Genome: {self.substrate.mem[0, inds.genome, pos_x, pos_y]:.2f}, " 
+                f"Energy: {stats['probe']['energy']:.2f}," +
+                f"Infra: {stats['probe']['infra']:.2f}," +
+                f"Genome: {stats['probe']['genome']:.2f}, " 
                 # f"Acts: {self.substrate.mem[0, inds.acts, pos_x, pos_y]}"
             )
             sub_w.text(f"Total Energy added: {self.ecosystem.total_energy_added}")
-            sub_w.text(f"Total Energy: {torch.sum(self.substrate.mem[0, inds.energy])}")
+            sub_w.text(f"Total Energy: {stats['total']['energy']}")
             sub_w.text(f"Population:")
             for genome_key in self.ecosystem.population.keys():
                 sub_w.text(f"{genome_key}: {self.ecosystem.population[genome_key]['infra']}")
@@ -67,12 +73,17 @@ def main(config_filename, channels, shape, kernel, sense_chs, act_chs, torch_dev
 
     ecosystem = Ecosystem(substrate, _create_organism, _apply_physics, min_size = 1, max_size=1)
     vis = CoralVis(substrate, ecosystem, ['energy', "infra", "genome"])
+    render_scheduler = RenderScheduler(vis, target_fps=30)
 
+    timestep = 0
     while vis.window.running:
         # substrate.mem[0, inds.com] += torch.randn_like(substrate.mem[0, inds.com]) * 0.1
-        if ecosystem.time_step % 10 == 0:
-            vis.update()
         ecosystem.update()
+        # Only the drawn frames read telemetry, so reduce the stats just before a frame is published
+        if render_scheduler.frame_due():
+            vis.telemetry.record(timestep)
+        render_scheduler.publish()
+        timestep += 1
         # ecosystem.update_population_infra_sum()
 
 if __name__ == "__main__":
@@ -32,8 +32,7 @@ class CoralVis(Visualization):
                 f"B: {self.substrate.index_to_chname(self.chinds[2])}", 
                 self.chinds[2], 0, self.substrate.mem.shape[1]-1)
             current_pos = self.window.get_cursor_pos()
-            pos_x = int(current_pos[0] * self.w) % self.w
-            pos_y = int(current_pos[1] * self.h) % self.h
+            pos_x, pos_y = self.screen_to_cell(current_pos)
             sub_w.text(
                 f"GENOME: {self.substrate.mem[0, inds.genome, pos_x, pos_y]:.2f}\n" +
                 f"Energy: {self.substrate.mem[0, inds.energy, pos_x, pos_y]:.2f}\n" +
@@ -93,7 +92,7 @@ if __name__ == "__main__":
             "acts": ti.types.struct(
                 invest=ti.f32,
                 liquidate=ti.f32,
-                explore=ti.types.vector(n=5, dtype=ti.f32) # must equal length of kernel
+                explore=ti.types.vector(n=4, dtype=ti.f32) # no, forward, left, right
             ),
             "com": ti.types.struct(
                 a=ti.f32,
@@ -101,6 +100,7 @@ if __name__ == "__main__":
                 c=ti.f32,
                 d=ti.f32
             ),
+            "rot": ti.f32,
             "genome": ti.f32,
         },
         shape = (200, 200),
@@ -5,6 +5,9 @@ import taichi as ti
 from coralai.substrate.substrate import Substrate
 from coralai.evolution.space_evolver import SpaceEvolver
 from coralai.substrate.visualization import Visualization
+from coralai.substrate.genome_palette import GenomePalette
+from coralai.substrate.telemetry import Telemetry
+from coralai.utils.taichi_cache import init_taichi
 
 class CoralVis(Visualization):
     def __init__(self, substrate, evolver, vis_chs):
@@ -12,6 +15,8 @@ class CoralVis(Visualization):
         self.evolver = evolver
         self.next_generation = False
         self.genome_stats = []
+        self.n_frames = 0
+        self.telemetry = Telemetry(substrate, ["energy", "infra"], genome_chid="genome")
 
 
     def render_opt_window(self):
@@ -22,6 +27,7 @@ class CoralVis(Visualization):
         with self.gui.sub_window("Options", 0.05, 0.05, opt_w, opt_h) as sub_w:
             # self.opt_window(sub_w)
             self.next_generation = sub_w.checkbox("Next Generation", self.next_generation)
+            self.show_genomes = sub_w.checkbox("Genome Colors", self.show_genomes)
             self.chinds[0] = sub_w.slider_int(
                 f"R: {self.substrate.index_to_chname(self.chinds[0])}", 
                 self.chinds[0], 0, self.substrate.mem.shape[1]-1)
@@ -32,32 +38,34 @@ class CoralVis(Visualization):
                 f"B: {self.substrate.index_to_chname(self.chinds[2])}", 
                 self.chinds[2], 0, self.substrate.mem.shape[1]-1)
             current_pos = self.window.get_cursor_pos()
-            pos_x = int(current_pos[0] * self.w) % self.w
-            pos_y = int(current_pos[1] * self.h) % self.h
+            self.telemetry.set_probe(*self.screen_to_cell(current_pos))
+            stats = self.telemetry.latest()
+            if not stats:
+                return
             sub_w.text(
-                f"GENOME: {self.substrate.mem[0, inds.genome, pos_x, pos_y]:.2f}\n" +
-                f"Energy: {self.substrate.mem[0, inds.energy, pos_x, pos_y]:.2f}\n" +
-                f"Infra: {self.substrate.mem[0, inds.infra, pos_x, pos_y]:.2f}\n"
+                f"GENOME: {stats['probe_genome']:.2f}\n" +
+                f"Energy: {stats['probe']['energy']:.2f}\n" +
+                f"Infra: {stats['probe']['infra']:.2f}\n"
                 # f"Acts: {self.substrate.mem[0, inds.acts, pos_x, pos_y]}"
             )
-            sub_w.text(f"TIMESTEP: {self.evolver.timestep}")
-            tot_energy = torch.sum(self.substrate.mem[0, inds.energy])
-            tot_infra = torch.sum(self.substrate.mem[0, inds.infra])
+            sub_w.text(f"TIMESTEP: {stats['timestep']}")
+            tot_energy = stats["total"]["energy"]
+            tot_infra = stats["total"]["infra"]
             sub_w.text(f"Total Energy+Infra: {tot_energy + tot_infra}")
             sub_w.text(f"Percent Energy: {(tot_energy / (tot_energy + tot_infra)) * 100}")
-            sub_w.text(f"Energy Offset: {self.evolver.energy_offset}")
-            sub_w.text(f"# Infra in Genomes ({len(self.evolver.genomes)} total):")
+            sub_w.text(f"Energy Offset: {stats['energy_offset']}")
+            sub_w.text(f"# Infra in Genomes ({stats['population']} total):")
 
-            if self.evolver.timestep % 20 == 0:
+            # Frames don't land on every timestep, so the per-genome list is refreshed every 20 drawn frames
+            if self.n_frames % 20 == 0:
                 self.genome_stats = []
-                for i in range(len(self.evolver.genomes)):
-                    n_cells = self.substrate.mem[0, inds.genome].eq(i).sum().item()
-                    age = self.evolver.ages[i]
-                    # n_cells = self.evolver.get_genome_infra_sum(i)
-                    self.genome_stats.append((i, n_cells, age))
+                ages = self.evolver.ages
+                for i, n_cells in enumerate(stats["genome_cells"][:len(ages)]):
+                    self.genome_stats.append((i, n_cells, ages[i]))
                 self.genome_stats.sort(key=lambda x: x[1], reverse=True)
             for i, n_cells, age in self.genome_stats:
                 sub_w.text(f"\tG{i}: {n_cells:.2f} cells, {age:.2f} age")
+            self.n_frames += 1
 
 
 def main(config_filename, channels, shape, kernel, dir_order, sense_chs, act_chs, torch_device):
@@ -69,10 +77,14 @@ def main(config_filename, channels, shape, kernel, dir_order, sense_chs, act_chs
     inds = substrate.ti_indices[None]
 
     space_evolver = SpaceEvolver(config_path, substrate, kernel, dir_order, sense_chs, act_chs)
+    space_evolver.warmup()
     
     vis = CoralVis(substrate, space_evolver, ["energy", "infra", "rot"])
+    genome_palette = GenomePalette(torch_device)
+    space_evolver.set_genome_palette(genome_palette)
+    vis.set_genome_palette(genome_palette)
     space_evolver.run(100000000, vis, n_rad_spots = 5, radiate_interval = 50,
-                      cull_max_pop=100, cull_interval=50)
+                      cull_max_pop=100, cull_interval=50, render_fps=30, telemetry=vis.telemetry)
     
     # checkpoint_file = os.path.join('history', 'NEAT_240308-0052_32', 'checkpoint4')
     # p = neat.Checkpointer.restore_checkpoint(checkpoint_file)
@@ -80,7 +92,7 @@ def main(config_filename, channels, shape, kernel, dir_order, sense_chs, act_chs
 
 
 if __name__ == "__main__":
-    ti.init(ti.metal)
+    init_taichi(ti.metal)
     torch_device = torch.device("mps")
     main(
         config_filename = "coralai/instances/coral/coral_neat.config",
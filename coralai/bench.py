@@ -0,0 +1,186 @@
+"""
+Benchmarks for the coral physics kernels and SpaceEvolver, one stage at a time.
+
+Runs headless (Taichi CPU backend by default) and writes JSON so runs can be compared across commits:
+    python -m coralai.bench --sizes 100 1000 4000 --pops 10 100 --kernels 5 9 --out bench.json
+"""
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import platform
+import contextlib
+import subprocess
+import torch
+import taichi as ti
+
+from .utils.taichi_cache import init_taichi
+from .instances.coral import coral_physics as physics
+from .instances.coral.coral_layout import KERNELS, make_evolver
+
+STAGES = ["compact_active", "apply_weights_and_biases", "activate_outputs", "invest_liquidate", "explore",
+          "flow_energy_down", "flow_energy_up", "distribute_energy", "distribute_infra",
+          "radiation", "culling", "step"]
+
+
+def sync(torch_device):
+    ti.sync()
+    if torch.device(torch_device).type == "cuda":
+        torch.cuda.synchronize()
+
+
+def stage_fns(evolver):
+    """Returns {stage: (setup, fn)}: setup() runs untimed before every call of fn()."""
+    substrate = evolver.substrate
+    inds = substrate.ti_indices[None]
+    mem = substrate.mem
+    weights = torch.stack(evolver.combined_weights, dim=0)
+    biases = torch.stack(evolver.combined_biases, dim=0)
+    out_mem = torch.zeros_like(mem[0, evolver.act_chinds])
+    out_ch = torch.zeros_like(mem[0, inds.energy])
+
+    def clear_out_ch():
+        out_ch.zero_()
+
+    population = {}
+
+    def save_population():
+        population["state"] = (list(evolver.genomes), list(evolver.genome_ids), list(evolver.ages),
+                               list(evolver.combined_weights), list(evolver.combined_biases),
+                               mem[0, inds.genome].clone())
+
+    def restore_population():
+        # Radiation appends to and culling rebuilds the population, so each call starts from copies
+        genomes, genome_ids, ages, combined_weights, combined_biases, genome_ch = population["state"]
+        evolver.genomes, evolver.genome_ids, evolver.ages = list(genomes), list(genome_ids), list(ages)
+        evolver.combined_weights, evolver.combined_biases = list(combined_weights), list(combined_biases)
+        mem[0, inds.genome] = genome_ch
+        evolver.time_last_cull = 0
+
+    save_population()
+    return {
+        "compact_active": (None, evolver.update_active_cells),
+        "apply_weights_and_biases": (None, lambda: physics.apply_weights_and_biases(
+            mem, out_mem, evolver.sense_chinds, weights, biases,
+            evolver.dir_kernel, evolver.dir_order, substrate.ti_indices)),
+        "activate_outputs": (None, lambda: physics.activate_outputs(substrate, evolver.activation_spec)),
+        "invest_liquidate": (None, lambda: physics.invest_liquidate(substrate)),
+        "explore": (None, lambda: physics.explore_physics(substrate, evolver.kernel, evolver.dir_order)),
+        "flow_energy_down": (clear_out_ch, lambda: physics.flow_energy_down(
+            mem, out_ch, 1.5, evolver.kernel, substrate.ti_indices)),
+        "flow_energy_up": (clear_out_ch, lambda: physics.flow_energy_up(
+            mem, out_ch, evolver.kernel, substrate.ti_indices)),
+        "distribute_energy": (clear_out_ch, lambda: physics.distribute_energy(
+            mem, out_ch, 1.5, evolver.kernel, substrate.ti_indices)),
+        "distribute_infra": (clear_out_ch, lambda: physics.distribute_infra(
+            mem, out_ch, 10.0, evolver.kernel, substrate.ti_indices)),
+        "radiation": (restore_population, lambda: evolver.apply_radiation_mutation(5)),
+        "culling": (restore_population, lambda: evolver.reduce_population_to_threshold(max(1, len(evolver.genomes) // 2))),
+        "step": (None, lambda: evolver.step_sim(weights, biases)),
+    }
+
+
+def time_stage(setup, fn, torch_device, repeats, warmup):
+    times = []
+    for i in range(warmup + repeats):
+        if setup is not None:
+            setup()
+        sync(torch_device)
+        start = time.perf_counter()
+        fn()
+        sync(torch_device)
+        if i >= warmup:
+            times.append(time.perf_counter() - start)
+    return times
+
+
+def bench_config(size, pop, kernel, stages, torch_device, repeats, warmup):
+    results = []
+    # The evolver stages print progress, which would interleave with the JSON on stdout
+    with contextlib.redirect_stdout(io.StringIO()):
+        evolver = make_evolver(size, pop, kernel, torch_device)
+        fns = stage_fns(evolver)
+        initial_mem = evolver.substrate.mem.clone()
+        for stage in stages:
+            # Every stage starts from the same state, so stages don't inherit each other's drift
+            evolver.substrate.mem.copy_(initial_mem)
+            setup, fn = fns[stage]
+            times = time_stage(setup, fn, torch_device, repeats, warmup)
+            mean = sum(times) / len(times)
+            results.append({
+                "stage": stage,
+                "size": size,
+                "population": pop,
+                "kernel": kernel,
+                "repeats": repeats,
+                "mean_s": mean,
+                "min_s": min(times),
+                "max_s": max(times),
+                "steps_per_s": 1.0 / mean,
+                "cells_per_s": size * size / mean,
+            })
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(__file__), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(sizes, pops, kernels, stages=STAGES, torch_device="cpu", repeats=5, warmup=1, arch="cpu"):
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "arch": arch,
+            "torch_device": str(torch_device),
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "taichi": ".".join(str(v) for v in ti.__version__),
+            "machine": platform.machine(),
+        },
+        "results": [],
+    }
+    for kernel in kernels:
+        for size in sizes:
+            for pop in pops:
+                results = bench_config(size, pop, kernel, stages, torch_device, repeats, warmup)
+                for r in results:
+                    print(f"{r['stage']:>26} k={kernel} {size}x{size} pop={pop}: "
+                          f"{r['mean_s'] * 1000:9.3f} ms, {r['cells_per_s'] / 1e6:9.2f} Mcells/s", file=sys.stderr)
+                report["results"] += results
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m coralai.bench", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 400, 1000], help="grid side lengths, up to 4000")
+    parser.add_argument("--pops", type=int, nargs="+", default=[10, 100], help="population sizes")
+    parser.add_argument("--kernels", type=int, nargs="+", default=[5, 9], choices=sorted(KERNELS), help="neighborhood sizes")
+    parser.add_argument("--stages", nargs="+", default=STAGES, choices=STAGES)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1, help="untimed calls per stage, covers kernel compilation")
+    parser.add_argument("--arch", default="cpu", help="taichi arch: cpu, cuda, metal, vulkan")
+    parser.add_argument("--device", default="cpu", help="torch device")
+    parser.add_argument("--out", default=None, help="JSON output path, stdout if omitted")
+    args = parser.parse_args(argv)
+
+    init_taichi(getattr(ti, args.arch))
+    report = run_benchmarks(args.sizes, args.pops, args.kernels, args.stages, args.device,
+                            args.repeats, args.warmup, args.arch)
+    if args.out is None:
+        json.dump(report, sys.stdout, indent=4)
+        print()
+    else:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=4)
+        print(f"Wrote {len(report['results'])} results to {args.out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
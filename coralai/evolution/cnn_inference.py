@@ -0,0 +1,103 @@
+import torch
+import torch.nn.functional as F
+
+from ..substrate.nn_lib import ch_norm
+
+
+class CNNInference:
+    """
+    Inference engine for the conv organisms (NCAOrganismCNN, CoralOrganism), which describe themselves with
+    organism.conv_layers(): [(conv, activated), ...], where activated layers are followed by
+    ReLU, ch_norm and sigmoid.
+
+    Eager mode keeps one preallocated, circularly padded input buffer per layer. Each layer's activation is
+    written straight into the interior of the next layer's buffer and only the thin border is wrapped, so
+    padded copies are never materialized and the convolutions run unpadded (fuse_padding=False keeps the
+    padding in the convolutions). compile=True instead traces the same layers with torch.compile, which fuses
+    padding and the pointwise ops into the convolutions' neighbours. channels_last (default: on cuda) stores
+    activations and weights NHWC, the layout cuDNN's fastest conv kernels use.
+
+    The organism's conv weights are read on every call, so mutations apply without rebuilding the engine.
+
+    Usage:
+    - organism.compile_inference(compile=True)
+    - actions = organism.forward(mem)
+    """
+    def __init__(self, organism, compile=False, channels_last=None, fuse_padding=True):
+        self.organism = organism
+        self.layers = organism.conv_layers()
+        for conv, _ in self.layers:
+            if conv.padding_mode != "circular" or conv.stride != (1, 1) or conv.kernel_size[0] != conv.kernel_size[1]:
+                raise ValueError("CNNInference: Only square, stride 1, circularly padded convolutions are supported.")
+        self.channels_last = (torch.device(organism.torch_device).type == "cuda") if channels_last is None else channels_last
+        self.memory_format = torch.channels_last if self.channels_last else torch.contiguous_format
+        self.fuse_padding = fuse_padding
+        self.buffers = None
+        self.buffers_key = None
+        self.compiled = torch.compile(self._forward_graph, dynamic=False) if compile else None
+
+    def __call__(self, x):
+        with torch.no_grad():
+            if self.compiled is not None:
+                return self.compiled(x.contiguous(memory_format=self.memory_format), self._weights())
+            if not self.fuse_padding:
+                return self._forward_graph(x.contiguous(memory_format=self.memory_format), self._weights())
+            return self._forward_buffered(x)
+
+    def _weights(self):
+        return [conv.weight.contiguous(memory_format=self.memory_format) for conv, _ in self.layers]
+
+    def _norms(self):
+        return getattr(self.organism, "norms", [None] * len(self.layers))
+
+    def _forward_graph(self, x, weights):
+        norms = self._norms()
+        for i, ((conv, activated), weight) in enumerate(zip(self.layers, weights)):
+            pad = conv.padding[0]
+            x = F.conv2d(F.pad(x, (pad, pad, pad, pad), mode="circular"), weight, conv.bias)
+            if activated:
+                x = torch.sigmoid(ch_norm(F.relu(x), norms[i]))
+        return x
+
+    def _alloc_buffers(self, x):
+        key = (x.shape[0], x.shape[2], x.shape[3], x.dtype, x.device)
+        if self.buffers_key == key:
+            return
+        n, w, h = x.shape[0], x.shape[2], x.shape[3]
+        self.buffers = []
+        for conv, _ in self.layers:
+            pad = conv.padding[0]
+            self.buffers.append(torch.empty((n, conv.in_channels, w + 2 * pad, h + 2 * pad), dtype=x.dtype,
+                                            device=x.device).contiguous(memory_format=self.memory_format))
+        self.buffers_key = key
+
+    @staticmethod
+    def _wrap(buffer, pad):
+        # Rows first, then full columns (which include the wrapped rows), so the corners come out right
+        if pad == 0:
+            return
+        buffer[:, :, :pad, pad:-pad] = buffer[:, :, -2 * pad:-pad, pad:-pad]
+        buffer[:, :, -pad:, pad:-pad] = buffer[:, :, pad:2 * pad, pad:-pad]
+        buffer[:, :, :, :pad] = buffer[:, :, :, -2 * pad:-pad]
+        buffer[:, :, :, -pad:] = buffer[:, :, :, pad:2 * pad]
+
+    def _forward_buffered(self, x):
+        self._alloc_buffers(x)
+        norms = self._norms()
+        w, h = x.shape[2], x.shape[3]
+        pad = self.layers[0][0].padding[0]
+        self.buffers[0][:, :, pad:pad + w, pad:pad + h] = x
+        self._wrap(self.buffers[0], pad)
+        for i, ((conv, activated), weight) in enumerate(zip(self.layers, self._weights())):
+            x = F.conv2d(self.buffers[i], weight, conv.bias)
+            if activated:
+                ch_norm(F.relu_(x), norms[i])
+            if i + 1 == len(self.layers):
+                return torch.sigmoid_(x) if activated else x
+            next_pad = self.layers[i + 1][0].padding[0]
+            interior = self.buffers[i + 1][:, :, next_pad:next_pad + w, next_pad:next_pad + h]
+            if activated:
+                torch.sigmoid(x, out=interior)
+            else:
+                interior.copy_(x)
+            self._wrap(self.buffers[i + 1], next_pad)
@@ -1,5 +1,6 @@
 import torch
 import neat
+from ..utils.profiler import NULL_PROFILER
 
 class Ecosystem():
     def __init__(self, substrate, create_organism, apply_physics, min_size=5, max_size=30):
@@ -25,6 +26,7 @@ class Ecosystem():
         self.time_step = 0
         self.out_mem = None
         self.total_energy_added = 0.0
+        self.profiler = NULL_PROFILER
 
     
     def gen_random_pop(self, num_organisms):
@@ -139,38 +141,49 @@ class Ecosystem():
         pass
 
 
+    def set_profiler(self, profiler):
+        # Times the stages of update(), see StageProfiler
+        self.profiler = NULL_PROFILER if profiler is None else profiler
+
+
     def update(self, seed_interval=100, seed_volume=10, radiation_interval=500, radiation_volume=10):
-        self.update_population_infra_sum()
+        with self.profiler.stage("fitness"):
+            self.update_population_infra_sum()
         if self.time_step % seed_interval == 0:
-            self.sew_seeds(seed_volume)
+            with self.profiler.stage("seed"):
+                self.sew_seeds(seed_volume)
         if self.time_step % radiation_interval == 0:
-            self.apply_radiation(radiation_volume)
+            with self.profiler.stage("radiation"):
+                self.apply_radiation(radiation_volume)
         genomes_to_remove = []
-        if self.out_mem is None:
-            self.out_mem = torch.zeros_like(self.substrate.mem[0, self.act_chinds])
-        else:
-            self.out_mem[:] = 0.0
-        for genome_key, org_info in self.population.items():
-            self.out_mem = org_info['org'].forward(self.out_mem)
-            org_info['age'] += 1
-            if org_info['age'] > 500 and org_info['infra'] < 1:
-                genomes_to_remove.append(genome_key)
-
-        for genome_key in genomes_to_remove:
-            self.population.pop(genome_key)
-
-        if len(self.population.keys()) > self.max_size:
-            # Calculate how many genomes to remove
-            num_to_remove = len(self.population) - self.max_size
-            # Sort genomes by infra value (ascending order) and select the ones to remove
-            genomes_to_remove = sorted(self.population.items(), key=lambda x: x[1]['infra'])[:num_to_remove]
-            # Remove the selected genomes
-            for genome_key, _ in genomes_to_remove:
+        with self.profiler.stage("forward"):
+            if self.out_mem is None:
+                self.out_mem = torch.zeros_like(self.substrate.mem[0, self.act_chinds])
+            else:
+                self.out_mem[:] = 0.0
+            for genome_key, org_info in self.population.items():
+                self.out_mem = org_info['org'].forward(self.out_mem)
+                org_info['age'] += 1
+                if org_info['age'] > 500 and org_info['infra'] < 1:
+                    genomes_to_remove.append(genome_key)
+
+        with self.profiler.stage("cull"):
+            for genome_key in genomes_to_remove:
                 self.population.pop(genome_key)
 
-        if len(self.population) < self.min_size:
-            self.gen_random_pop(self.min_size - len(self.population))
+            if len(self.population.keys()) > self.max_size:
+                # Calculate how many genomes to remove
+                num_to_remove = len(self.population) - self.max_size
+                # Sort genomes by infra value (ascending order) and select the ones to remove
+                genomes_to_remove = sorted(self.population.items(), key=lambda x: x[1]['infra'])[:num_to_remove]
+                # Remove the selected genomes
+                for genome_key, _ in genomes_to_remove:
+                    self.population.pop(genome_key)
+
+            if len(self.population) < self.min_size:
+                self.gen_random_pop(self.min_size - len(self.population))
         
         self.substrate.mem[0, self.act_chinds] = self.out_mem
-        self.apply_physics()
+        with self.profiler.stage("physics"):
+            self.apply_physics()
         self.time_step += 1
\ No newline at end of file
@@ -0,0 +1,85 @@
+import torch
+import torch.nn.functional as F
+
+from ..substrate.nn_lib import ch_norm
+
+
+class ESEvaluator:
+    """
+    Evolution-strategies search over a conv organism's weights (NCAOrganismCNN, CoralOrganism).
+
+    evaluate() rolls out n_perturbations perturbed copies of the organism, each on its own replica of the
+    substrate memory, in one batched forward per step: the replicas are stacked along the channel axis and
+    every layer runs as a single grouped convolution (groups=n_perturbations), so the cost is one launch per
+    layer instead of one rollout per candidate. ch_norm statistics are reduced per replica and channel, as in
+    a single organism's forward without running_norm. Running statistics would be shared across replicas, so
+    organisms built with running_norm are rejected. With antithetic sampling, perturbations come in
+    +noise/-noise pairs.
+
+    Usage:
+    - es = ESEvaluator(organism, n_perturbations=32, sigma=0.02)
+    - fitness, noise = es.evaluate(substrate.mem, lambda mem: mem[:, energy_chind].mean(dim=(1, 2)), n_steps=20)
+    - es.update(fitness, noise, lr=0.01)
+    """
+    def __init__(self, organism, n_perturbations, sigma=0.02, antithetic=True):
+        if antithetic and n_perturbations % 2 != 0:
+            raise ValueError("ESEvaluator: Antithetic sampling needs an even number of perturbations.")
+        if any(norm is not None for norm in getattr(organism, "norms", [])):
+            raise ValueError("ESEvaluator: Organisms with running_norm are not supported, ch_norm statistics must be per replica.")
+        self.organism = organism
+        self.layers = organism.conv_layers()
+        self.n_perturbations = n_perturbations
+        self.sigma = sigma
+        self.antithetic = antithetic
+
+    def sample(self):
+        """One (n_perturbations, *weight.shape) noise tensor per layer."""
+        k = self.n_perturbations // 2 if self.antithetic else self.n_perturbations
+        noise = []
+        for conv, _ in self.layers:
+            eps = torch.randn((k, *conv.weight.shape), dtype=conv.weight.dtype, device=conv.weight.device)
+            noise.append(torch.cat([eps, -eps]) if self.antithetic else eps)
+        return noise
+
+    def forward(self, x, noise):
+        """x: (n_perturbations, n_senses, w, h) sense channels, one replica each. Returns the actions, same layout."""
+        k, _, w, h = x.shape
+        x = x.reshape(1, -1, w, h)
+        for (conv, activated), eps in zip(self.layers, noise):
+            weight = (conv.weight.unsqueeze(0) + self.sigma * eps).reshape(-1, *conv.weight.shape[1:])
+            bias = None if conv.bias is None else conv.bias.repeat(k)
+            pad = conv.padding[0]
+            x = F.conv2d(F.pad(x, (pad, pad, pad, pad), mode="circular"), weight, bias, groups=k)
+            if activated:
+                x = torch.sigmoid_(ch_norm(F.relu_(x)))
+        return x.reshape(k, -1, w, h)
+
+    def evaluate(self, mem, fitness_fn, n_steps=1, step_fn=None, noise=None):
+        """
+        Rolls every perturbation out for n_steps from a copy of mem (1, C, w, h) and returns
+        (fitness (n_perturbations,), noise). fitness_fn maps the final (n_perturbations, C, w, h) memory to one
+        value per replica. step_fn(mem, actions) advances the replicas, by default the actions are written to
+        the organism's act channels.
+        """
+        noise = self.sample() if noise is None else noise
+        sense_chinds = torch.as_tensor(self.organism.sense_chinds, device=mem.device)
+        act_chinds = torch.as_tensor(self.organism.act_chinds, device=mem.device)
+        with torch.no_grad():
+            replicas = mem.expand(self.n_perturbations, -1, -1, -1).clone()
+            for _ in range(n_steps):
+                actions = self.forward(replicas.index_select(1, sense_chinds), noise)
+                if step_fn is None:
+                    replicas[:, act_chinds] = actions
+                else:
+                    replicas = step_fn(replicas, actions)
+            fitness = fitness_fn(replicas)
+        return fitness, noise
+
+    def update(self, fitness, noise, lr):
+        """Moves the organism's weights along the ES gradient estimate of the standardized fitness, in place."""
+        fitness = fitness.to(noise[0].dtype)
+        scores = (fitness - fitness.mean()) / (fitness.std() + 1e-8)
+        with torch.no_grad():
+            for (conv, _), eps in zip(self.layers, noise):
+                grad = torch.tensordot(scores, eps, dims=1) / (self.n_perturbations * self.sigma)
+                conv.weight.data += lr * grad
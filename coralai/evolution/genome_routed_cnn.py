@@ -0,0 +1,94 @@
+import torch
+import torch.nn.functional as F
+
+
+class GenomeRoutedCNN:
+    """
+    Forward of a multi-organism CNN ecosystem in which every live cell runs only its own genome's conv stack.
+
+    Instead of each organism convolving the whole grid and masking the result (G full-grid convolutions),
+    the live cells (genome channel >= 0) are sorted by genome, the k x k patches around them are gathered once
+    per layer (im2col over live cells only), and each genome's contiguous segment is multiplied by that
+    genome's flattened weights. The cost scales with the number of live cells.
+
+    Semantics: a layer's activation at a cell is computed with the weights of the genome at that cell, empty
+    cells hold zero activations after the first layer, and ch_norm statistics are taken per genome over its
+    own cells, every call: organism.norms (running_norm) are ignored. Organisms are conv organisms with conv_layers() (NCAOrganismCNN, CoralOrganism), and all must
+    share the same layer shapes.
+
+    Usage:
+    - routed = GenomeRoutedCNN(substrate, sense_chs, act_chs)
+    - substrate.mem[0, routed.act_chinds] = routed.forward({genome_key: organism, ...})
+    """
+    def __init__(self, substrate, sense_chs, act_chs, genome_ch="genome", eps=1e-5):
+        self.substrate = substrate
+        self.sense_chinds = torch.as_tensor(substrate.windex[sense_chs], device=substrate.mem.device)
+        self.act_chinds = torch.as_tensor(substrate.windex[act_chs], device=substrate.mem.device)
+        self.genome_chind = int(substrate.windex[genome_ch][0])
+        self.eps = eps
+        self.offsets = {}
+
+    def patch_offsets(self, kernel_size):
+        """(k * k, 2) cell offsets in the order of a flattened conv weight's kernel dimensions."""
+        if kernel_size not in self.offsets:
+            pad = kernel_size // 2
+            r = torch.arange(kernel_size, device=self.substrate.mem.device) - pad
+            self.offsets[kernel_size] = torch.stack(torch.meshgrid(r, r, indexing="ij"), dim=-1).reshape(-1, 2)
+        return self.offsets[kernel_size]
+
+    def live_cells(self):
+        """Flat indices of the live cells sorted by genome, and the (genome_key, n_cells) of each segment."""
+        genome = self.substrate.mem[0, self.genome_chind].flatten()
+        live = torch.nonzero(genome >= 0).squeeze(1)
+        keys = genome[live].long()
+        order = torch.argsort(keys, stable=True)
+        live, keys = live[order], keys[order]
+        segment_keys, counts = torch.unique_consecutive(keys, return_counts=True)
+        return live, list(zip(segment_keys.tolist(), counts.tolist()))
+
+    def forward(self, organisms):
+        """
+        organisms: {genome_key: organism}. Returns the (n_acts, w, h) action channels; cells that are empty or
+        whose genome is missing from organisms are 0.
+        """
+        mem = self.substrate.mem
+        w, h = mem.shape[2], mem.shape[3]
+        live, segments = self.live_cells()
+        empty = torch.zeros((len(self.act_chinds), w, h), dtype=mem.dtype, device=mem.device)
+        if live.shape[0] == 0:
+            return empty
+
+        layer_stacks = [organisms[key].conv_layers() if key in organisms else None for key, _ in segments]
+        reference = next((layers for layers in layer_stacks if layers is not None), None)
+        if reference is None:
+            return empty
+        for layers in layer_stacks:
+            if layers is not None and [c.weight.shape for c, _ in layers] != [c.weight.shape for c, _ in reference]:
+                raise ValueError("GenomeRoutedCNN: All organisms must have the same conv layer shapes.")
+
+        xs, ys = live // h, live % h
+        field = mem[0].index_select(0, self.sense_chinds).reshape(-1, w * h)
+        with torch.no_grad():
+            for layer_i, (conv, activated) in enumerate(reference):
+                offsets = self.patch_offsets(conv.kernel_size[0])
+                # (n_live, k * k) flat indices of every live cell's wrapped neighbourhood
+                nbrs = ((xs[:, None] + offsets[:, 0]) % w) * h + (ys[:, None] + offsets[:, 1]) % h
+                # (n_live, c_in * k * k), matching conv.weight.reshape(c_out, -1)
+                patches = field[:, nbrs].permute(1, 0, 2).reshape(live.shape[0], -1)
+                layer_out = torch.zeros((live.shape[0], conv.out_channels), dtype=mem.dtype, device=mem.device)
+                start = 0
+                for (key, n), layers in zip(segments, layer_stacks):
+                    if layers is not None:
+                        seg_conv = layers[layer_i][0]
+                        seg = patches[start:start + n] @ seg_conv.weight.reshape(seg_conv.out_channels, -1).T
+                        if seg_conv.bias is not None:
+                            seg += seg_conv.bias
+                        if activated:
+                            seg = F.relu_(seg)
+                            var, mean = torch.var_mean(seg, dim=0, keepdim=True, unbiased=False)
+                            seg = torch.sigmoid_(seg.sub_(mean).mul_(torch.rsqrt(var + self.eps)))
+                        layer_out[start:start + n] = seg
+                    start += n
+                field = torch.zeros((conv.out_channels, w * h), dtype=mem.dtype, device=mem.device)
+                field[:, live] = layer_out.T
+        return field.reshape(-1, w, h)
@@ -0,0 +1,197 @@
+import os
+import json
+import zlib
+import queue
+import contextlib
+import random
+import traceback
+import multiprocessing
+import numpy as np
+import torch
+import neat
+import taichi as ti
+
+from ..substrate.substrate import Substrate
+
+GENOME_FORMAT_VERSION = 1
+
+
+def encode_genome(genome):
+    """
+    Compact, class-free serialization of a neat genome for migration: zlib-compressed JSON of gene keys
+    and attribute values, readable by any process with the same genome config.
+    """
+    nodes = [[key, [getattr(gene, a.name) for a in gene._gene_attributes]] for key, gene in genome.nodes.items()]
+    conns = [[list(key), [getattr(gene, a.name) for a in gene._gene_attributes]] for key, gene in genome.connections.items()]
+    data = [GENOME_FORMAT_VERSION, genome.key, genome.fitness, nodes, conns]
+    return zlib.compress(json.dumps(data, separators=(",", ":")).encode("utf-8"))
+
+
+def decode_genome(data, genome_config):
+    version, key, fitness, nodes, conns = json.loads(zlib.decompress(data).decode("utf-8"))
+    if version != GENOME_FORMAT_VERSION:
+        raise ValueError(f"IslandModel: Unsupported genome format version {version}")
+    genome = neat.DefaultGenome(key)
+    genome.fitness = fitness
+    for node_key, values in nodes:
+        gene = genome_config.node_gene_type(node_key)
+        for attr, value in zip(gene._gene_attributes, values):
+            setattr(gene, attr.name, value)
+        genome.nodes[node_key] = gene
+    for conn_key, values in conns:
+        conn_key = tuple(conn_key)
+        gene = genome_config.connection_gene_type(conn_key)
+        for attr, value in zip(gene._gene_attributes, values):
+            setattr(gene, attr.name, value)
+        genome.connections[conn_key] = gene
+    return genome
+
+
+class QueueBroker:
+    """
+    Routes migrants between islands through one multiprocessing queue per island (its inbox).
+    topology: "ring" sends to the next island, "all" to every other island, "random" to one random island.
+    Anything with the same send/receive interface (e.g. a socket client for multi-host runs) can replace it.
+    """
+    def __init__(self, n_islands, topology="ring", mp_context=None):
+        if topology not in ("ring", "all", "random"):
+            raise ValueError(f"IslandModel: Unknown migration topology {topology}")
+        mp_context = multiprocessing.get_context("spawn") if mp_context is None else mp_context
+        self.n_islands = n_islands
+        self.topology = topology
+        self.inboxes = [mp_context.Queue() for _ in range(n_islands)]
+
+    def destinations(self, src):
+        others = [i for i in range(self.n_islands) if i != src]
+        if not others:
+            return []
+        if self.topology == "ring":
+            return [(src + 1) % self.n_islands]
+        if self.topology == "random":
+            return [random.choice(others)]
+        return others
+
+    def send(self, src, migrants):
+        for dst in self.destinations(src):
+            self.inboxes[dst].put((src, migrants))
+
+    def receive(self, dst):
+        """Drains dst's inbox without blocking, migrants that haven't arrived yet are picked up next epoch."""
+        migrants = []
+        while True:
+            try:
+                _, payload = self.inboxes[dst].get_nowait()
+            except queue.Empty:
+                return migrants
+            migrants += payload
+
+    def close(self):
+        # Lets an island exit without waiting for islands that already finished to read its last migrants
+        for inbox in self.inboxes:
+            inbox.cancel_join_thread()
+
+
+class NullVis:
+    """Stands in for a Visualization in headless runs of SpaceEvolver.run."""
+    running = True
+    next_generation = False
+
+    def update(self, snapshot=None):
+        pass
+
+
+def _run_island(island_id, layout_header, evolver_args, broker, results, n_epochs, steps_per_epoch,
+                n_migrants, run_kwargs, seed, n_threads):
+    from .space_evolver import SpaceEvolver
+    try:
+        torch.set_num_threads(n_threads)
+        ti.init(ti.cpu, cpu_max_num_threads=n_threads)
+        random.seed(seed)
+        np.random.seed(seed)
+        torch.manual_seed(seed)
+        substrate = Substrate.from_layout_header(layout_header, torch.device("cpu"))
+        evolver = SpaceEvolver(substrate=substrate, **evolver_args)
+        vis = NullVis()
+        n_immigrants = 0
+        for _ in range(n_epochs):
+            # SpaceEvolver.run prints on every radiation and cull, which would interleave across islands
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                evolver.run(steps_per_epoch, vis, **run_kwargs)
+            broker.send(island_id, [encode_genome(g) for g in evolver.top_genomes(n_migrants)])
+            immigrants = [decode_genome(d, evolver.neat_config.genome_config) for d in broker.receive(island_id)]
+            evolver.add_immigrants(immigrants)
+            n_immigrants += len(immigrants)
+        broker.close()
+        results.put(("done", island_id, {
+            "timestep": evolver.timestep,
+            "population": len(evolver.genomes),
+            "n_immigrants": n_immigrants,
+            "top_genomes": [encode_genome(g) for g in evolver.top_genomes(n_migrants)],
+        }))
+    except Exception:
+        results.put(("error", island_id, traceback.format_exc()))
+
+
+class IslandModel:
+    """
+    Island-model evolution: n_islands worker processes each run a SpaceEvolver on their own substrate (same layout
+    as the template substrate) and, every epoch, send their top genomes to other islands through a broker.
+
+    Usage:
+    - islands = IslandModel(substrate, dict(config_path=..., kernel=..., dir_order=..., sense_chs=..., act_chs=...), 8)
+    - results = islands.run(n_epochs=20, steps_per_epoch=200, n_migrants=2)
+    - best = decode_genome(results[0]["top_genomes"][0], neat_config.genome_config)
+    """
+    def __init__(self, substrate: Substrate, evolver_args, n_islands, topology="ring", seed=0, threads_per_island=1,
+                 run_kwargs=None):
+        self.layout_header = substrate.layout_header()
+        self.evolver_args = dict(evolver_args)
+        self.n_islands = n_islands
+        self.seed = seed
+        self.threads_per_island = threads_per_island
+        self.mp_context = multiprocessing.get_context("spawn")
+        self.broker = QueueBroker(n_islands, topology, self.mp_context)
+        self.run_kwargs = {"n_rad_spots": 5, "radiate_interval": 50, "cull_max_pop": 100, "cull_interval": 50}
+        if run_kwargs is not None:
+            self.run_kwargs.update(run_kwargs)
+
+    def run(self, n_epochs, steps_per_epoch, n_migrants=2):
+        """Runs every island to completion and returns one result dict per island, in island order."""
+        results = self.mp_context.Queue()
+        # spawn, not fork: a forked child would inherit this process' Taichi runtime
+        procs = [self.mp_context.Process(
+            target=_run_island, name=f"island_{i}",
+            args=(i, self.layout_header, self.evolver_args, self.broker, results, n_epochs, steps_per_epoch,
+                  n_migrants, self.run_kwargs, self.seed + i, self.threads_per_island))
+            for i in range(self.n_islands)]
+        for proc in procs:
+            proc.start()
+        island_results = [None] * self.n_islands
+        errors = []
+        n_results = 0
+        try:
+            while n_results < self.n_islands:
+                try:
+                    status, island_id, payload = results.get(timeout=1.0)
+                except queue.Empty:
+                    # An island that crashed hard (e.g. a segfault or OOM kill) never reports
+                    dead = [f"island {i} exited with code {proc.exitcode}" for i, proc in enumerate(procs)
+                            if not proc.is_alive() and island_results[i] is None
+                            and not any(e.startswith(f"island {i}:") for e in errors)]
+                    if dead:
+                        errors += dead
+                        break
+                    continue
+                n_results += 1
+                if status == "error":
+                    errors.append(f"island {island_id}:\n{payload}")
+                else:
+                    island_results[island_id] = payload
+        finally:
+            for proc in procs:
+                if errors and proc.is_alive():
+                    proc.terminate()
+                proc.join()
+        if errors:
+            raise RuntimeError("IslandModel: " + "\n".join(errors))
+        return island_results
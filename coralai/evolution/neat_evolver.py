@@ -1,5 +1,8 @@
 from datetime import datetime
 import os
+import random
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import torch
 import neat
@@ -8,17 +11,47 @@ import torch.nn as nn
 
 from ..substrate.nn_lib import ch_norm
 
-from coralai.instances.coral.coral_physics import invest_liquidate, explore_physics, energy_physics, activate_outputs
+from coralai.instances.coral.coral_physics import (invest_liquidate, explore_physics, energy_physics, activate_outputs,
+                                                   ActivationSpec)
 
 # from pytorch_neat.cppn import create_cppn
-from pytorch_neat.activations import relu_activation, sigmoid_activation, tanh_activation, identity_activation
-from pytorch_neat.linear_net import LinearNet
-from .neat_organism import NeatOrganism
+from ..utils.profiler import NULL_PROFILER
 from ..substrate.nn_lib import ch_norm
+from ..substrate.substrate import Substrate
+
+# State of a parallel evaluation worker process, see NEATEvolver.eval_genomes_parallel
+_worker = {}
+
+
+def _init_eval_worker(layout_header, init_args, n_threads):
+    # Each worker owns its Taichi CPU runtime and substrate, threads are capped to not oversubscribe the cores
+    torch.set_num_threads(n_threads)
+    ti.init(ti.cpu, cpu_max_num_threads=n_threads)
+    substrate = Substrate.from_layout_header(layout_header, torch.device("cpu"))
+    _worker["evolver"] = NEATEvolver(substrate=substrate, **init_args)
+
+
+def _eval_episode(genomes, n_timesteps, seed):
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+    evolver = _worker["evolver"]
+    # Workers are reused across episodes, start each one from the state a fresh evolver would have
+    evolver.substrate.mem.zero_()
+    evolver.timestep = 0
+    evolver.eval_genomes(genomes, n_timesteps)
+    return [genome.fitness for _, genome in genomes]
+
 
 @ti.data_oriented
 class NEATEvolver():
-    def __init__(self, config_path, substrate, kernel, ind_of_middle, sense_chs, act_chs):
+    def __init__(self, config_path, substrate, kernel, ind_of_middle, sense_chs, act_chs, dir_order=(0, -1, 1)):
+        self.init_args = {"config_path": os.path.abspath(config_path),
+                          "kernel": kernel.tolist() if isinstance(kernel, torch.Tensor) else kernel,
+                          "ind_of_middle": ind_of_middle, "sense_chs": sense_chs, "act_chs": act_chs,
+                          "dir_order": list(dir_order)}
+        if not isinstance(kernel, torch.Tensor):
+            kernel = torch.tensor(kernel, device=substrate.torch_device)
         self.substrate = substrate
         torch_device = substrate.torch_device
         self.substrate = substrate
@@ -34,6 +67,9 @@ class NEATEvolver():
         self.n_acts = len(self.act_chinds)
 
         self.ind_of_middle = ind_of_middle
+        # Explore directions relative to a cell's rot, as in SpaceEvolver: acts.explore needs len(dir_order) + 1 entries
+        self.dir_order = torch.tensor(list(dir_order), device=torch_device)
+        self.activation_spec = ActivationSpec(substrate)
 
         self.neat_config = neat.Config(neat.DefaultGenome, neat.DefaultReproduction,
                            neat.DefaultSpeciesSet, neat.DefaultStagnation,
@@ -43,6 +79,14 @@ class NEATEvolver():
         self.out_mem = None
         self.energy_offset = 0.0
         self.organisms = None
+        self.profiler = NULL_PROFILER
+        self.eval_pool = None
+        self.eval_pool_workers = None
+
+
+    def set_profiler(self, profiler):
+        # Times the stages of eval_genomes(), see StageProfiler
+        self.profiler = NULL_PROFILER if profiler is None else profiler
 
 
     def gen_population(self):
@@ -94,7 +138,8 @@ class NEATEvolver():
             self.step_sim(combined_weights, combined_biases)
             self.timestep = timestep
             if vis is not None:
-                vis.update()
+                with self.profiler.stage("render"):
+                    vis.update()
                 if vis.next_generation:
                     vis.next_generation = False
                     break
@@ -105,32 +150,94 @@ class NEATEvolver():
             org['genome'].fitness += (self.get_genome_infra_sum(i)).item()
 
     
+    def eval_genomes_parallel(self, genomes, n_timesteps, n_workers=None, n_episodes=None, partition=False,
+                              aggregate="mean", seed=None, threads_per_worker=1):
+        """
+        Evaluates genomes in a pool of worker processes, each with its own Taichi CPU runtime and substrate.
+        - partition=False: every episode runs the whole population with a different seed
+        - partition=True: genomes are split into n_workers disjoint groups, each group runs n_episodes times
+        Fitness is aggregated per genome across its episodes ("mean", "min" or "median").
+        Drop-in for population.run: p.run(lambda genomes, config: evolver.eval_genomes_parallel(genomes, 500), n)
+        """
+        n_workers = os.cpu_count() if n_workers is None else n_workers
+        if n_episodes is None:
+            n_episodes = 1 if partition else n_workers
+        if aggregate not in ("mean", "min", "median"):
+            raise ValueError(f"NEATEvolver: Unknown fitness aggregate {aggregate}")
+        genomes = list(genomes)
+        seed = random.randrange(2**31) if seed is None else seed
+        groups = [list(range(len(genomes)))]
+        if partition:
+            groups = [g.tolist() for g in np.array_split(np.random.permutation(len(genomes)), n_workers) if len(g) > 0]
+
+        pool = self.get_eval_pool(n_workers, threads_per_worker)
+        futures = []
+        for episode in range(n_episodes):
+            for group in groups:
+                futures.append((group, pool.submit(
+                    _eval_episode, [genomes[i] for i in group], n_timesteps, seed + len(futures))))
+
+        fitnesses = [[] for _ in genomes]
+        for group, future in futures:
+            for i, fitness in zip(group, future.result()):
+                fitnesses[i].append(fitness)
+        for (_, genome), genome_fitnesses in zip(genomes, fitnesses):
+            genome.fitness = float(getattr(np, aggregate)(genome_fitnesses))
+        return [genome.fitness for _, genome in genomes]
+
+
+    def get_eval_pool(self, n_workers, threads_per_worker=1):
+        if self.eval_pool is not None and self.eval_pool_workers != (n_workers, threads_per_worker):
+            self.close_eval_pool()
+        if self.eval_pool is None:
+            # spawn, not fork: a forked child would inherit this process' Taichi runtime
+            self.eval_pool = ProcessPoolExecutor(
+                max_workers=n_workers, mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_eval_worker,
+                initargs=(self.substrate.layout_header(), self.init_args, threads_per_worker))
+            self.eval_pool_workers = (n_workers, threads_per_worker)
+        return self.eval_pool
+
+
+    def close_eval_pool(self):
+        if self.eval_pool is not None:
+            self.eval_pool.shutdown()
+            self.eval_pool = None
+            self.eval_pool_workers = None
+
+
     def step_sim(self, combined_weights, combined_biases):
         inds = self.substrate.ti_indices[None]
-        self.forward(combined_weights, combined_biases)
-        self.energy_offset = self.get_energy_offset(self.timestep)
-        self.substrate.mem[0, inds.energy] += (torch.randn_like(self.substrate.mem[0, inds.energy]) + self.energy_offset) * 0.1
-        self.substrate.mem[0, inds.infra] += (torch.randn_like(self.substrate.mem[0, inds.energy]) + self.energy_offset) * 0.1
-        self.substrate.mem[0, inds.energy] = torch.clamp(self.substrate.mem[0, inds.energy], 0.01, 100)
-        self.substrate.mem[0, inds.infra] = torch.clamp(self.substrate.mem[0, inds.infra], 0.01, 100)
-        if self.timestep % 20 == 0:
-            self.kill_random_chunk(5)
+        with self.profiler.stage("forward"):
+            self.forward(combined_weights, combined_biases)
+        with self.profiler.stage("forcing"):
+            self.energy_offset = self.get_energy_offset(self.timestep)
+            self.substrate.mem[0, inds.energy] += (torch.randn_like(self.substrate.mem[0, inds.energy]) + self.energy_offset) * 0.1
+            self.substrate.mem[0, inds.infra] += (torch.randn_like(self.substrate.mem[0, inds.energy]) + self.energy_offset) * 0.1
+            self.substrate.mem[0, inds.energy] = torch.clamp(self.substrate.mem[0, inds.energy], 0.01, 100)
+            self.substrate.mem[0, inds.infra] = torch.clamp(self.substrate.mem[0, inds.infra], 0.01, 100)
+            if self.timestep % 20 == 0:
+                self.kill_random_chunk(5)
         self.apply_physics()
     
 
     def apply_physics(self):
         inds = self.substrate.ti_indices[None]
         # self.substrate.mem[0, inds.energy, self.substrate.w//2, self.substrate.h//2] += 10
-        activate_outputs(self.substrate, self.ind_of_middle)
-        invest_liquidate(self.substrate)
-        explore_physics(self.substrate, self.kernel)
-        energy_physics(self.substrate, self.kernel, max_infra=10, max_energy=1.5)
+        with self.profiler.stage("activate"):
+            activate_outputs(self.substrate, self.activation_spec)
+        with self.profiler.stage("invest"):
+            invest_liquidate(self.substrate)
+        with self.profiler.stage("explore"):
+            explore_physics(self.substrate, self.kernel, self.dir_order)
+        with self.profiler.stage("energy"):
+            energy_physics(self.substrate, self.kernel, max_infra=10, max_energy=1.5)
 
-        self.substrate.mem[0, inds.genome] = torch.where(
-            (self.substrate.mem[0, inds.infra] + self.substrate.mem[0, inds.energy]) > 0.05,
-            self.substrate.mem[0, inds.genome],
-            -1
-        )
+            self.substrate.mem[0, inds.genome] = torch.where(
+                (self.substrate.mem[0, inds.infra] + self.substrate.mem[0, inds.energy]) > 0.05,
+                self.substrate.mem[0, inds.genome],
+                -1
+            )
 
 
     def kill_random_chunk(self, width):
@@ -168,6 +275,10 @@ class NEATEvolver():
         for i, j, act_k in ti.ndrange(mem.shape[2], mem.shape[3], out_mem.shape[0]):
             val = 0.0
             genome_key = int(mem[0, genome_ind, i, j])
+            if genome_key < 0:
+                # Empty cell, -1 would index before the start of the weights
+                out_mem[act_k, i, j] = 0.0
+                continue
             for sensor_n, neigh_m in ti.ndrange(sense_chinds.shape[0], kernel.shape[0]):
                 neigh_x = (i + kernel[neigh_m, 0]) % mem.shape[2]
                 neigh_y = (j + kernel[neigh_m, 1]) % mem.shape[3]
@@ -177,6 +288,9 @@ class NEATEvolver():
 
 
     def create_torch_net(self, genome):
+        # Imported here so that evaluation workers and tooling don't pay for pytorch_neat at import time
+        from pytorch_neat.activations import identity_activation
+        from pytorch_neat.linear_net import LinearNet
         input_coords = []
         for offset in self.kernel:
             for ch in range(self.n_senses):
@@ -11,7 +11,7 @@ import taichi as ti
 
 # from pytorch_neat.cppn import create_cppn
 from pytorch_neat.recurrent_net import RecurrentNet
-from ..substrate.nn_lib import ch_norm
+from ..substrate.nn_lib import ch_norm, ch_slice
 from .organism import Organism
 
 @ti.data_oriented
@@ -26,6 +26,8 @@ class NeatOrganism(Organism):
         self.genome_key = None
         self.net = None
         self.is_evolvable = True
+        # A view of the action channels when they are contiguous, so they are normalized in place
+        self.act_slice = ch_slice(self.act_chinds)
 
 
     def load_neat_config(self):
@@ -127,8 +129,10 @@ class NeatOrganism(Organism):
 
         self.store_actions(actions, mem, self.act_chinds, cell_coords)
         # mem[:, self.act_chinds] = nn.ReLU()(mem[:, self.act_chinds])
-        mem[:, self.act_chinds] = ch_norm(mem[:, self.act_chinds])
-        mem[:, self.act_chinds] = torch.sigmoid(mem[:, self.act_chinds])
+        if self.act_slice is not None:
+            torch.sigmoid_(ch_norm(mem[:, self.act_slice]))
+        else:
+            mem[:, self.act_chinds] = torch.sigmoid_(ch_norm(mem[:, self.act_chinds]))
         
         return mem
 
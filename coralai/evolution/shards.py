@@ -0,0 +1,267 @@
+import queue
+import traceback
+import multiprocessing
+import numpy as np
+import torch
+import taichi as ti
+
+from ..substrate.substrate import Substrate
+from ..instances.coral.coral_physics import ActivationSpec
+
+# Radius, in kernel radii, of the cells one SpaceEvolver step reads to update a cell:
+# forward 1, explore 1, flow_energy_up 2, distribute_energy 1, distribute_infra 1 (activation/investment are per cell)
+STEP_RADIUS = 6
+
+
+def split_range(n, n_parts):
+    return [(i * n // n_parts, (i + 1) * n // n_parts) for i in range(n_parts)]
+
+
+class ShardWindow:
+    """
+    A shard's view of the world: its interior [x0, x1) x [y0, y1) plus `halo` cells on every side,
+    wrapped around the world's edges.
+    """
+    def __init__(self, bounds, halo, world_w, world_h):
+        (self.x0, self.x1), (self.y0, self.y1) = bounds
+        self.halo = halo
+        self.world_w = world_w
+        self.world_h = world_h
+        self.xs = torch.arange(self.x0 - halo, self.x1 + halo) % world_w
+        self.ys = torch.arange(self.y0 - halo, self.y1 + halo) % world_h
+
+    @property
+    def shape(self):
+        return (len(self.xs), len(self.ys))
+
+    def interior(self, mem):
+        """Interior of a local (1, C, window_w, window_h) memory."""
+        halo = self.halo
+        return mem[0, :, halo:halo + self.x1 - self.x0, halo:halo + self.y1 - self.y0]
+
+    def read_window(self, world_mem, mem):
+        mem[0] = world_mem[0].index_select(1, self.xs).index_select(2, self.ys)
+
+    def read_halo(self, world_mem, mem):
+        # The interior is only ever written by this shard, so between steps only the halo strips are stale
+        halo, xs, ys = self.halo, self.xs, self.ys
+        if halo == 0:
+            return
+        world = world_mem[0]
+        mem[0, :, :halo] = world.index_select(1, xs[:halo]).index_select(2, ys)
+        mem[0, :, -halo:] = world.index_select(1, xs[-halo:]).index_select(2, ys)
+        mem[0, :, halo:-halo, :halo] = world[:, self.x0:self.x1].index_select(2, ys[:halo])
+        mem[0, :, halo:-halo, -halo:] = world[:, self.x0:self.x1].index_select(2, ys[-halo:])
+
+    def write_interior(self, world_mem, mem):
+        world_mem[0, :, self.x0:self.x1, self.y0:self.y1] = self.interior(mem)
+
+    def set_chunk(self, substrate, genome_key, x, y, radius):
+        """SpaceEvolver.set_chunk in world coordinates, applied to the part of the chunk inside the window."""
+        inds = substrate.ti_indices[None]
+        chunk_xs = torch.arange(x - radius, x + radius) if radius > 0 else torch.tensor([x])
+        chunk_ys = torch.arange(y - radius, y + radius) if radius > 0 else torch.tensor([y])
+        in_x = torch.isin(self.xs, chunk_xs % self.world_w)
+        in_y = torch.isin(self.ys, chunk_ys % self.world_h)
+        substrate.mem[0, inds.genome][in_x[:, None] & in_y[None, :]] = genome_key
+
+
+class ShardActivationSpec(ActivationSpec):
+    """
+    ActivationSpec whose normalization statistics are taken over the whole world: every shard writes the interior
+    of its normalized channels to the shared norm_mem and, once all have, reduces over it as an unsharded step would.
+    """
+    def __init__(self, substrate, window, norm_mem, barrier):
+        super().__init__(substrate)
+        self.window = window
+        self.norm_mem = norm_mem
+        self.barrier = barrier
+
+    def update_stats(self, mem):
+        if self.norm_chinds.shape[0] == 0:
+            return
+        chs = mem[:, self.norm_slice] if self.norm_slice is not None else mem[:, self.norm_chinds]
+        self.window.write_interior(self.norm_mem, chs)
+        # Nobody reduces before every shard has written, and nobody writes again before the end of step barrier
+        self.barrier.wait()
+        var, mean = torch.var_mean(self.norm_mem[0], dim=(1, 2), unbiased=False)
+        self.stats[self.norm_chinds, 0] = mean
+        self.stats[self.norm_chinds, 1] = torch.rsqrt(var + 1e-5)
+
+
+def _run_shard(shard_id, window, layout_header, evolver_args, world_mem, norm_mem, barrier, commands, results, seed,
+               n_threads, forcing):
+    from .space_evolver import SpaceEvolver
+    try:
+        torch.set_num_threads(n_threads)
+        ti.init(ti.cpu, cpu_max_num_threads=n_threads)
+        # Same numpy seed on every shard, it only draws world-level events (kill chunks) that all shards must agree on
+        np.random.seed(seed)
+        torch.manual_seed(seed + 1 + shard_id)
+        header = dict(layout_header, shape=[layout_header["shape"][0], *window.shape])
+        substrate = Substrate.from_layout_header(header)
+        # Skips __init__, the population lives in the coordinating process
+        evolver = SpaceEvolver.__new__(SpaceEvolver)
+        evolver._setup(substrate=substrate, **evolver_args)
+        evolver.activation_spec = ShardActivationSpec(substrate, window, norm_mem, barrier)
+        evolver.warmup()
+        results.put(("ready", shard_id, None))
+    except Exception:
+        results.put(("error", shard_id, traceback.format_exc()))
+        return
+
+    while True:
+        command = commands.get()
+        if command[0] == "stop":
+            return
+        _, timestep, n_steps, weights, biases = command
+        try:
+            # The coordinator may have edited the world (radiation, culling) since the last command
+            window.read_window(world_mem, substrate.mem)
+            for t in range(timestep, timestep + n_steps):
+                if t > timestep:
+                    window.read_halo(world_mem, substrate.mem)
+                # Nobody writes before every shard has read its halo
+                barrier.wait()
+                evolver.timestep = t
+                evolver.forward(weights, biases)
+                if forcing:
+                    evolver.apply_forcing()
+                if t % 50 == 0:
+                    x = np.random.randint(0, window.world_w)
+                    y = np.random.randint(0, window.world_h)
+                    window.set_chunk(substrate, -1, x, y, 5)
+                window.write_interior(world_mem, substrate.mem)
+                # Nobody reads the next halo before every shard has written its interior
+                barrier.wait()
+            results.put(("done", shard_id, None))
+        except Exception:
+            # Unblocks the other shards, which then report a BrokenBarrierError
+            barrier.abort()
+            results.put(("error", shard_id, traceback.format_exc()))
+
+
+class ShardedWorld:
+    """
+    Runs a SpaceEvolver's world split into shards[0] x shards[1] rectangles, each stepped by its own process.
+
+    The world memory is moved to shared memory. Every step, each shard copies the `halo` cells around its
+    interior from the shared world, runs the unmodified forward and physics kernels on interior plus halo,
+    and writes its interior back. Garbage from the local wraparound travels at most STEP_RADIUS kernel radii
+    per step, so with the default halo the interior matches an unsharded step, except that the forcing noise is
+    drawn per shard (forcing=False turns it off). ch_norm's statistics in activate_outputs are reduced over the
+    whole world (see ShardActivationSpec).
+
+    The population stays in the coordinating process: radiation, culling and rendering happen between
+    step() calls on the shared world, and the weight bank is sent to the shards with every call.
+
+    Usage:
+    - world = ShardedWorld(evolver, shards=(4, 4), threads_per_shard=2)
+    - world.start(); world.run(10000, vis); world.close()
+    """
+    def __init__(self, evolver, shards=(2, 2), halo=None, threads_per_shard=1, seed=0, forcing=True):
+        substrate = evolver.substrate
+        if substrate.mem.device.type != "cpu":
+            raise ValueError("ShardedWorld: Shards share the world through host shared memory, the substrate must be on the cpu.")
+        min_halo = STEP_RADIUS * int(evolver.kernel.abs().max())
+        halo = min_halo if halo is None else halo
+        if halo < min_halo:
+            raise ValueError(f"ShardedWorld: A halo of {halo} cells is too small for one step, it needs at least {min_halo}.")
+        self.evolver = evolver
+        self.substrate = substrate
+        self.halo = halo
+        self.threads_per_shard = threads_per_shard
+        self.seed = seed
+        self.forcing = forcing
+        self.windows = [ShardWindow((xb, yb), halo, substrate.w, substrate.h)
+                        for xb in split_range(substrate.w, shards[0])
+                        for yb in split_range(substrate.h, shards[1])]
+        self.n_shards = len(self.windows)
+        self.mp_context = multiprocessing.get_context("spawn")
+        self.procs = None
+        self.commands = None
+        self.results = None
+        self.barrier = None
+        self.norm_mem = None
+
+    def start(self):
+        if self.procs is not None:
+            return
+        # In place: the evolver, renderer, etc. keep working on the same (now shared) tensor
+        self.substrate.mem.share_memory_()
+        n_norm_chs = self.evolver.activation_spec.norm_chinds.shape[0]
+        self.norm_mem = torch.zeros((1, n_norm_chs, self.substrate.w, self.substrate.h),
+                                    dtype=self.substrate.mem.dtype).share_memory_()
+        self.barrier = self.mp_context.Barrier(self.n_shards)
+        self.commands = [self.mp_context.Queue() for _ in range(self.n_shards)]
+        self.results = self.mp_context.Queue()
+        # spawn, not fork: a forked child would inherit this process' Taichi runtime
+        self.procs = [self.mp_context.Process(
+            target=_run_shard, name=f"shard_{i}",
+            args=(i, window, self.substrate.layout_header(), self.evolver.init_args, self.substrate.mem, self.norm_mem,
+                  self.barrier, self.commands[i], self.results, self.seed, self.threads_per_shard, self.forcing))
+            for i, window in enumerate(self.windows)]
+        for proc in self.procs:
+            proc.start()
+        self._collect()
+
+    def _collect(self):
+        errors = []
+        n_results = 0
+        while n_results < self.n_shards:
+            try:
+                status, shard_id, payload = self.results.get(timeout=1.0)
+            except queue.Empty:
+                # A shard that crashed hard (e.g. a segfault) never reports, and the others wait for it at the barrier
+                dead = [f"shard {i} exited with code {proc.exitcode}" for i, proc in enumerate(self.procs)
+                        if not proc.is_alive()]
+                if dead:
+                    self.barrier.abort()
+                    errors += dead
+                    break
+                continue
+            n_results += 1
+            if status == "error":
+                errors.append(f"shard {shard_id}:\n{payload}")
+        if errors:
+            self.close()
+            raise RuntimeError("ShardedWorld: " + "\n".join(errors))
+
+    def step(self, n_steps=1):
+        """Advances every shard n_steps, blocking until all are done."""
+        if self.procs is None:
+            raise ValueError("ShardedWorld: Call start() before stepping.")
+        weights = torch.stack(self.evolver.combined_weights, dim=0).to(self.substrate.torch_dtype)
+        biases = torch.stack(self.evolver.combined_biases, dim=0).to(self.substrate.torch_dtype)
+        for commands in self.commands:
+            commands.put(("step", self.evolver.timestep, n_steps, weights, biases))
+        self._collect()
+        self.evolver.timestep += n_steps
+        self.evolver.ages = [age + n_steps for age in self.evolver.ages]
+
+    def run(self, n_timesteps, vis=None, n_rad_spots=5, radiate_interval=50, cull_max_pop=100, cull_interval=100):
+        """
+        Like SpaceEvolver.run, but the shards step radiate_interval steps at a time and radiation, culling and
+        rendering happen between those chunks.
+        """
+        evolver = self.evolver
+        end_timestep = evolver.timestep + n_timesteps
+        while evolver.timestep < end_timestep and (vis is None or vis.running):
+            n_steps = min(radiate_interval - evolver.timestep % radiate_interval, end_timestep - evolver.timestep)
+            self.step(n_steps)
+            if vis is not None:
+                vis.update()
+            if evolver.timestep % radiate_interval == 0:
+                evolver.apply_radiation_mutation(n_rad_spots)
+            if len(evolver.genomes) > cull_max_pop and (evolver.timestep - evolver.time_last_cull) > cull_interval:
+                evolver.reduce_population_to_threshold(cull_max_pop)
+
+    def close(self):
+        if self.procs is None:
+            return
+        for proc, commands in zip(self.procs, self.commands):
+            if proc.is_alive():
+                commands.put(("stop",))
+        for proc in self.procs:
+            proc.join()
+        self.procs = None
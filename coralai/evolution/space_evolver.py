@@ -1,29 +1,95 @@
 import copy
 from datetime import datetime
 import os
+import pickle
 import random
+import shutil
+import threading
+import zlib
 import numpy as np
 from neat.reporting import ReporterSet
-from neat.reporting import BaseReporter
 
 import torch
 import neat
-from neat.six_util import iteritems, itervalues
 
 import taichi as ti
 import torch.nn as nn
 
 
-from coralai.instances.coral.coral_physics import invest_liquidate, explore_physics, energy_physics, activate_outputs, apply_weights_and_biases
+from coralai.instances.coral.coral_physics import (invest_liquidate, explore_physics, energy_physics, activate_outputs,
+                                                   apply_weights_and_biases, apply_weights_and_biases_active,
+                                                   compact_active_cells, warmup_kernels, ActivityTiles, ActivationSpec)
 
 # from pytorch_neat.cppn import create_cppn
-from pytorch_neat.activations import identity_activation
-from pytorch_neat.linear_net import LinearNet
 from ..substrate.nn_lib import ch_norm
+from ..substrate.substrate import Substrate
+from ..substrate.render_scheduler import RenderScheduler
+from ..utils.profiler import NULL_PROFILER
+
+CHECKPOINT_VERSION = 1
+
+
+def get_rng_state(torch_device):
+    state = {
+        "random": random.getstate(),
+        "numpy": np.random.get_state(),
+        "torch": torch.get_rng_state(),
+    }
+    if torch.device(torch_device).type == "cuda":
+        state["cuda"] = torch.cuda.get_rng_state_all()
+    elif torch.device(torch_device).type == "mps":
+        state["mps"] = torch.mps.get_rng_state()
+    return state
+
+
+def set_rng_state(state, torch_device):
+    random.setstate(state["random"])
+    np.random.set_state(state["numpy"])
+    torch.set_rng_state(state["torch"])
+    if "cuda" in state and torch.device(torch_device).type == "cuda":
+        torch.cuda.set_rng_state_all(state["cuda"])
+    elif "mps" in state and torch.device(torch_device).type == "mps":
+        torch.mps.set_rng_state(state["mps"])
+
+
+def mem_bits(mem):
+    # Raw bit pattern of a cpu tensor, so that XOR against a keyframe is zero wherever a value is unchanged
+    arr = mem.numpy()
+    return arr.view(np.dtype(f"u{arr.dtype.itemsize}"))
+
+
+def replace_dir(src, dst):
+    # Swaps src into dst, only ever leaving a complete folder at dst
+    old = f"{dst}.old-{os.getpid()}"
+    if os.path.exists(dst):
+        os.rename(dst, old)
+    os.rename(src, dst)
+    if os.path.exists(old):
+        shutil.rmtree(old)
+
+# Module level rather than a data_oriented method, which would be compiled again for every evolver instance
+@ti.kernel
+def replace_genomes(mem: ti.types.ndarray(), out_mem: ti.types.ndarray(),
+                    genome_transitions: ti.types.ndarray(), ti_indices: ti.template()):
+    inds = ti_indices[None]
+    for i, j in ti.ndrange(mem.shape[2], mem.shape[3]):
+        if mem[0, inds.genome, i, j] < 0:
+            out_mem[i, j] = mem[0, inds.genome, i, j]
+        else:
+            out_mem[i, j] = genome_transitions[int(mem[0, inds.genome, i, j])]
+
 
 @ti.data_oriented
 class SpaceEvolver():
     def __init__(self, config_path, substrate, kernel, dir_order, sense_chs, act_chs):
+        self._setup(config_path, substrate, kernel, dir_order, sense_chs, act_chs)
+        self.init_population()
+        self.init_substrate(self.genomes)
+
+
+    def _setup(self, config_path, substrate, kernel, dir_order, sense_chs, act_chs):
+        self.init_args = {"config_path": config_path, "kernel": kernel, "dir_order": dir_order,
+                          "sense_chs": sense_chs, "act_chs": act_chs}
         torch_device = substrate.torch_device
         self.torch_device = torch_device
         self.substrate = substrate
@@ -53,24 +119,59 @@ class SpaceEvolver():
         self.energy_offset = 0.0
 
         self.genomes = []
+        # Stable ids that survive culling/renumbering, used to diff populations between checkpoints
+        self.genome_ids = []
+        self.next_genome_id = 0
         self.ages = []
         self.combined_weights = []
         self.combined_biases = []
-        self.init_population()
-        self.init_substrate(self.genomes)
         self.time_last_cull = 0
+        self.checkpoint_dir = None
+        self.checkpoint_thread = None
+        self.checkpoint_error = None
+        self.n_since_keyframe = 0
+        self.last_checkpoint_path = None
+        self.checkpointed_genome_ids = set()
+        self.keyframe_path = None
+        self.keyframe_bits = None
+        self.genome_palette = None
+        self.profiler = NULL_PROFILER
+        # Run forward and explore only over live cells and their frontier (see compact_active_cells)
+        self.sparse = True
+        self.active_cells = None
+        self.n_active = None
+        # ActivityTiles, see enable_activity_tiles
+        self.activity_tiles = None
+        self.activation_spec = ActivationSpec(substrate)
     
 
-    def run(self, n_timesteps, vis, n_rad_spots, radiate_interval, cull_max_pop, cull_interval=100):
-        timestep = 0
-        while timestep < n_timesteps and vis.window.running:
+    def run(self, n_timesteps, vis, n_rad_spots, radiate_interval, cull_max_pop, cull_interval=100, recorder=None,
+            checkpoint_interval=None, keyframe_interval=None, render_fps=None, telemetry=None):
+        # Continues from self.timestep so that a run restored from a checkpoint picks up where it left off
+        # With render_fps set, frames are rendered at that rate instead of every step (see RenderScheduler)
+        scheduler = RenderScheduler(vis, target_fps=render_fps) if render_fps is not None else None
+        timestep = self.timestep
+        end_timestep = self.timestep + n_timesteps
+        while timestep < end_timestep and vis.running:
             combined_weights = torch.stack(self.combined_weights, dim=0)
             combined_biases = torch.stack(self.combined_biases, dim=0)
             self.step_sim(combined_weights, combined_biases)
+            if recorder is not None:
+                with self.profiler.stage("record"):
+                    recorder.record(self.timestep)
+            # The UI only reads telemetry when it draws, so the reductions run once per frame, not per step
+            if telemetry is not None and (scheduler is None or scheduler.frame_due()):
+                telemetry.record(self.timestep, n_genomes=len(self.genomes), population=len(self.genomes),
+                                 energy_offset=self.energy_offset)
             # self.report_if_necessary(timestep)
-            vis.update()
+            with self.profiler.stage("render"):
+                if scheduler is None:
+                    vis.update()
+                else:
+                    scheduler.publish()
             if timestep % radiate_interval == 0:
-                self.apply_radiation_mutation(n_rad_spots)
+                with self.profiler.stage("radiation"):
+                    self.apply_radiation_mutation(n_rad_spots)
                 print("RADIATING")
             if vis.next_generation:
                 vis.next_generation = False
@@ -78,34 +179,71 @@ class SpaceEvolver():
             if len(self.genomes) > cull_max_pop and (self.timestep - self.time_last_cull) > cull_interval:
                 # self.cull_genomes(cull_cell_thresh, cull_age_thresh)
                 # if len(self.genomes) > cull_max_pop:
-                self.reduce_population_to_threshold(cull_max_pop)
+                with self.profiler.stage("cull"):
+                    self.reduce_population_to_threshold(cull_max_pop)
             timestep += 1
             self.timestep = timestep
+            if checkpoint_interval is not None and self.timestep % checkpoint_interval == 0:
+                # Every keyframe_interval-th checkpoint is a keyframe, the ones in between are deltas
+                delta = keyframe_interval is not None and self.n_since_keyframe < keyframe_interval - 1
+                with self.profiler.stage("checkpoint"):
+                    self.save_checkpoint(os.path.join(self.checkpoint_dir, f"step_{self.timestep}"), delta=delta)
 
     
     def step_sim(self, combined_weights, combined_biases):
-        inds = self.substrate.ti_indices[None]
         self.forward(combined_weights, combined_biases)
+        with self.profiler.stage("forcing"):
+            self.ages = [age + 1 for age in self.ages]
+            self.apply_forcing()
+            if self.timestep % 50 == 0:
+                self.kill_random_chunk(5)
+
+
+    def enable_activity_tiles(self, tile_size=16, verify=False):
+        """Skips quiescent tiles in distribute_energy/distribute_infra, verify=True checks every step against the dense kernels."""
+        self.activity_tiles = ActivityTiles(self.substrate, tile_size, verify)
+
+
+    def update_active_cells(self):
+        if self.active_cells is None:
+            self.active_cells = torch.zeros((self.substrate.w * self.substrate.h, 2), dtype=torch.int32, device=self.torch_device)
+            self.n_active = torch.zeros(1, dtype=torch.int32, device=self.torch_device)
+        compact_active_cells(self.substrate.mem, self.active_cells, self.n_active, self.kernel, self.substrate.ti_indices)
+
+
+    def apply_forcing(self):
+        inds = self.substrate.ti_indices[None]
         self.energy_offset = self.get_energy_offset(self.timestep)
-        self.ages = [age + 1 for age in self.ages]
         self.substrate.mem[0, inds.energy] += (torch.randn_like(self.substrate.mem[0, inds.energy]) + self.energy_offset) * 0.1
         self.substrate.mem[0, inds.infra] += (torch.randn_like(self.substrate.mem[0, inds.energy]) + self.energy_offset) * 0.1
         self.substrate.mem[0, inds.energy] = torch.clamp(self.substrate.mem[0, inds.energy], 0.01, 100)
         self.substrate.mem[0, inds.infra] = torch.clamp(self.substrate.mem[0, inds.infra], 0.01, 100)
-        if self.timestep % 50 == 0:
-            self.kill_random_chunk(5)
     
 
     def forward(self, weights, biases):
         inds = self.substrate.ti_indices[None]
-        out_mem = torch.zeros_like(self.substrate.mem[0, self.act_chinds])
-        apply_weights_and_biases(
-            self.substrate.mem, out_mem,
-            self.sense_chinds,
-            weights, biases,
-            self.dir_kernel, self.dir_order,
-            self.substrate.ti_indices)
-        self.substrate.mem[0, self.act_chinds] = out_mem
+        with self.profiler.stage("forward"):
+            # Kernels are compiled per ndarray dtype, so keep the weights in the substrate's dtype
+            weights = weights.to(self.substrate.torch_dtype)
+            biases = biases.to(self.substrate.torch_dtype)
+            out_mem = torch.zeros_like(self.substrate.mem[0, self.act_chinds])
+            if self.sparse:
+                self.update_active_cells()
+                apply_weights_and_biases_active(
+                    self.substrate.mem, out_mem,
+                    self.sense_chinds,
+                    weights, biases,
+                    self.dir_kernel, self.dir_order,
+                    self.active_cells, self.n_active,
+                    self.substrate.ti_indices)
+            else:
+                apply_weights_and_biases(
+                    self.substrate.mem, out_mem,
+                    self.sense_chinds,
+                    weights, biases,
+                    self.dir_kernel, self.dir_order,
+                    self.substrate.ti_indices)
+            self.substrate.mem[0, self.act_chinds] = out_mem
         self.apply_physics()
     
 
@@ -113,16 +251,24 @@ class SpaceEvolver():
     def apply_physics(self):
         inds = self.substrate.ti_indices[None]
         # self.substrate.mem[0, inds.energy, self.substrate.w//2, self.substrate.h//2] += 10
-        activate_outputs(self.substrate)
-        invest_liquidate(self.substrate)
-        explore_physics(self.substrate, self.kernel, self.dir_order)
-        energy_physics(self.substrate, self.kernel, max_infra=10, max_energy=1.5)
+        with self.profiler.stage("activate"):
+            activate_outputs(self.substrate, self.activation_spec)
+        with self.profiler.stage("invest"):
+            invest_liquidate(self.substrate)
+        with self.profiler.stage("explore"):
+            if self.sparse:
+                # The genome channel hasn't changed since forward, so its active set still holds
+                explore_physics(self.substrate, self.kernel, self.dir_order, self.active_cells, self.n_active)
+            else:
+                explore_physics(self.substrate, self.kernel, self.dir_order)
+        with self.profiler.stage("energy"):
+            energy_physics(self.substrate, self.kernel, max_infra=10, max_energy=1.5, tiles=self.activity_tiles)
 
-        self.substrate.mem[0, inds.genome] = torch.where(
-            (self.substrate.mem[0, inds.infra] + self.substrate.mem[0, inds.energy]) > 0.05,
-            self.substrate.mem[0, inds.genome],
-            -1
-        )
+            self.substrate.mem[0, inds.genome] = torch.where(
+                (self.substrate.mem[0, inds.infra] + self.substrate.mem[0, inds.energy]) > 0.05,
+                self.substrate.mem[0, inds.genome],
+                -1
+            )
 
 
     def produce_alternating_order(self, len):
@@ -139,16 +285,6 @@ class SpaceEvolver():
         return torch.tensor(order, device = self.torch_device)
     
 
-    @ti.kernel
-    def replace_genomes(self, mem: ti.types.ndarray(), out_mem: ti.types.ndarray(),
-                        genome_transitions: ti.types.ndarray(), ti_indices: ti.template()):
-        inds = ti_indices[None]
-        for i, j in ti.ndrange(mem.shape[2], mem.shape[3]):
-            if mem[0, inds.genome, i, j] < 0:
-                out_mem[i, j] = mem[0, inds.genome, i, j]
-            else:
-                out_mem[i, j] = genome_transitions[int(mem[0, inds.genome, i, j])]
-
     def reduce_population_to_threshold(self, max_population):
         print(f"REDUCING pop to max of {max_population} from current size: {len(self.genomes)}")
         if len(self.genomes) <= max_population:
@@ -160,42 +296,192 @@ class SpaceEvolver():
         # Sort genomes by cell count (ascending) to identify those with the lowest count
         sorted_genomes_by_cell_count = sorted(genome_cell_counts, key=lambda x: x[1], reverse=True)
         new_genomes = []
+        new_genome_ids = []
         new_ages = []
         new_combined_weights = []
         new_combined_biases = []
         genome_transitions = [None] * len(self.genomes)
         for i in range(len(sorted_genomes_by_cell_count)):
             index_of_genome = sorted_genomes_by_cell_count[i][0]
-            if i > max_population:
+            if i >= max_population:
                 print(f"KILLING {index_of_genome}")
                 genome_transitions[index_of_genome] = -1
             else:
                 new_genomes.append(self.genomes[index_of_genome])
+                new_genome_ids.append(self.genome_ids[index_of_genome])
                 new_ages.append(self.ages[index_of_genome])
                 new_combined_weights.append(self.combined_weights[index_of_genome])
                 new_combined_biases.append(self.combined_biases[index_of_genome])
-                genome_transitions[index_of_genome] = len(new_genomes)
-        genome_transitions = torch.tensor(genome_transitions, device = self.torch_device)
+                genome_transitions[index_of_genome] = len(new_genomes) - 1
+        genome_transitions = torch.tensor(genome_transitions, dtype=torch.int64, device = self.torch_device)
         out_mem = torch.zeros_like(self.substrate.mem[0, inds.genome])
-        self.replace_genomes(self.substrate.mem, out_mem, genome_transitions, self.substrate.ti_indices)
+        replace_genomes(self.substrate.mem, out_mem, genome_transitions, self.substrate.ti_indices)
         self.substrate.mem[0, inds.genome] = out_mem 
 
         self.genomes = new_genomes
+        self.genome_ids = new_genome_ids
         self.ages = new_ages
         self.combined_weights = new_combined_weights
         self.combined_biases = new_combined_biases
+        self.update_genome_palette()
         self.time_last_cull = self.timestep
         print(f"\tPop size after reduction: {len(self.genomes)}")
         if len(self.genomes) == 0:
             print("NO GENOMES LEFT. REINITIALIZING")
-            self.genomes = self.init_population()
+            self.init_population()
             self.init_substrate(self.genomes)
 
 
-    def save_checkpoint(self, folderpath):
-        # Saves population, substrate (mem and metadata)
-        pass
-    
+    def save_checkpoint(self, folderpath, blocking=False, delta=False):
+        """
+        Saves substrate memory, genomes, ages, the weight bank, the timestep and RNG state to folderpath.
+        State is copied on the calling thread and written from a background thread into a temporary
+        folder that is renamed into place, so a crash never leaves a partial checkpoint behind.
+
+        With delta=True only genomes added since the previous checkpoint, the ids removed since then and
+        the substrate XORed against the last full keyframe (zlib compressed) are written. Delta checkpoints
+        link to the previous checkpoint in the same folder, which from_checkpoint replays.
+        """
+        self.wait_for_checkpoint()
+        if self.keyframe_bits is None:
+            delta = False
+        mem = self.substrate.mem.clone()
+        state = {
+            "version": CHECKPOINT_VERSION,
+            "init_args": self.init_args,
+            "genome_ids": list(self.genome_ids),
+            "next_genome_id": self.next_genome_id,
+            "ages": list(self.ages),
+            "timestep": self.timestep,
+            "time_last_cull": self.time_last_cull,
+            "energy_offset": self.energy_offset,
+            "rng_state": get_rng_state(self.torch_device),
+        }
+        if delta:
+            added = [i for i, genome_id in enumerate(self.genome_ids) if genome_id not in self.checkpointed_genome_ids]
+            state["delta"] = {
+                "keyframe": os.path.basename(self.keyframe_path),
+                "prev": os.path.basename(self.last_checkpoint_path),
+                "added_ids": [self.genome_ids[i] for i in added],
+                "removed_ids": sorted(self.checkpointed_genome_ids - set(self.genome_ids)),
+            }
+        else:
+            added = list(range(len(self.genomes)))
+        state["genomes"] = pickle.dumps([self.genomes[i] for i in added], protocol=pickle.HIGHEST_PROTOCOL)
+        state["combined_weights"] = [self.combined_weights[i].clone() for i in added]
+        state["combined_biases"] = [self.combined_biases[i].clone() for i in added]
+
+        self.checkpointed_genome_ids = set(self.genome_ids)
+        self.last_checkpoint_path = folderpath
+        if delta:
+            self.n_since_keyframe += 1
+        else:
+            self.keyframe_path = folderpath
+            self.n_since_keyframe = 0
+        self.checkpoint_thread = threading.Thread(
+            target=self._write_checkpoint, args=(folderpath, mem, state), name="SpaceEvolverCheckpoint")
+        self.checkpoint_thread.start()
+        if blocking:
+            self.wait_for_checkpoint()
+
+
+    def _write_checkpoint(self, folderpath, mem, state):
+        try:
+            state["combined_weights"] = [w.cpu() for w in state["combined_weights"]]
+            state["combined_biases"] = [b.cpu() for b in state["combined_biases"]]
+            mem = mem.cpu()
+            tmp_path = f"{folderpath}.tmp-{os.getpid()}"
+            if os.path.exists(tmp_path):
+                shutil.rmtree(tmp_path)
+            os.makedirs(tmp_path)
+            if "delta" in state:
+                state["substrate_xor"] = zlib.compress((mem_bits(mem) ^ self.keyframe_bits).tobytes(), 1)
+            else:
+                self.substrate.save_snapshot(os.path.join(tmp_path, "substrate"), mem=mem)
+            with open(os.path.join(tmp_path, "evolver.pkl"), 'wb') as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            replace_dir(tmp_path, folderpath)
+            if "delta" not in state:
+                self.keyframe_bits = mem_bits(mem)
+            print(f"Saved {'delta ' if 'delta' in state else ''}checkpoint to {folderpath}")
+        except Exception as e:  # raised on the sim thread by wait_for_checkpoint
+            self.checkpoint_error = e
+
+
+    def wait_for_checkpoint(self):
+        if self.checkpoint_thread is not None:
+            self.checkpoint_thread.join()
+            self.checkpoint_thread = None
+        if self.checkpoint_error is not None:
+            error, self.checkpoint_error = self.checkpoint_error, None
+            # The failed checkpoint can't be diffed against, so the next one starts a new keyframe
+            self.keyframe_bits = None
+            raise RuntimeError(f"SpaceEvolver: Checkpoint failed: {error}") from error
+
+
+    @staticmethod
+    def load_checkpoint_state(folderpath):
+        with open(os.path.join(folderpath, "evolver.pkl"), 'rb') as f:
+            state = pickle.load(f)
+        if state.get("version") != CHECKPOINT_VERSION:
+            raise ValueError(f"SpaceEvolver: Unsupported checkpoint version {state.get('version')} in {folderpath}")
+        return state
+
+
+    @classmethod
+    def from_checkpoint(cls, folderpath, torch_device=None, config_path=None):
+        """Restores an evolver (and its substrate) saved by save_checkpoint, including RNG state."""
+        folderpath = os.path.abspath(folderpath)
+        chain = [(folderpath, cls.load_checkpoint_state(folderpath))]
+        while "delta" in chain[-1][1]:
+            prev_path = os.path.join(os.path.dirname(folderpath), chain[-1][1]["delta"]["prev"])
+            chain.append((prev_path, cls.load_checkpoint_state(prev_path)))
+        keyframe_path, keyframe_state = chain[-1]
+        state = chain[0][1]
+
+        substrate = Substrate.load(os.path.join(keyframe_path, "substrate"), torch_device=torch_device)
+        keyframe_bits = mem_bits(substrate.mem.cpu()).copy()
+        if "delta" in state:
+            bits = np.frombuffer(zlib.decompress(state["substrate_xor"]), dtype=keyframe_bits.dtype)
+            bits = bits.reshape(keyframe_bits.shape) ^ keyframe_bits
+            mem = torch.from_numpy(bits.view(substrate.mem.cpu().numpy().dtype).copy())
+            substrate.mem[:] = mem.to(substrate.torch_device)
+
+        genomes, weights, biases = {}, {}, {}
+        for _, link_state in reversed(chain):
+            ids = link_state["delta"]["added_ids"] if "delta" in link_state else link_state["genome_ids"]
+            genomes.update(zip(ids, pickle.loads(link_state["genomes"])))
+            weights.update(zip(ids, link_state["combined_weights"]))
+            biases.update(zip(ids, link_state["combined_biases"]))
+            for genome_id in link_state.get("delta", {}).get("removed_ids", []):
+                genomes.pop(genome_id)
+                weights.pop(genome_id)
+                biases.pop(genome_id)
+
+        init_args = dict(state["init_args"])
+        if config_path is not None:
+            init_args["config_path"] = config_path
+        evolver = cls.__new__(cls)
+        evolver._setup(substrate=substrate, **init_args)
+        evolver.genome_ids = list(state["genome_ids"])
+        evolver.next_genome_id = state["next_genome_id"]
+        evolver.genomes = [genomes[i] for i in evolver.genome_ids]
+        evolver.combined_weights = [weights[i].to(substrate.torch_device) for i in evolver.genome_ids]
+        evolver.combined_biases = [biases[i].to(substrate.torch_device) for i in evolver.genome_ids]
+        evolver.ages = state["ages"]
+        evolver.timestep = state["timestep"]
+        evolver.time_last_cull = state["time_last_cull"]
+        evolver.energy_offset = state["energy_offset"]
+        evolver.checkpoint_dir = os.path.dirname(folderpath)
+        evolver.last_checkpoint_path = folderpath
+        evolver.checkpointed_genome_ids = set(evolver.genome_ids)
+        evolver.keyframe_path = keyframe_path
+        evolver.keyframe_bits = keyframe_bits
+        evolver.n_since_keyframe = len(chain) - 1
+        set_rng_state(state["rng_state"], substrate.torch_device)
+        return evolver
+
+
     def report_if_necessary(self, fitness_function, n=None):
         for i in range(len(self.genomes)):
             # org['genome'].fitness += self.substrate.mem[0, inds.genome].eq(i).sum().item()
@@ -274,6 +560,9 @@ class SpaceEvolver():
     def add_organism_get_key(self, genome):
         # TODO: implement culling and memory consolidation
         self.genomes.append(genome)
+        self.genome_ids.append(self.next_genome_id)
+        self.next_genome_id += 1
+        self.update_genome_palette()
         net = self.create_torch_net(genome)
         self.combined_weights.append(net.weights)
         self.combined_biases.append(net.biases)
@@ -281,6 +570,33 @@ class SpaceEvolver():
         return len(self.combined_biases) - 1
     
 
+    def set_genome_palette(self, genome_palette):
+        # Keeps the palette's colors in sync with genome indices as genomes are added and culled
+        self.genome_palette = genome_palette
+        self.update_genome_palette()
+
+
+    def warmup(self):
+        """Compiles the step and culling kernels up front, so the first step isn't stalled by JIT compilation."""
+        warmup_kernels(self.substrate, self.kernel, self.dir_kernel, self.dir_order, self.sense_chinds, self.n_acts)
+        inds = self.substrate.ti_indices[None]
+        mem = self.substrate.mem[:, :, :2, :2].clone()
+        mem[0, inds.genome] = 0
+        genome_transitions = torch.tensor([0], dtype=torch.int64, device=self.torch_device)
+        replace_genomes(mem, torch.zeros_like(mem[0, inds.genome]), genome_transitions, self.substrate.ti_indices)
+        ti.sync()
+
+
+    def set_profiler(self, profiler):
+        # Times the stages of run()/step_sim, see StageProfiler
+        self.profiler = NULL_PROFILER if profiler is None else profiler
+
+
+    def update_genome_palette(self):
+        if self.genome_palette is not None:
+            self.genome_palette.update(self.genome_ids)
+
+
     def set_chunk(self, genome_key, x, y, radius):
         inds = self.substrate.ti_indices[None]
         self.substrate.mem[0, inds.genome, x%self.substrate.w, y%self.substrate.h] = genome_key
@@ -331,6 +647,9 @@ class SpaceEvolver():
 
 
     def create_torch_net(self, genome):
+        # Imported here so that loading checkpoints and tooling don't pay for pytorch_neat at import time
+        from pytorch_neat.activations import identity_activation
+        from pytorch_neat.linear_net import LinearNet
         input_coords = []
         # TODO: adjust for direcitonal kernel
         for ch in range(self.n_senses):
@@ -363,6 +682,35 @@ class SpaceEvolver():
         infra_sum = torch.where(self.substrate.mem[0, inds.genome] == genome_key, self.substrate.mem[0, inds.infra], 0).sum()
         return infra_sum
 
+
+    def get_genome_cell_counts(self):
+        """Number of cells held by each genome, as a device tensor indexed like self.genomes."""
+        inds = self.substrate.ti_indices[None]
+        genome_inds = self.substrate.mem[0, inds.genome].long().flatten()
+        valid = (genome_inds >= 0) & (genome_inds < len(self.genomes))
+        counts = torch.zeros(len(self.genomes), dtype=torch.int64, device=self.torch_device)
+        counts.scatter_add_(0, genome_inds.clamp(0, max(len(self.genomes) - 1, 0)), valid.long())
+        return counts
+
+
+    def top_genomes(self, n):
+        """The n genomes holding the most cells, most first."""
+        counts = self.get_genome_cell_counts()
+        order = torch.argsort(counts, descending=True)[:n].tolist()
+        return [self.genomes[i] for i in order]
+
+
+    def add_immigrants(self, genomes, radius=2):
+        """Adds genomes from elsewhere (e.g. another island) and seeds each in a random chunk of the substrate."""
+        keys = []
+        for genome in genomes:
+            genome_key = self.add_organism_get_key(genome)
+            x = np.random.randint(0, self.substrate.w)
+            y = np.random.randint(0, self.substrate.h)
+            self.set_chunk(genome_key, x, y, radius)
+            keys.append(genome_key)
+        return keys
+
     # def cull_genomes(self, n_cells_thresh, age_thresh):
     #     print(f"CULLING pop of size: {len(self.genomes)}")
     #     inds = self.substrate.ti_indices[None]
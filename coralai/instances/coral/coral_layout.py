@@ -0,0 +1,48 @@
+import os
+import torch
+import taichi as ti
+
+from ...substrate.substrate import Substrate
+
+# The coral world used by the benchmarks and tests: channels, neighborhoods and the evolver's senses/actions
+CHANNELS = {
+    "energy": ti.f32,
+    "infra": ti.f32,
+    "acts": ti.types.struct(
+        invest=ti.f32,
+        liquidate=ti.f32,
+        explore=ti.types.vector(n=4, dtype=ti.f32)
+    ),
+    "com": ti.types.struct(a=ti.f32, b=ti.f32, c=ti.f32, d=ti.f32),
+    "rot": ti.f32,
+    "genome": ti.f32,
+}
+KERNELS = {
+    # center first, then the directional neighbors ccw
+    5: [[0, 0], [1, 0], [0, 1], [-1, 0], [0, -1]],
+    9: [[0, 0], [1, 0], [1, 1], [0, 1], [-1, 1], [-1, 0], [-1, -1], [0, -1], [1, -1]],
+}
+DIR_ORDER = [0, -1, 1]
+SENSE_CHS = ['energy', 'infra', 'com']
+ACT_CHS = ['acts', 'com']
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), "coral_neat.config")
+
+
+def make_evolver(size, pop, kernel, torch_device, config_path=CONFIG_PATH, dir_order=DIR_ORDER):
+    """A SpaceEvolver on a (size, size) coral world with pop random genomes, kernel is 5 or 9 (KERNELS)."""
+    import neat
+    from ...evolution.space_evolver import SpaceEvolver
+    substrate = Substrate((size, size), torch.float32, torch_device, CHANNELS)
+    substrate.malloc()
+    # Skips __init__, which sizes the population from the config and creates a checkpoint folder
+    evolver = SpaceEvolver.__new__(SpaceEvolver)
+    evolver._setup(config_path, substrate, KERNELS[kernel], dir_order, SENSE_CHS, ACT_CHS)
+    for i in range(pop):
+        genome = neat.DefaultGenome(str(i))
+        genome.configure_new(evolver.neat_config.genome_config)
+        evolver.add_organism_get_key(genome)
+    evolver.init_substrate(evolver.genomes)
+    inds = substrate.ti_indices[None]
+    substrate.mem[0, inds.energy] = torch.rand_like(substrate.mem[0, inds.energy]) * 2
+    substrate.mem[0, inds.infra] = torch.rand_like(substrate.mem[0, inds.infra]) * 2 + 0.01
+    return evolver
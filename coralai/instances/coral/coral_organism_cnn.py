@@ -2,16 +2,21 @@ import torch
 import taichi as ti
 import torch.nn as nn
 
-from ...substrate.nn_lib import ch_norm
+from ...substrate.nn_lib import ch_norm, RunningChNorm
 from ...evolution.organism import Organism
+from ...evolution.cnn_inference import CNNInference
 
 @ti.data_oriented
 class CoralOrganism(Organism):
-    def __init__(self, substrate, kernel, sense_chs, act_chs, torch_device):
+    def __init__(self, substrate, kernel, sense_chs, act_chs, torch_device, running_norm = False):
         super().__init__(substrate, kernel, sense_chs, act_chs, torch_device)
         self.name = "CoralOrganism"
         latent_size = (self.n_senses + self.n_acts) // 2
         self.latent_size = latent_size
+        # A CNNInference engine, see compile_inference
+        self.inference = None
+        # With running_norm, ch_norm uses running statistics instead of reducing the grid every layer and step
+        self.norms = [RunningChNorm() if running_norm else None for _ in range(2)]
 
         # First convolutional layer
         self.conv = nn.Conv2d(
@@ -44,16 +49,27 @@ class CoralOrganism(Organism):
             bias=False
         )
     
+    def conv_layers(self):
+        """(conv, activated) per layer, activated layers are followed by ReLU, ch_norm and sigmoid."""
+        return [(self.conv, True), (self.latent_conv, True), (self.latent_conv_2, False)]
+
+    def compile_inference(self, **kwargs):
+        """Runs forward through a CNNInference engine built with kwargs (compile, channels_last, fuse_padding)."""
+        self.inference = CNNInference(self, **kwargs)
+        return self.inference
+
     def forward(self, x):
+        if self.inference is not None:
+            return self.inference(x[:, self.sense_chinds])
         with torch.no_grad():
             x = self.conv(x[:, self.sense_chinds])
             x = nn.ReLU()(x)
-            x = ch_norm(x)
+            x = ch_norm(x, self.norms[0])
             x = torch.sigmoid(x)
 
             x = self.latent_conv(x)
             x = nn.ReLU()(x)
-            x = ch_norm(x)
+            x = ch_norm(x, self.norms[1])
             x = torch.sigmoid(x)
 
             return self.latent_conv_2(x)
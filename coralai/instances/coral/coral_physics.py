@@ -1,34 +1,118 @@
+import types
 import torch
 import taichi as ti
-import torch.nn as nn
 
-from ...substrate.nn_lib import ch_norm
 
+# Activation ops, each applied per cell to a group of channels
+NORM_SIGMOID = 0        # sigmoid of each channel normalized by its mean and variance over the world (ch_norm)
+SOFTMAX = 1             # softmax over the group
+RELU_MEAN_SOFTMAX = 2   # relu, the first channel replaced by the group mean, then softmax over the group
 
-def activate_outputs(substrate):
-    inds = substrate.ti_indices[None]
-    substrate.mem[:, inds.com] = torch.sigmoid(ch_norm(substrate.mem[:, inds.com]))
-    substrate.mem[:, [inds.acts_invest, inds.acts_liquidate]] = torch.softmax(substrate.mem[0, [inds.acts_invest, inds.acts_liquidate]], dim=0)
+# (op, channel key) in the order they are applied, then the channels zeroed where genome < 0
+CORAL_ACTIVATIONS = [
+    (NORM_SIGMOID, "com"),
+    (SOFTMAX, ("acts", ["invest", "liquidate"])),
+    (RELU_MEAN_SOFTMAX, ("acts", "explore")),
+]
+CORAL_MASKED = "acts"
 
-    substrate.mem[:, inds.acts_explore] = nn.ReLU()(substrate.mem[:, inds.acts_explore])
-    mean_activation = torch.mean(substrate.mem[0, inds.acts_explore], dim=0)
-    substrate.mem[0, inds.acts_explore[0]] = mean_activation
-    substrate.mem[0, inds.acts_explore] = torch.softmax(substrate.mem[0, inds.acts_explore], dim=0)
 
-    substrate.mem[0, inds.acts] = torch.where(substrate.mem[0, inds.genome] < 0, 0, substrate.mem[0, inds.acts])
+class ActivationSpec:
+    """
+    A declarative list of (op, channel key) groups (keys as for substrate.windex) and the key of the channels
+    masked out in empty cells, resolved to memory indices and compiled into a fused activation kernel.
+    """
+    def __init__(self, substrate, groups=CORAL_ACTIVATIONS, masked=CORAL_MASKED):
+        device = substrate.mem.device
+        self.groups = tuple((op, tuple(int(c) for c in substrate.windex[key])) for op, key in groups)
+        self.masked_chinds = tuple(int(c) for c in substrate.windex[masked])
+        self.kernel = fused_activation_kernel(self.groups, self.masked_chinds)
+        norm_chinds = sorted({c for op, chinds in self.groups if op == NORM_SIGMOID for c in chinds})
+        self.norm_chinds = torch.tensor(norm_chinds, dtype=torch.int64, device=device)
+        # Contiguous channels are read as a view instead of gathered
+        contiguous = len(norm_chinds) > 0 and norm_chinds == list(range(norm_chinds[0], norm_chinds[-1] + 1))
+        self.norm_slice = slice(norm_chinds[0], norm_chinds[-1] + 1) if contiguous else None
+        # (mean, 1 / std) per memory channel, only the rows of normalized channels are used
+        self.stats = torch.zeros((substrate.mem.shape[1], 2), dtype=substrate.mem.dtype, device=device)
 
+    def update_stats(self, mem):
+        if self.norm_chinds.shape[0] == 0:
+            return
+        chs = mem[0, self.norm_slice] if self.norm_slice is not None else mem[0, self.norm_chinds]
+        var, mean = torch.var_mean(chs, dim=(1, 2), unbiased=False)
+        self.stats[self.norm_chinds, 0] = mean
+        self.stats[self.norm_chinds, 1] = torch.rsqrt(var + 1e-5)
 
-@ti.kernel
-def apply_weights_and_biases(mem: ti.types.ndarray(), out_mem: ti.types.ndarray(),
-                             sense_chinds: ti.types.ndarray(),
-                             combined_weights: ti.types.ndarray(), combined_biases: ti.types.ndarray(),
-                             dir_kernel: ti.types.ndarray(), dir_order: ti.types.ndarray(),
-                             ti_inds: ti.template()):
-    inds = ti_inds[None]
-    for i, j, act_k in ti.ndrange(mem.shape[2], mem.shape[3], out_mem.shape[0]):
-        val = 0.0
-        rot = mem[0, inds.rot, i, j]
-        genome_key = int(mem[0, inds.genome, i, j])
+
+_fused_activation_kernels = {}
+
+
+def fused_activation_kernel(groups, masked_chinds):
+    """
+    Returns the kernel applying groups ((op, chinds), ...) and then masking masked_chinds to every cell in one pass.
+    The groups are unrolled at compile time, so each distinct spec is compiled once and shared.
+    """
+    key = (groups, masked_chinds)
+    if key in _fused_activation_kernels:
+        return _fused_activation_kernels[key]
+
+    @ti.kernel
+    def fused_activation(mem: ti.types.ndarray(), stats: ti.types.ndarray(), ti_inds: ti.template()):
+        inds = ti_inds[None]
+        for i, j in ti.ndrange(mem.shape[2], mem.shape[3]):
+            for op, chinds in ti.static(groups):
+                if ti.static(op == NORM_SIGMOID):
+                    for c in ti.static(chinds):
+                        x = (mem[0, c, i, j] - stats[c, 0]) * stats[c, 1]
+                        mem[0, c, i, j] = 1.0 / (1.0 + ti.exp(-x))
+                else:
+                    if ti.static(op == RELU_MEAN_SOFTMAX):
+                        total = 0.0
+                        for c in ti.static(chinds):
+                            x = ti.max(mem[0, c, i, j], 0.0)
+                            mem[0, c, i, j] = x
+                            total += x
+                        mem[0, chinds[0], i, j] = total / ti.static(len(chinds))
+                    max_x = mem[0, chinds[0], i, j]
+                    for c in ti.static(chinds):
+                        max_x = ti.max(max_x, mem[0, c, i, j])
+                    total = 0.0
+                    for c in ti.static(chinds):
+                        e = ti.exp(mem[0, c, i, j] - max_x)
+                        mem[0, c, i, j] = e
+                        total += e
+                    for c in ti.static(chinds):
+                        mem[0, c, i, j] /= total
+            if mem[0, inds.genome, i, j] < 0:
+                for c in ti.static(masked_chinds):
+                    mem[0, c, i, j] = 0.0
+
+    _fused_activation_kernels[key] = fused_activation
+    return fused_activation
+
+
+def activate_outputs(substrate, spec: ActivationSpec = None):
+    """
+    Applies the activation groups of spec (CORAL_ACTIVATIONS by default) to substrate.mem in place:
+    one reduction for the normalization stats, then one fused pass over the cells.
+    """
+    if spec is None:
+        spec = ActivationSpec(substrate)
+    spec.update_stats(substrate.mem)
+    spec.kernel(substrate.mem, spec.stats, substrate.ti_indices)
+
+
+@ti.func
+def weights_and_biases_cell(mem: ti.template(), out_mem: ti.template(), sense_chinds: ti.template(),
+                            combined_weights: ti.template(), combined_biases: ti.template(),
+                            dir_kernel: ti.template(), dir_order: ti.template(), inds: ti.template(), i, j, act_k):
+    val = 0.0
+    rot = mem[0, inds.rot, i, j]
+    genome_key = int(mem[0, inds.genome, i, j])
+    # Empty cells (genome -1) have no weights, indexing with -1 would read before the weight bank
+    if genome_key < 0:
+        out_mem[act_k, i, j] = 0.0
+    else:
         for sense_ch_n in ti.ndrange(sense_chinds.shape[0]):
             # base case [0,0]
             start_weight_ind = sense_ch_n * (dir_kernel.shape[0]+1)
@@ -43,6 +127,91 @@ def apply_weights_and_biases(mem: ti.types.ndarray(), out_mem: ti.types.ndarray(
         out_mem[act_k, i, j] = val + combined_biases[genome_key, 0, act_k, 0]
 
 
+@ti.kernel
+def apply_weights_and_biases(mem: ti.types.ndarray(), out_mem: ti.types.ndarray(),
+                             sense_chinds: ti.types.ndarray(),
+                             combined_weights: ti.types.ndarray(), combined_biases: ti.types.ndarray(),
+                             dir_kernel: ti.types.ndarray(), dir_order: ti.types.ndarray(),
+                             ti_inds: ti.template()):
+    inds = ti_inds[None]
+    for i, j, act_k in ti.ndrange(mem.shape[2], mem.shape[3], out_mem.shape[0]):
+        weights_and_biases_cell(mem, out_mem, sense_chinds, combined_weights, combined_biases,
+                                dir_kernel, dir_order, inds, i, j, act_k)
+
+
+@ti.kernel
+def apply_weights_and_biases_active(mem: ti.types.ndarray(), out_mem: ti.types.ndarray(),
+                                    sense_chinds: ti.types.ndarray(),
+                                    combined_weights: ti.types.ndarray(), combined_biases: ti.types.ndarray(),
+                                    dir_kernel: ti.types.ndarray(), dir_order: ti.types.ndarray(),
+                                    active_cells: ti.types.ndarray(), n_active: ti.types.ndarray(),
+                                    ti_inds: ti.template()):
+    # Same as apply_weights_and_biases, over the cells listed by compact_active_cells. out_mem must start zeroed.
+    inds = ti_inds[None]
+    for n, act_k in ti.ndrange(n_active[0], out_mem.shape[0]):
+        weights_and_biases_cell(mem, out_mem, sense_chinds, combined_weights, combined_biases,
+                                dir_kernel, dir_order, inds, active_cells[n, 0], active_cells[n, 1], act_k)
+
+
+@ti.kernel
+def compact_active_cells(mem: ti.types.ndarray(), active_cells: ti.types.ndarray(), n_active: ti.types.ndarray(),
+                         kernel: ti.types.ndarray(), ti_inds: ti.template()):
+    """
+    Stream compaction of the active set: every cell with a live cell (genome >= 0) in its kernel neighborhood,
+    i.e. the live cells plus the frontier they can explore into. Indices go to active_cells[:n_active[0]] in no
+    particular order, and n_active stays on the device so the active kernels can use it without a sync.
+    """
+    inds = ti_inds[None]
+    n_active[0] = 0
+    for i, j in ti.ndrange(mem.shape[2], mem.shape[3]):
+        active = False
+        for off_n in ti.ndrange(kernel.shape[0]):
+            neigh_x = (i + kernel[off_n, 0]) % mem.shape[2]
+            neigh_y = (j + kernel[off_n, 1]) % mem.shape[3]
+            if mem[0, inds.genome, neigh_x, neigh_y] >= 0:
+                active = True
+        if active:
+            n = ti.atomic_add(n_active[0], 1)
+            active_cells[n, 0] = i
+            active_cells[n, 1] = j
+
+
+@ti.func
+def explore_cell(mem: ti.template(), max_act_i: ti.template(), infra_delta: ti.template(), energy_delta: ti.template(),
+                 winning_genomes: ti.template(), winning_rots: ti.template(),
+                 dir_kernel: ti.template(), dir_order: ti.template(), inds: ti.template(), i, j):
+    winning_genome = mem[0, inds.genome, i, j]
+    max_bid = mem[0, inds.energy, i, j]
+    winning_rot = mem[0, inds.rot, i, j]
+
+    for offset_n in ti.ndrange(dir_kernel.shape[0]): # this order doesn't matter
+        neigh_x = (i + dir_kernel[offset_n, 0]) % mem.shape[2]
+        neigh_y = (j + dir_kernel[offset_n, 1]) % mem.shape[3]
+        if mem[0, inds.genome, neigh_x, neigh_y] < 0:
+            continue
+        neigh_max_act_i = max_act_i[neigh_x, neigh_y] # Could be [0,0], so could overflow dir_kernel
+        if neigh_max_act_i == 0:
+            continue
+        neigh_max_act_i -= 1 # aligns with dir_kernel now
+        neigh_rot = mem[0, inds.rot, neigh_x, neigh_y] # represents the dir the cell is pointing
+        neigh_dir_ind = int((neigh_rot+dir_order[neigh_max_act_i]) % dir_kernel.shape[0])
+        neigh_dir_x = dir_kernel[neigh_dir_ind, 0]
+        neigh_dir_y = dir_kernel[neigh_dir_ind, 1]
+        bid = 0.0
+        # If neigh's explore dir points towards this center
+        if ((neigh_dir_x + dir_kernel[offset_n, 0]) == 0 and (neigh_dir_y + dir_kernel[offset_n, 1]) == 0):
+            bid = mem[0, inds.energy, neigh_x, neigh_y]
+            energy_delta[neigh_x, neigh_y] -= bid # bids are always taken as investment
+            bid = 0.9 # cost of dooing business
+            infra_delta[i, j] += bid
+            if bid > max_bid:
+                max_bid = bid
+                winning_genome = mem[0, inds.genome, neigh_x, neigh_y]
+                winning_rot = (neigh_rot+dir_order[neigh_max_act_i]) % dir_kernel.shape[0] # aligns with the dir the winning neighbor explored from
+    winning_genomes[i, j] = winning_genome
+    winning_rots[i, j] = winning_rot
+
+
 @ti.kernel
 def explore(mem: ti.types.ndarray(), max_act_i: ti.types.ndarray(),
             infra_delta: ti.types.ndarray(), energy_delta: ti.types.ndarray(),
@@ -50,50 +219,44 @@ def explore(mem: ti.types.ndarray(), max_act_i: ti.types.ndarray(),
             dir_kernel: ti.types.ndarray(), dir_order: ti.types.ndarray(), ti_inds: ti.template()):
     inds = ti_inds[None]
     for i, j in ti.ndrange(mem.shape[2], mem.shape[3]):
-        winning_genome = mem[0, inds.genome, i, j]
-        max_bid = mem[0, inds.energy, i, j]
-        winning_rot = mem[0, inds.rot, i, j]
-
-        for offset_n in ti.ndrange(dir_kernel.shape[0]): # this order doesn't matter
-            neigh_x = (i + dir_kernel[offset_n, 0]) % mem.shape[2]
-            neigh_y = (j + dir_kernel[offset_n, 1]) % mem.shape[3]
-            if mem[0, inds.genome, neigh_x, neigh_y] < 0:
-                continue
-            neigh_max_act_i = max_act_i[neigh_x, neigh_y] # Could be [0,0], so could overflow dir_kernel
-            if neigh_max_act_i == 0:
-                continue
-            neigh_max_act_i -= 1 # aligns with dir_kernel now
-            neigh_rot = mem[0, inds.rot, neigh_x, neigh_y] # represents the dir the cell is pointing
-            neigh_dir_ind = int((neigh_rot+dir_order[neigh_max_act_i]) % dir_kernel.shape[0])
-            neigh_dir_x = dir_kernel[neigh_dir_ind, 0]
-            neigh_dir_y = dir_kernel[neigh_dir_ind, 1]
-            bid = 0.0
-            # If neigh's explore dir points towards this center
-            if ((neigh_dir_x + dir_kernel[offset_n, 0]) == 0 and (neigh_dir_y + dir_kernel[offset_n, 1]) == 0):
-                bid = mem[0, inds.energy, neigh_x, neigh_y]
-                energy_delta[neigh_x, neigh_y] -= bid # bids are always taken as investment
-                bid = 0.9 # cost of dooing business
-                infra_delta[i, j] += bid
-                if bid > max_bid:
-                    max_bid = bid
-                    winning_genome = mem[0, inds.genome, neigh_x, neigh_y]
-                    winning_rot = (neigh_rot+dir_order[neigh_max_act_i]) % dir_kernel.shape[0] # aligns with the dir the winning neighbor explored from
-        winning_genomes[i, j] = winning_genome
-        winning_rots[i, j] = winning_rot
-
-
-def explore_physics(substrate, dir_kernel, dir_order):
+        explore_cell(mem, max_act_i, infra_delta, energy_delta, winning_genomes, winning_rots,
+                     dir_kernel, dir_order, inds, i, j)
+
+
+@ti.kernel
+def explore_active(mem: ti.types.ndarray(), max_act_i: ti.types.ndarray(),
+                   infra_delta: ti.types.ndarray(), energy_delta: ti.types.ndarray(),
+                   winning_genomes: ti.types.ndarray(), winning_rots: ti.types.ndarray(),
+                   dir_kernel: ti.types.ndarray(), dir_order: ti.types.ndarray(),
+                   active_cells: ti.types.ndarray(), n_active: ti.types.ndarray(), ti_inds: ti.template()):
+    # Same as explore, over the cells listed by compact_active_cells.
+    # Cells outside the list have no live neighbor, so winning_genomes/winning_rots must start as their own values.
+    inds = ti_inds[None]
+    for n in range(n_active[0]):
+        explore_cell(mem, max_act_i, infra_delta, energy_delta, winning_genomes, winning_rots,
+                     dir_kernel, dir_order, inds, active_cells[n, 0], active_cells[n, 1])
+
+
+def explore_physics(substrate, dir_kernel, dir_order, active_cells=None, n_active=None):
     inds = substrate.ti_indices[None]
 
     max_act_i = torch.argmax(substrate.mem[0, inds.acts_explore], dim=0) # be warned, this is the index of the actuator not the index in memory, so 0-6 not
     infra_delta = torch.zeros_like(substrate.mem[0, inds.infra])
     energy_delta = torch.zeros_like(infra_delta)
-    winning_genome = torch.zeros_like(substrate.mem[0, inds.genome])
-    winning_rots = torch.zeros_like(substrate.mem[0, inds.rot])
-    explore(substrate.mem, max_act_i,
-            infra_delta, energy_delta,
-            winning_genome, winning_rots,
-            dir_kernel, dir_order, substrate.ti_indices)
+    if active_cells is None:
+        winning_genome = torch.zeros_like(substrate.mem[0, inds.genome])
+        winning_rots = torch.zeros_like(substrate.mem[0, inds.rot])
+        explore(substrate.mem, max_act_i,
+                infra_delta, energy_delta,
+                winning_genome, winning_rots,
+                dir_kernel, dir_order, substrate.ti_indices)
+    else:
+        winning_genome = substrate.mem[0, inds.genome].clone()
+        winning_rots = substrate.mem[0, inds.rot].clone()
+        explore_active(substrate.mem, max_act_i,
+                       infra_delta, energy_delta,
+                       winning_genome, winning_rots,
+                       dir_kernel, dir_order, active_cells, n_active, substrate.ti_indices)
     # handle_investment(substrate, infra_delta)
     substrate.mem[0, inds.infra] += infra_delta
     substrate.mem[0, inds.energy] += energy_delta
@@ -172,7 +335,80 @@ def distribute_infra(mem: ti.types.ndarray(), out_infra: ti.types.ndarray(), max
             out_infra[i, j] += mem[0, inds.infra, i, j]
     
 
-def energy_physics(substrate, kernel, max_infra, max_energy):
+@ti.kernel
+def compact_hot_tiles(mem: ti.types.ndarray(), chind: ti.i32, max_val: ti.f32, tile_size: ti.i32,
+                      hot_tiles: ti.types.ndarray(), n_hot: ti.types.ndarray()):
+    # Lists the tiles with at least one cell of channel chind above max_val, with the count kept on the device
+    n_hot[0] = 0
+    for tile_x, tile_y in ti.ndrange((mem.shape[2] + tile_size - 1) // tile_size, (mem.shape[3] + tile_size - 1) // tile_size):
+        hot = False
+        for local_x, local_y in ti.ndrange(tile_size, tile_size):
+            i = tile_x * tile_size + local_x
+            j = tile_y * tile_size + local_y
+            if i < mem.shape[2] and j < mem.shape[3] and mem[0, chind, i, j] > max_val:
+                hot = True
+        if hot:
+            n = ti.atomic_add(n_hot[0], 1)
+            hot_tiles[n, 0] = tile_x
+            hot_tiles[n, 1] = tile_y
+
+
+@ti.kernel
+def distribute_hot_tiles(mem: ti.types.ndarray(), out: ti.types.ndarray(), chind: ti.i32, max_val: ti.f32,
+                         kernel: ti.types.ndarray(), tile_size: ti.i32,
+                         hot_tiles: ti.types.ndarray(), n_hot: ti.types.ndarray()):
+    """
+    distribute_energy/distribute_infra as updates to out, which must start as a copy of the channel:
+    only cells above max_val move anything, and they all lie in the listed tiles.
+    """
+    for n, local_x, local_y in ti.ndrange(n_hot[0], tile_size, tile_size):
+        i = hot_tiles[n, 0] * tile_size + local_x
+        j = hot_tiles[n, 1] * tile_size + local_y
+        if i < mem.shape[2] and j < mem.shape[3] and mem[0, chind, i, j] > max_val:
+            val = mem[0, chind, i, j]
+            out[i, j] -= val
+            for off_n in ti.ndrange(kernel.shape[0]):
+                neigh_x = (i + kernel[off_n, 0]) % mem.shape[2]
+                neigh_y = (j + kernel[off_n, 1]) % mem.shape[3]
+                out[neigh_x, neigh_y] += val / kernel.shape[0]
+
+
+class ActivityTiles:
+    """
+    Block-sparse distribute_energy/distribute_infra. Cells at or below the threshold keep their value, so a
+    tile with no cell above it is quiescent and skipped: each step one pass lists the hot tiles of a channel,
+    and only their cells are visited. The threshold test is exact, unlike a changed-since-last-step flag,
+    which the forcing noise would set on every tile every step.
+
+    With verify=True every call is also run densely and compared, raising on a mismatch.
+    """
+    def __init__(self, substrate, tile_size=16, verify=False, atol=1e-4):
+        self.tile_size = tile_size
+        self.verify = verify
+        self.atol = atol
+        self.n_tiles = ((substrate.w + tile_size - 1) // tile_size) * ((substrate.h + tile_size - 1) // tile_size)
+        self.hot_tiles = torch.zeros((self.n_tiles, 2), dtype=torch.int32, device=substrate.mem.device)
+        self.n_hot = torch.zeros(1, dtype=torch.int32, device=substrate.mem.device)
+
+    def hot_fraction(self):
+        """Fraction of tiles visited by the last call (syncs)."""
+        return self.n_hot.item() / self.n_tiles
+
+    def distribute(self, substrate, chind, max_val, kernel, dense_kernel):
+        mem = substrate.mem
+        compact_hot_tiles(mem, chind, max_val, self.tile_size, self.hot_tiles, self.n_hot)
+        out = mem[0, chind].clone()
+        distribute_hot_tiles(mem, out, chind, max_val, kernel, self.tile_size, self.hot_tiles, self.n_hot)
+        if self.verify:
+            dense_out = torch.zeros_like(out)
+            dense_kernel(mem, dense_out, max_val, kernel, substrate.ti_indices)
+            max_diff = (out - dense_out).abs().max().item()
+            if max_diff > self.atol:
+                raise ValueError(f"ActivityTiles: Tiled result of {dense_kernel.__name__} differs from the dense one by {max_diff}")
+        return out
+
+
+def energy_physics(substrate, kernel, max_infra, max_energy, tiles: ActivityTiles = None):
     # TODO: Implement infra->energy conversion, apply before energy flow
     inds = substrate.ti_indices[None]
     # substrate.mem[0, inds.infra] = torch.clamp(substrate.mem[0, inds.infra], 0.0001, 100)
@@ -181,6 +417,11 @@ def energy_physics(substrate, kernel, max_infra, max_energy):
     flow_energy_up(substrate.mem, energy_out_mem, kernel, substrate.ti_indices)
     substrate.mem[0, inds.energy] = energy_out_mem
 
+    if tiles is not None:
+        substrate.mem[0, inds.energy] = tiles.distribute(substrate, inds.energy, max_energy, kernel, distribute_energy)
+        substrate.mem[0, inds.infra] = tiles.distribute(substrate, inds.infra, max_infra, kernel, distribute_infra)
+        return
+
     energy_out_mem = torch.zeros_like(substrate.mem[0, inds.energy])
     distribute_energy(substrate.mem, energy_out_mem, max_energy, kernel, substrate.ti_indices)
     substrate.mem[0, inds.energy] = energy_out_mem
@@ -195,4 +436,46 @@ def invest_liquidate(substrate):
     investments = substrate.mem[0, inds.acts_invest] * substrate.mem[0, inds.energy]
     liquidations = substrate.mem[0, inds.acts_liquidate] * substrate.mem[0, inds.infra]
     substrate.mem[0, inds.energy] += liquidations - investments
-    substrate.mem[0, inds.infra] += investments - liquidations
\ No newline at end of file
+    substrate.mem[0, inds.infra] += investments - liquidations
+
+def warmup_kernels(substrate, kernel, dir_kernel, dir_order, sense_chinds, n_acts):
+    """
+    Compiles the coral kernels for this substrate's channel layout before the first step.
+
+    Taichi specializes ndarray arguments on dtype and ndim, not shape, so each kernel is run once on a 2x2
+    scratch copy of the substrate. Real memory is never written, and with the offline cache enabled
+    (see coralai.utils.taichi_cache.init_taichi) later processes load the compiled kernels from disk.
+    activate_outputs and invest_liquidate are run too, the first call of their torch ops pays for lazy initialization.
+    """
+    inds = substrate.ti_indices[None]
+    mem = substrate.mem[:, :, :2, :2].clone()
+    mem[0, inds.genome] = 0
+    scratch = torch.zeros_like(mem[0, inds.energy])
+    weights = torch.zeros((1, 1, n_acts, len(sense_chinds) * (dir_kernel.shape[0] + 1)),
+                          dtype=substrate.torch_dtype, device=mem.device)
+    biases = torch.zeros((1, 1, n_acts, 1), dtype=substrate.torch_dtype, device=mem.device)
+    out_mem = torch.zeros((n_acts, *mem.shape[2:]), dtype=mem.dtype, device=mem.device)
+    max_act_i = torch.argmax(mem[0, inds.acts_explore], dim=0)
+
+    active_cells = torch.zeros((4, 2), dtype=torch.int32, device=mem.device)
+    n_active = torch.zeros(1, dtype=torch.int32, device=mem.device)
+
+    apply_weights_and_biases(mem, out_mem, sense_chinds, weights, biases, dir_kernel, dir_order, substrate.ti_indices)
+    compact_active_cells(mem, active_cells, n_active, kernel, substrate.ti_indices)
+    apply_weights_and_biases_active(mem, out_mem, sense_chinds, weights, biases, dir_kernel, dir_order,
+                                    active_cells, n_active, substrate.ti_indices)
+    explore(mem, max_act_i, scratch, scratch.clone(), scratch.clone(), scratch.clone(),
+            dir_kernel, dir_order, substrate.ti_indices)
+    explore_active(mem, max_act_i, scratch, scratch.clone(), scratch.clone(), scratch.clone(),
+                   dir_kernel, dir_order, active_cells, n_active, substrate.ti_indices)
+    flow_energy_down(mem, scratch, 1.5, kernel, substrate.ti_indices)
+    flow_energy_up(mem, scratch, kernel, substrate.ti_indices)
+    distribute_energy(mem, scratch, 1.5, kernel, substrate.ti_indices)
+    distribute_infra(mem, scratch, 10.0, kernel, substrate.ti_indices)
+    hot_tiles = torch.zeros((1, 2), dtype=torch.int32, device=mem.device)
+    compact_hot_tiles(mem, inds.energy, 1.5, 16, hot_tiles, n_active)
+    distribute_hot_tiles(mem, scratch, inds.energy, 1.5, kernel, 16, hot_tiles, n_active)
+    scratch_substrate = types.SimpleNamespace(mem=mem, ti_indices=substrate.ti_indices)
+    activate_outputs(scratch_substrate, ActivationSpec(substrate))
+    invest_liquidate(scratch_substrate)
+    ti.sync()
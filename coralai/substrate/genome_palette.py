@@ -0,0 +1,55 @@
+import torch
+
+
+def hash_colors(genome_ids, torch_device):
+    """Stable, well spread RGB colors (n, 3) in [0, 1] from integer genome ids."""
+    x = torch.as_tensor(genome_ids, dtype=torch.int64, device=torch_device)
+    x = ((x + 1) * 2654435761) & 0xFFFFFFFF
+    x = x ^ (x >> 16)
+    x = (x * 0x45D9F3B) & 0xFFFFFFFF
+    x = x ^ (x >> 16)
+    hue = (x & 0xFFFF).float() / 65536
+    sat = 0.55 + 0.45 * ((x >> 16) & 0xFF).float() / 255
+    val = 0.7 + 0.3 * ((x >> 24) & 0xFF).float() / 255
+    # HSV -> RGB
+    k = (torch.tensor([5.0, 3.0, 1.0], device=x.device) + hue[:, None] * 6) % 6
+    k = torch.clamp(torch.minimum(k, 4 - k), 0, 1)
+    return val[:, None] - val[:, None] * sat[:, None] * k
+
+
+class GenomePalette:
+    """
+    Device-resident lookup table from genome index (the value in the genome channel) to a color hashed
+    from that genome's stable id, so a lineage keeps its color when indices are compacted by culling.
+
+    update(genome_ids) takes the stable id of every genome in index order. Appending genomes only hashes
+    the new ones; any other change (culls) rehashes the table, which is a single small device op.
+    """
+    def __init__(self, torch_device, capacity=256):
+        self.torch_device = torch_device
+        self.lut = torch.zeros((capacity, 3), dtype=torch.float32, device=torch_device)
+        self.genome_ids = []
+
+    @property
+    def n_colors(self):
+        return len(self.genome_ids)
+
+    def update(self, genome_ids):
+        genome_ids = list(genome_ids)
+        n_old = len(self.genome_ids)
+        if genome_ids[:n_old] == self.genome_ids:
+            start = n_old
+        else:
+            start = 0
+        if start == len(genome_ids):
+            self.genome_ids = genome_ids
+            return
+        if len(genome_ids) > self.lut.shape[0]:
+            capacity = self.lut.shape[0]
+            while capacity < len(genome_ids):
+                capacity *= 2
+            lut = torch.zeros((capacity, 3), dtype=torch.float32, device=self.torch_device)
+            lut[:n_old] = self.lut[:n_old]
+            self.lut = lut
+        self.lut[start:len(genome_ids)] = hash_colors(genome_ids[start:], self.torch_device)
+        self.genome_ids = genome_ids
@@ -0,0 +1,106 @@
+import os
+import queue
+import threading
+import numpy as np
+import taichi as ti
+from .substrate import Substrate
+from .visualization import Renderer
+
+
+class PNGSequenceWriter:
+    """Writes frames as frame_000000.png, frame_000001.png, ... into dirpath."""
+    def __init__(self, dirpath):
+        self.dirpath = dirpath
+        os.makedirs(self.dirpath, exist_ok=True)
+
+    def __call__(self, frame, frame_n):
+        # ti.tools.imwrite expects taichi's (x, y) layout with y pointing up
+        ti.tools.imwrite(np.ascontiguousarray(frame[::-1].transpose(1, 0, 2)),
+                         os.path.join(self.dirpath, f"frame_{frame_n:06d}.png"))
+
+    def close(self):
+        pass
+
+
+@ti.data_oriented
+class HeadlessRenderer(Renderer):
+    """
+    Offscreen render target: produces (h, w, 3) uint8 RGB frames (top row first) without a window,
+    at substrate resolution or image_res (w, h) with large grids pooled into pixels,
+    using the same colormapping as Visualization. Frames land in a preallocated ring of numpy buffers
+    and are handed to `sink(frame, frame_n)` on a writer thread, e.g. PNGSequenceWriter or a video
+    encoder with an add_img/write_frame style method wrapped in a lambda. If the writer falls behind,
+    frames are dropped (n_dropped) rather than blocking the simulation.
+
+    Works with RenderScheduler in its default (non-threaded) mode to produce frames at a fixed rate:
+    - vis = HeadlessRenderer(substrate, ["energy", "infra", "genome"], sink=PNGSequenceWriter("history/frames"))
+    - evolver.run(..., vis, ..., render_fps=2)
+    """
+    def __init__(self,
+                 substrate: Substrate,
+                 chids: list = None,
+                 sink=None,
+                 norm_decay: float = 0.9,
+                 n_buffers: int = 4,
+                 image_res: tuple = None,
+                 pool_max: bool = False):
+        super().__init__(substrate, chids, norm_decay=norm_decay, image_res=image_res, pool_max=pool_max)
+        self.sink = sink
+        self.frames = np.zeros((n_buffers, self.image_res[1], self.image_res[0], 3), dtype=np.uint8)
+        self.last_frame = None
+        self.n_frames = 0
+        self.n_dropped = 0
+        self.error = None
+        self.free_slots = queue.Queue()
+        for slot in range(n_buffers):
+            self.free_slots.put(slot)
+        self.pending = queue.Queue()
+        self.writer = None
+        if self.sink is not None:
+            self.writer = threading.Thread(target=self._write_loop, name="HeadlessRenderer", daemon=True)
+            self.writer.start()
+
+    @ti.kernel
+    def image_to_rgb8(self, out: ti.types.ndarray()):
+        for i, j in self.image:
+            for k in ti.static(range(3)):
+                out[self.image_res[1] - 1 - j, i, k] = ti.cast(self.image[i, j][k] * 255, ti.u8)
+
+    def update(self, snapshot=None):
+        """Renders a frame into the next free buffer and queues it for the sink. Returns the frame or None if dropped."""
+        if self.error is not None:
+            raise RuntimeError(f"HeadlessRenderer: writer thread failed: {self.error}")
+        try:
+            slot = self.free_slots.get_nowait()
+        except queue.Empty:
+            self.n_dropped += 1
+            return None
+        self.render(snapshot)
+        self.image_to_rgb8(self.frames[slot])
+        self.last_frame = self.frames[slot]
+        if self.writer is None:
+            self.free_slots.put(slot)
+        else:
+            self.pending.put((slot, self.n_frames))
+        self.n_frames += 1
+        return self.last_frame
+
+    def _write_loop(self):
+        while True:
+            item = self.pending.get()
+            if item is None:
+                break
+            slot, frame_n = item
+            try:
+                self.sink(self.frames[slot], frame_n)
+            except Exception as e:  # surfaced to the sim thread on the next update()
+                self.error = e
+            self.free_slots.put(slot)
+
+    def close(self):
+        if self.writer is not None:
+            self.pending.put(None)
+            self.writer.join()
+            self.writer = None
+        if hasattr(self.sink, "close"):
+            self.sink.close()
@@ -13,14 +13,55 @@ def sigmoid(x):
 def inverse_gaussian(x):
     return -1./(ti.exp(0.89*ti.pow(x, 2.))+1.)+1.
 
-def ch_norm(input_tensor):
-    # Calculate the mean across batch and channel dimensions
-    mean = input_tensor.mean(dim=(0, 2, 3), keepdim=True)
+def ch_norm(input_tensor, running=None, eps=1e-5):
+    """
+    Normalizes every channel of a (N, C, W, H) tensor to zero mean and unit variance, in place, so it can be
+    called on views such as mem[:, 2:6]. Mean and variance come from one fused (Welford) reduction, or from
+    `running` (a RunningChNorm), which only reduces the full grid every few calls.
+    """
+    if running is not None:
+        mean, inv_std = running.stats(input_tensor)
+    else:
+        var, mean = torch.var_mean(input_tensor, dim=(0, 2, 3), keepdim=True, unbiased=False)
+        inv_std = torch.rsqrt(var + eps)
+    return input_tensor.sub_(mean).mul_(inv_std)
 
-    # Calculate the variance across batch and channel dimensions
-    var = input_tensor.var(dim=(0, 2, 3), keepdim=True, unbiased=False)
 
-    # Normalize the input tensor
-    input_tensor.sub_(mean).div_(torch.sqrt(var + 1e-5))
+class RunningChNorm:
+    """
+    Running channel statistics for ch_norm: every update_interval calls the batch statistics are reduced and
+    blended into exponential moving averages with weight momentum, the other calls reuse the averages.
+    One instance per normalized layer.
+    """
+    def __init__(self, momentum=0.1, update_interval=10, eps=1e-5):
+        self.momentum = momentum
+        self.update_interval = update_interval
+        self.eps = eps
+        self.mean = None
+        self.var = None
+        self.n_calls = 0
 
-    return input_tensor
\ No newline at end of file
+    def stats(self, input_tensor):
+        stale = self.mean is None or self.mean.shape[1] != input_tensor.shape[1]
+        if stale or self.n_calls % self.update_interval == 0:
+            var, mean = torch.var_mean(input_tensor, dim=(0, 2, 3), keepdim=True, unbiased=False)
+            if stale:
+                self.mean, self.var = mean, var
+            else:
+                self.mean.lerp_(mean, self.momentum)
+                self.var.lerp_(var, self.momentum)
+        self.n_calls += 1
+        return self.mean, torch.rsqrt(self.var + self.eps)
+
+    def reset(self):
+        self.mean = None
+        self.var = None
+        self.n_calls = 0
+
+
+def ch_slice(chinds):
+    """slice(first, last + 1) if the channel indices are contiguous and increasing, so mem[:, ch_slice] is a view, else None."""
+    chinds = [int(c) for c in chinds]
+    if len(chinds) == 0 or chinds != list(range(chinds[0], chinds[0] + len(chinds))):
+        return None
+    return slice(chinds[0], chinds[0] + len(chinds))
@@ -0,0 +1,97 @@
+import time
+import threading
+
+
+class RenderScheduler:
+    """
+    Decouples rendering from the simulation loop. Call publish() every sim step; a frame is only
+    produced when the frame budget (1 / target_fps) has elapsed, so the sim runs unthrottled by vsync.
+
+    Published frames are copies of the displayed channels in a pair of device buffers (double buffered),
+    so the renderer never reads memory the simulation is writing.
+    - threaded=False: the latest snapshot is rendered on the calling thread. Use this for ti.ui.Window
+      based visualizations, since GGUI must be driven from the thread that created the window.
+    - threaded=True: a render thread consumes the latest snapshot. Frames published while it is still
+      busy are skipped instead of blocking the simulation.
+    clock returns the current time in seconds (time.perf_counter by default).
+    """
+    def __init__(self, vis, target_fps=30, threaded=False, clock=time.perf_counter):
+        self.vis = vis
+        self.frame_budget = 1.0 / target_fps
+        self.clock = clock
+        self.threaded = threaded
+        self.last_publish_time = float("-inf")
+        self.n_published = 0
+        self.n_rendered = 0
+        self.n_skipped = 0
+
+        self.buffers = [None, None]
+        self.front = 0
+        self.lock = threading.Lock()
+        self.frame_ready = threading.Condition(self.lock)
+        self.has_new_frame = False
+        self.rendering = False
+        self.running = True
+        self.error = None
+        self.render_thread = None
+        if self.threaded:
+            self.render_thread = threading.Thread(target=self._render_loop, name="RenderScheduler", daemon=True)
+            self.render_thread.start()
+
+    def frame_due(self):
+        return (self.clock() - self.last_publish_time) >= self.frame_budget
+
+    def publish(self, force=False):
+        if not force and not self.frame_due():
+            return False
+        if self.error is not None:
+            raise RuntimeError(f"RenderScheduler: render thread failed: {self.error}")
+        if self.threaded and self.rendering:
+            self.n_skipped += 1
+            return False
+        self.last_publish_time = self.clock()
+        with self.lock:
+            back = 1 - self.front
+            self.buffers[back] = self.vis.snapshot_channels(out=self.buffers[back])
+            self.front = back
+            self.has_new_frame = True
+            self.n_published += 1
+            self.frame_ready.notify()
+        if not self.threaded:
+            self.render_latest()
+        return True
+
+    def render_latest(self):
+        with self.lock:
+            if not self.has_new_frame:
+                return False
+            self.has_new_frame = False
+            self.rendering = True
+            front = self.buffers[self.front]
+        try:
+            self.vis.update(snapshot=front)
+            self.n_rendered += 1
+        finally:
+            with self.lock:
+                self.rendering = False
+        return True
+
+    def _render_loop(self):
+        while True:
+            with self.lock:
+                while self.running and not self.has_new_frame:
+                    self.frame_ready.wait()
+                if not self.running:
+                    return
+            try:
+                self.render_latest()
+            except Exception as e:  # surfaced to the sim thread on the next publish()
+                self.error = e
+                return
+
+    def close(self):
+        with self.lock:
+            self.running = False
+            self.frame_ready.notify()
+        if self.render_thread is not None:
+            self.render_thread.join()
@@ -8,6 +8,28 @@ from ..utils.ti_struct_factory import TaichiStructFactory
 from .channel import Channel
 from .substrate_index import SubstrateIndex
 
+SNAPSHOT_VERSION = 1
+
+
+def _layout_ti_dtype(depth):
+    if depth == 1:
+        return ti.f32
+    return ti.types.vector(n=depth, dtype=ti.f32)
+
+
+def _jsonable_metadata(metadata):
+    skip = {'id', 'ti_dtype', 'lims', 'indices', 'subchids', 'parent'}
+    out = {}
+    for k, v in metadata.items():
+        if k in skip or isinstance(v, Channel):
+            continue
+        try:
+            json.dumps(v)
+        except TypeError:
+            continue
+        out[k] = v
+    return out
+
 
 @ti.data_oriented
 class Substrate:
@@ -46,6 +68,92 @@ class Substrate:
         # Saves channels, channel metadata, dims, dtypes, etc
         torch.save(self.mem, filepath)
 
+    def save_snapshot(self, dirpath, mem=None):
+        """
+        Saves a snapshot that can be memory-mapped: header.json holds the channel index tree, dtypes and lims,
+        mem.npy holds the raw (channels, w, h) block so each channel is a contiguous slab on disk.
+        Pass mem to save a copy taken earlier (e.g. from another thread) instead of the live memory.
+        """
+        if self.mem is None:
+            raise ValueError("World: Cannot snapshot before world memory is allocated.")
+        mem = self.mem if mem is None else mem
+        os.makedirs(dirpath, exist_ok=True)
+        header = self.layout_header()
+        np.save(os.path.join(dirpath, "mem.npy"), mem[0].detach().cpu().numpy())
+        with open(os.path.join(dirpath, "header.json"), 'w') as f:
+            json.dump(header, f, indent=4)
+
+    def layout_header(self):
+        """JSON-able description of the memory layout, enough to rebuild an identical empty substrate (from_layout_header)."""
+        if self.mem is None:
+            raise ValueError("World: Cannot describe the layout before world memory is allocated.")
+        return {
+            "version": SNAPSHOT_VERSION,
+            "shape": list(self.mem.shape[1:]),
+            "torch_dtype": str(self.torch_dtype),
+            "index_tree": self.windex.index_tree,
+            "channels": {chid: {"ti_dtype": str(ch.ti_dtype),
+                                "lims": ch.lims.tolist(),
+                                "metadata": _jsonable_metadata(ch.metadata)}
+                         for chid, ch in self.channels.items()},
+        }
+
+    @staticmethod
+    def from_layout_header(header, torch_device=None):
+        """
+        Rebuilds and allocates an empty substrate from layout_header(), e.g. in another process.
+        Channel dtypes are rebuilt as f32 scalars/vectors/structs with the same memory layout.
+        """
+        torch_dtype = getattr(torch, header["torch_dtype"].replace("torch.", ""))
+        torch_device = torch.device(torch_device if torch_device is not None else "cpu")
+        channels = {}
+        for chid, chindices in header["index_tree"].items():
+            ch_header = header["channels"][chid]
+            if "subchannels" in chindices:
+                ti_dtype = ti.types.struct(**{subchid: _layout_ti_dtype(len(subch["indices"]))
+                                              for subchid, subch in chindices["subchannels"].items()})
+            else:
+                ti_dtype = _layout_ti_dtype(len(chindices["indices"]))
+            channels[chid] = {"ti_dtype": ti_dtype, "lims": ch_header["lims"], "metadata": ch_header["metadata"]}
+        substrate = Substrate(header["shape"][1:], torch_dtype, torch_device, channels)
+        substrate.malloc()
+        if substrate.windex.index_tree != header["index_tree"]:
+            raise ValueError("World: Layout could not be reproduced")
+        return substrate
+
+    @staticmethod
+    def load_snapshot_header(dirpath):
+        with open(os.path.join(dirpath, "header.json"), 'r') as f:
+            header = json.load(f)
+        if header.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"World: Unsupported snapshot version {header.get('version')} in {dirpath}")
+        return header
+
+    @staticmethod
+    def load_channels(dirpath, key, torch_device=None):
+        """
+        Materializes only the channels for key (same keys as substrate[key]) from a memory-mapped snapshot.
+        Returns a tensor of shape (1, n_channels, w, h).
+        """
+        header = Substrate.load_snapshot_header(dirpath)
+        indices = SubstrateIndex(header["index_tree"])[key]
+        mem = np.load(os.path.join(dirpath, "mem.npy"), mmap_mode='r')
+        chs = np.stack([mem[i] for i in indices], axis=0)[None]
+        return torch.from_numpy(chs).to(torch_device if torch_device is not None else "cpu")
+
+    @staticmethod
+    def load(dirpath, torch_device=None):
+        """
+        Rebuilds and allocates a substrate from a snapshot written by save_snapshot.
+        Channel dtypes are rebuilt as f32 scalars/vectors/structs with the same memory layout.
+        """
+        header = Substrate.load_snapshot_header(dirpath)
+        substrate = Substrate.from_layout_header(header, torch_device)
+        torch_device, torch_dtype = substrate.torch_device, substrate.torch_dtype
+        mem = np.load(os.path.join(dirpath, "mem.npy"), mmap_mode='r')
+        substrate.mem[0] = torch.from_numpy(np.array(mem)).to(device=torch_device, dtype=torch_dtype)
+        return substrate
+
     def index_to_chname(self, index):
         return self.windex.index_to_chname(index)
 
@@ -0,0 +1,102 @@
+import torch
+from .substrate import Substrate
+
+
+class Telemetry:
+    """
+    Scalar stats for the UI without per-frame device syncs.
+
+    The sim thread calls record(timestep) after a step that will be drawn (e.g. when RenderScheduler.frame_due(),
+    or every `interval` steps): channel totals, the probe cell's values and
+    (with genome_chid) per-genome cell counts are reduced into one small device tensor, with no host reads.
+    The UI calls latest() once per frame: it issues a single non-blocking copy of that tensor into a pinned
+    host buffer and returns the values of the last copy that has completed, so they lag by at most a frame.
+    Host-side values (timestep, population, ...) are passed to record() as keyword arguments.
+
+    Usage:
+    - telemetry = Telemetry(substrate, ["energy", "infra"], genome_chid="genome")
+    - sim loop: telemetry.record(timestep, n_genomes=len(genomes), population=len(genomes))
+    - UI: telemetry.set_probe(x, y); stats = telemetry.latest(); stats["total"]["energy"]
+    """
+    def __init__(self, substrate: Substrate, chids, genome_chid=None, interval=1):
+        self.substrate = substrate
+        self.chinds = substrate.windex[chids]
+        self.chnames = [substrate.index_to_chname(i) for i in self.chinds]
+        self.chinds_device = torch.tensor(self.chinds, device=substrate.mem.device)
+        self.genome_chind = None if genome_chid is None else int(substrate.windex[genome_chid][0])
+        self.interval = interval
+        self.probe_xy = (0, 0)
+
+        self.is_cuda = substrate.mem.device.type == "cuda"
+        self.values = None
+        self.layout = None
+        self.host_values = {}
+        self.host_buffer = None
+        self.copy_event = None
+        self.copy_layout = None
+        self.copy_host_values = None
+        self.stats = {}
+
+    def set_probe(self, x, y):
+        self.probe_xy = (int(x) % self.substrate.w, int(y) % self.substrate.h)
+
+    def record(self, timestep, force=False, n_genomes=None, **host_values):
+        if not force and timestep % self.interval != 0:
+            return False
+        mem = self.substrate.mem[0]
+        x, y = self.probe_xy
+        parts = [
+            mem.index_select(0, self.chinds_device).sum(dim=(1, 2)),
+            mem[:, x, y].index_select(0, self.chinds_device),
+        ]
+        n_genome_cells = 0
+        if self.genome_chind is not None:
+            parts.append(mem[self.genome_chind, x, y].reshape(1))
+            if n_genomes:
+                # scatter_add into a fixed size buffer instead of bincount, whose output size needs a sync
+                genome_inds = mem[self.genome_chind].long().flatten()
+                valid = (genome_inds >= 0) & (genome_inds < n_genomes)
+                counts = torch.zeros(n_genomes, dtype=mem.dtype, device=mem.device)
+                counts.scatter_add_(0, genome_inds.clamp(0, n_genomes - 1), valid.to(mem.dtype))
+                parts.append(counts)
+                n_genome_cells = n_genomes
+        self.values = torch.cat(parts)
+        self.layout = (self.probe_xy, n_genome_cells)
+        self.host_values = dict(host_values, timestep=timestep)
+        return True
+
+    def latest(self):
+        """Returns the most recent stats that have reached the host, starting a copy of newer ones if needed."""
+        if self.copy_event is not None and self.copy_event.query():
+            self._unpack()
+            self.copy_event = None
+        if self.values is not None and self.copy_event is None:
+            self._start_copy()
+            if not self.is_cuda:
+                self._unpack()
+        return self.stats
+
+    def _start_copy(self):
+        n = self.values.shape[0]
+        if self.host_buffer is None or self.host_buffer.shape[0] < n:
+            self.host_buffer = torch.empty(max(n, 64) * 2, dtype=self.values.dtype, pin_memory=self.is_cuda)
+        self.host_buffer[:n].copy_(self.values, non_blocking=self.is_cuda)
+        self.copy_layout = (n, *self.layout)
+        self.copy_host_values = self.host_values
+        self.values = None
+        if self.is_cuda:
+            self.copy_event = torch.cuda.Event()
+            self.copy_event.record()
+
+    def _unpack(self):
+        n, probe_xy, n_genome_cells = self.copy_layout
+        vals = self.host_buffer[:n].tolist()
+        n_chs = len(self.chnames)
+        stats = dict(self.copy_host_values)
+        stats["total"] = dict(zip(self.chnames, vals[:n_chs]))
+        stats["probe"] = dict(zip(self.chnames, vals[n_chs:2 * n_chs]))
+        stats["probe_xy"] = probe_xy
+        if self.genome_chind is not None:
+            stats["probe_genome"] = vals[2 * n_chs]
+            stats["genome_cells"] = vals[2 * n_chs + 1:2 * n_chs + 1 + n_genome_cells]
+        self.stats = stats
@@ -0,0 +1,168 @@
+import os
+import json
+import queue
+import bisect
+import threading
+import numpy as np
+import torch
+from .substrate import Substrate
+
+
+class TrajectoryRecorder:
+    """
+    Records selected substrate channels every `interval` steps without stalling the simulation.
+
+    The sim thread only copies the channels into a (pinned, on CUDA) host ring buffer; a writer thread
+    packs the frames into chunks of `chunk_size` and appends them as compressed .npz files to `dirpath`.
+    index.json maps timesteps to chunks so TrajectoryReader can seek. If the writer falls behind and
+    the ring is full, frames are dropped (counted in n_dropped) rather than blocking the step loop.
+
+    Usage:
+    - recorder = TrajectoryRecorder(substrate, ['genome', 'energy'], "history/run_0/trajectory", interval=10)
+    - in the step loop: recorder.record(timestep)
+    - recorder.close()
+    """
+    def __init__(self, substrate: Substrate, chids, dirpath, interval=1, chunk_size=64, ring_size=8):
+        self.substrate = substrate
+        self.chids = chids
+        self.chinds = substrate.windex[chids]
+        self.dirpath = dirpath
+        self.interval = interval
+        self.chunk_size = chunk_size
+        self.n_recorded = 0
+        self.n_dropped = 0
+
+        self.is_cuda = substrate.mem.device.type == "cuda"
+        frame_shape = (len(self.chinds), substrate.w, substrate.h)
+        self.ring = torch.empty((ring_size, *frame_shape), dtype=substrate.torch_dtype,
+                                pin_memory=self.is_cuda)
+        self.chinds_device = torch.tensor(self.chinds, device=substrate.mem.device)
+        self.free_slots = queue.Queue()
+        for slot in range(ring_size):
+            self.free_slots.put(slot)
+        self.pending = queue.Queue()
+
+        os.makedirs(self.dirpath, exist_ok=True)
+        self.index = {
+            "chids": [chid if isinstance(chid, str) else list(chid) for chid in chids],
+            "chinds": self.chinds.tolist(),
+            "chnames": [substrate.index_to_chname(i) for i in self.chinds],
+            "frame_shape": list(frame_shape),
+            "dtype": str(self.ring.numpy().dtype),
+            "interval": interval,
+            "chunks": [],
+        }
+        self.error = None
+        self.writer = threading.Thread(target=self._write_loop, name="TrajectoryRecorder", daemon=True)
+        self.writer.start()
+
+    def record(self, timestep, force=False):
+        if not force and timestep % self.interval != 0:
+            return False
+        if self.error is not None:
+            raise RuntimeError(f"TrajectoryRecorder: writer thread failed: {self.error}")
+        try:
+            slot = self.free_slots.get_nowait()
+        except queue.Empty:
+            self.n_dropped += 1
+            return False
+        frame = self.substrate.mem[0].index_select(0, self.chinds_device)
+        self.ring[slot].copy_(frame, non_blocking=self.is_cuda)
+        event = None
+        if self.is_cuda:
+            event = torch.cuda.Event()
+            event.record()
+        self.pending.put((slot, timestep, event))
+        self.n_recorded += 1
+        return True
+
+    def _write_loop(self):
+        frames = np.empty((self.chunk_size, *self.ring.shape[1:]), dtype=self.ring.numpy().dtype)
+        timesteps = []
+        while True:
+            item = self.pending.get()
+            if item is None:
+                break
+            slot, timestep, event = item
+            if event is not None:
+                event.synchronize()
+            frames[len(timesteps)] = self.ring[slot].numpy()
+            self.free_slots.put(slot)
+            timesteps.append(timestep)
+            if len(timesteps) == self.chunk_size:
+                self._write_chunk(frames, timesteps)
+                timesteps = []
+        if timesteps:
+            self._write_chunk(frames[:len(timesteps)], timesteps)
+
+    def _write_chunk(self, frames, timesteps):
+        try:
+            chunk_n = len(self.index["chunks"])
+            filename = f"chunk_{chunk_n:06d}.npz"
+            np.savez_compressed(os.path.join(self.dirpath, filename),
+                                frames=frames, timesteps=np.array(timesteps, dtype=np.int64))
+            self.index["chunks"].append({
+                "file": filename, "t_start": timesteps[0], "t_end": timesteps[-1], "n_frames": len(timesteps)
+            })
+            tmp_path = os.path.join(self.dirpath, "index.json.tmp")
+            with open(tmp_path, 'w') as f:
+                json.dump(self.index, f, indent=4)
+            os.replace(tmp_path, os.path.join(self.dirpath, "index.json"))
+        except Exception as e:  # surfaced to the sim thread on the next record()
+            self.error = e
+
+    def close(self):
+        self.pending.put(None)
+        self.writer.join()
+        if self.error is not None:
+            raise RuntimeError(f"TrajectoryRecorder: writer thread failed: {self.error}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TrajectoryReader:
+    """
+    Seekable reader for trajectories written by TrajectoryRecorder.
+    - reader[timestep] returns the (n_channels, w, h) frame recorded at timestep
+    - reader.timesteps lists every recorded timestep
+    """
+    def __init__(self, dirpath):
+        self.dirpath = dirpath
+        with open(os.path.join(dirpath, "index.json"), 'r') as f:
+            self.index = json.load(f)
+        self.chunks = self.index["chunks"]
+        self.chunk_starts = [chunk["t_start"] for chunk in self.chunks]
+        self._cached_chunk_n = None
+        self._cached = None
+
+    @property
+    def chnames(self):
+        return self.index["chnames"]
+
+    @property
+    def timesteps(self):
+        steps = []
+        for chunk_n in range(len(self.chunks)):
+            steps += self._load_chunk(chunk_n)[1].tolist()
+        return steps
+
+    def _load_chunk(self, chunk_n):
+        if self._cached_chunk_n != chunk_n:
+            with np.load(os.path.join(self.dirpath, self.chunks[chunk_n]["file"])) as data:
+                self._cached = (data["frames"], data["timesteps"])
+            self._cached_chunk_n = chunk_n
+        return self._cached
+
+    def __getitem__(self, timestep):
+        chunk_n = bisect.bisect_right(self.chunk_starts, timestep) - 1
+        if chunk_n < 0 or timestep > self.chunks[chunk_n]["t_end"]:
+            raise KeyError(f"TrajectoryReader: timestep {timestep} was not recorded")
+        frames, timesteps = self._load_chunk(chunk_n)
+        frame_n = np.searchsorted(timesteps, timestep)
+        if frame_n >= len(timesteps) or timesteps[frame_n] != timestep:
+            raise KeyError(f"TrajectoryReader: timestep {timestep} was not recorded")
+        return frames[frame_n]
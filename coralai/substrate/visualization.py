@@ -1,37 +1,219 @@
 import time
+import math
 import torch
 import taichi as ti
 from .substrate import Substrate
 
 
 @ti.data_oriented
-class Visualization:
+class Renderer:
+    """
+    Colormaps 3 substrate channels into an RGB image field, without any window (see Visualization).
+
+    The image is a view of the substrate: pixel (i, j) covers the cells starting at
+    (view_x + i * cells_per_px, view_y + j * cells_per_px). When a pixel covers several cells they are
+    pooled (mean, or max with pool_max) on the fly, so only cells that map to visible pixels are read.
+    Use pan/zoom/reset_view to move the view.
+    """
     def __init__(self,
                  substrate: Substrate,
                  chids: list = None,
-                 chinds: list = None,
-                 name: str = None,
-                 scale: int = None,):
+                 norm_decay: float = 0.9,
+                 image_res: tuple = None,
+                 pool_max: bool = False,):
         self.substrate = substrate
         self.w = substrate.w
         self.h = substrate.h
         self.chids = chids
-        self.scale = 1 if scale is None else scale
         chinds = substrate.get_inds_tivec(chids)
         self.chinds = torch.tensor(list(chinds), device = substrate.torch_device)
+        self.n_channels = len(chinds)
+        # Rendered at substrate resolution by default, the canvas scales it up to the window
+        self.image_res = (self.w, self.h) if image_res is None else tuple(image_res)
+        self.image = ti.Vector.field(n=3, dtype=ti.f32, shape=self.image_res)
+        self.pool_max = pool_max
+        self.reset_view()
+        # Per-channel min/max of the current frame, and their running average used for normalization
+        self.norm_decay = norm_decay
+        self.frame_min = ti.field(dtype=ti.f32, shape=3)
+        self.frame_max = ti.field(dtype=ti.f32, shape=3)
+        self.norm_min = ti.field(dtype=ti.f32, shape=3)
+        self.norm_max = ti.field(dtype=ti.f32, shape=3)
+        self.norm_reset = ti.field(dtype=ti.i32, shape=())
+        self.norm_reset[None] = 1
+        self.next_generation = False
+        # When set (see set_genome_palette), the genome channel is drawn with per-genome colors instead
+        self.genome_palette = None
+        self.genome_chinds = None
+        self.show_genomes = False
+
+    @property
+    def running(self):
+        return True
+
+    @property
+    def fit_cells_per_px(self):
+        return max(self.w / self.image_res[0], self.h / self.image_res[1])
+
+    def reset_view(self):
+        self.cells_per_px = self.fit_cells_per_px
+        self.view_x = 0.0
+        self.view_y = 0.0
+
+    def pan(self, dx_px, dy_px):
+        self.view_x = (self.view_x + dx_px * self.cells_per_px) % self.w
+        self.view_y = (self.view_y + dy_px * self.cells_per_px) % self.h
+
+    def zoom(self, factor, pos=(0.5, 0.5)):
+        """Zooms in by factor (< 1 zooms out) keeping the cell under pos (normalized screen coords) in place."""
+        center_x, center_y = self.screen_to_cell(pos, wrap=False)
+        min_cells_per_px = 1 / 32
+        self.cells_per_px = min(max(self.cells_per_px / factor, min_cells_per_px), self.fit_cells_per_px)
+        self.view_x = (center_x - pos[0] * self.image_res[0] * self.cells_per_px) % self.w
+        self.view_y = (center_y - pos[1] * self.image_res[1] * self.cells_per_px) % self.h
+
+    def screen_to_cell(self, pos, wrap=True):
+        x = self.view_x + pos[0] * self.image_res[0] * self.cells_per_px
+        y = self.view_y + pos[1] * self.image_res[1] * self.cells_per_px
+        if wrap:
+            return int(x) % self.w, int(y) % self.h
+        return x, y
+
+    @property
+    def pool_size(self):
+        # Side of the block of cells pooled into one pixel, 1 when zoomed in past one cell per pixel
+        return max(1, math.floor(self.cells_per_px))
+
+    def set_channels(self, chindices):
+        self.chinds = chindices
+        self.reset_norm()
+
+    def reset_norm(self):
+        self.norm_reset[None] = 1
+
+    def set_genome_palette(self, genome_palette, genome_chid="genome"):
+        self.genome_palette = genome_palette
+        self.genome_chinds = torch.tensor(self.substrate.windex[genome_chid], device=self.substrate.torch_device)
+        self.show_genomes = True
+
+    @property
+    def draws_genomes(self):
+        return self.show_genomes and self.genome_palette is not None
+
+    @property
+    def render_chinds(self):
+        if self.draws_genomes:
+            return self.genome_chinds
+        return self.chinds
+
+    def snapshot_channels(self, out=None):
+        # Copy of the displayed channels, in the (1, n_channels, w, h) layout update(snapshot=...) expects
+        snapshot = torch.index_select(self.substrate.mem, 1, self.render_chinds, out=out)
+        # Tagged with what it holds, so render() still draws it right if show_genomes is toggled before it is drawn
+        snapshot.is_genome_snapshot = self.draws_genomes
+        return snapshot
+
+    def render(self, snapshot=None):
+        if snapshot is None:
+            mem, chinds, genomes = self.substrate.mem, self.render_chinds, self.draws_genomes
+        else:
+            mem, chinds = snapshot, torch.arange(snapshot.shape[1], device=snapshot.device)
+            genomes = self.genome_palette is not None and getattr(snapshot, "is_genome_snapshot", False)
+        view = (self.view_x, self.view_y, self.cells_per_px)
+        if genomes:
+            self.write_genomes_to_renderer(mem, chinds, self.genome_palette.lut, self.genome_palette.n_colors, *view)
+        else:
+            self.write_to_renderer(mem, chinds, self.norm_decay, *view, self.pool_size, int(self.pool_max))
+
+    @ti.func
+    def view_to_cell(self, i, j, view_x, view_y, cells_per_px):
+        x = int(ti.floor(view_x + i * cells_per_px)) % self.w
+        y = int(ti.floor(view_y + j * cells_per_px)) % self.h
+        return x, y
+
+    @ti.kernel
+    def write_genomes_to_renderer(self, mem: ti.types.ndarray(), chinds: ti.types.ndarray(),
+                                  lut: ti.types.ndarray(), n_colors: ti.i32,
+                                  view_x: ti.f32, view_y: ti.f32, cells_per_px: ti.f32):
+        for i, j in self.image:
+            # Genome ids can't be averaged, so each pixel shows the first cell it covers
+            x, y = self.view_to_cell(i, j, view_x, view_y, cells_per_px)
+            genome_key = int(mem[0, chinds[0], x, y])
+            color = ti.Vector([0.0, 0.0, 0.0])
+            if 0 <= genome_key < n_colors:
+                color = ti.Vector([lut[genome_key, 0], lut[genome_key, 1], lut[genome_key, 2]])
+            self.image[i, j] = color
+
+    @ti.kernel
+    def write_to_renderer(self, mem: ti.types.ndarray(), chinds: ti.types.ndarray(), norm_decay: ti.f32,
+                          view_x: ti.f32, view_y: ti.f32, cells_per_px: ti.f32, pool_size: ti.i32, pool_max: ti.i32):
+        # One launch per frame, no host syncs: pool the visible cells, reduce per-channel min/max,
+        # update the running range, colormap
+        for k in range(3):
+            self.frame_min[k] = ti.math.inf
+            self.frame_max[k] = -ti.math.inf
+        for i, j in self.image:
+            x, y = self.view_to_cell(i, j, view_x, view_y, cells_per_px)
+            for k in ti.static(range(3)):
+                val = 0.0
+                if pool_max:
+                    val = -ti.math.inf
+                for dx, dy in ti.ndrange(pool_size, pool_size):
+                    # Views of fewer than 3 channels repeat the last one (a single channel renders as grayscale)
+                    cell_val = mem[0, chinds[ti.min(k, chinds.shape[0] - 1)], (x + dx) % self.w, (y + dy) % self.h]
+                    if pool_max:
+                        val = ti.max(val, cell_val)
+                    else:
+                        val += cell_val
+                if not pool_max:
+                    val /= pool_size * pool_size
+                self.image[i, j][k] = val
+                ti.atomic_min(self.frame_min[k], val)
+                ti.atomic_max(self.frame_max[k], val)
+        for k in range(3):
+            if self.norm_reset[None] == 1:
+                self.norm_min[k] = self.frame_min[k]
+                self.norm_max[k] = self.frame_max[k]
+            else:
+                self.norm_min[k] = norm_decay * self.norm_min[k] + (1 - norm_decay) * self.frame_min[k]
+                self.norm_max[k] = norm_decay * self.norm_max[k] + (1 - norm_decay) * self.frame_max[k]
+        self.norm_reset[None] = 0
+        for i, j in self.image:
+            for k in ti.static(range(3)):
+                val_range = ti.max(self.norm_max[k] - self.norm_min[k], 1e-8)
+                val = (self.image[i, j][k] - self.norm_min[k]) / val_range
+                self.image[i, j][k] = ti.math.clamp(val, 0.0, 1.0)
+
+
+@ti.data_oriented
+class Visualization(Renderer):
+    def __init__(self,
+                 substrate: Substrate,
+                 chids: list = None,
+                 chinds: list = None,
+                 name: str = None,
+                 scale: int = None,
+                 norm_decay: float = 0.9,
+                 pool_max: bool = False,):
         # self.name = f"Vis: {[self.substrate.index_to_chname(chindices[i]) for i in range(len(chindices))]}" if name is None else name
         self.name = "Vis"
 
+        desired_max_dim = 800
+        max_dim = max(substrate.w, substrate.h)
         if scale is None:
-            max_dim = max(self.substrate.w, self.substrate.h)
-            desired_max_dim = 800
             scale = desired_max_dim // max_dim
-            
+
+        image_res = None
+        if scale >= 1:
+            self.img_w = substrate.w * scale
+            self.img_h = substrate.h * scale
+        else:
+            # Grid larger than the window: render at window resolution, pooling cells into pixels
+            self.img_w = max(1, substrate.w * desired_max_dim // max_dim)
+            self.img_h = max(1, substrate.h * desired_max_dim // max_dim)
+            image_res = (self.img_w, self.img_h)
         self.scale = scale
-        self.img_w = self.substrate.w * scale
-        self.img_h = self.substrate.h * scale
-        self.n_channels = len(chinds)
-        self.image = ti.Vector.field(n=3, dtype=ti.f32, shape=(self.img_w, self.img_h))
+        super().__init__(substrate, chids, norm_decay=norm_decay, image_res=image_res, pool_max=pool_max)
 
         self.window = ti.ui.Window(
             f"{self.name}", (self.img_w, self.img_h), fps_limit=200, vsync=True
@@ -47,36 +229,28 @@ class Visualization:
         self.prev_pos = self.window.get_cursor_pos()
         self.channel_to_paint = 0
         self.val_to_paint = 0.1
+        self.pan_step_px = 40
+        # Set to a StageProfiler to show its rolling stage timings in a panel
+        self.profiler = None
 
-    def set_channels(self, chindices):
-        self.chinds = chindices
+    @property
+    def running(self):
+        return self.window.running
 
     @ti.kernel
     def add_val_to_loc(self,
             val: ti.f32,
-            pos_x: ti.f32,
-            pos_y: ti.f32,
+            ind_x: ti.i32,
+            ind_y: ti.i32,
             radius: ti.i32,
             channel_to_paint: ti.i32,
             mem: ti.types.ndarray()
         ):
-        ind_x = int(pos_x * self.w)
-        ind_y = int(pos_y * self.h)
-        offset = int(pos_x) * 3
         for i, j in ti.ndrange((-radius, radius), (-radius, radius)):
             if (i**2) + j**2 < radius**2:
                 mem[0, channel_to_paint, (i + ind_x) % self.w, (j + ind_y) % self.h] += val
 
 
-    @ti.kernel
-    def write_to_renderer(self, mem: ti.types.ndarray(), max_vals: ti.types.ndarray(), chinds: ti.types.ndarray()):
-        for i, j in self.image:
-            xind = (i//self.scale) % self.w
-            yind = (j//self.scale) % self.h
-            for k in ti.static(range(3)):
-                chid = chinds[k]
-                self.image[i, j][k] = mem[0, chid, xind, yind] / max_vals[k]
-
     def opt_window(self, sub_w):
         self.channel_to_paint = sub_w.slider_int("Paint channel: " +
                                                  f"{self.substrate.index_to_chname(self.channel_to_paint)}",
@@ -96,6 +270,15 @@ class Visualization:
             self.opt_window(sub_w)
 
 
+    def render_profiler_window(self):
+        stats = self.profiler.stats()
+        total_ms = sum(s["mean_ms"] for s in stats.values())
+        with self.gui.sub_window("Profiler", 0.6, 0.05, 0.38, 0.05 + 0.035 * len(stats)) as sub_w:
+            for name, s in stats.items():
+                share = s["mean_ms"] / total_ms if total_ms > 0 else 0.0
+                sub_w.text(f"{name:>10}: {s['mean_ms']:7.2f} ms (p95 {s['p95_ms']:7.2f}) {'|' * int(share * 20)}")
+
+
     def check_events(self):
         for e in self.window.get_events(ti.ui.PRESS):
             if e.key in  [ti.ui.ESCAPE]:
@@ -104,23 +287,44 @@ class Visualization:
                 self.drawing = True
             elif e.key == ti.ui.SPACE:
                 self.substrate.mem *= 0.0
+            # Pan with the arrow keys, zoom at the cursor with = and -, 0 fits the whole grid
+            elif e.key == ti.ui.LEFT:
+                self.pan(-self.pan_step_px, 0)
+            elif e.key == ti.ui.RIGHT:
+                self.pan(self.pan_step_px, 0)
+            elif e.key == ti.ui.UP:
+                self.pan(0, self.pan_step_px)
+            elif e.key == ti.ui.DOWN:
+                self.pan(0, -self.pan_step_px)
+            elif e.key == '=':
+                self.zoom(2.0, self.window.get_cursor_pos())
+            elif e.key == '-':
+                self.zoom(0.5, self.window.get_cursor_pos())
+            elif e.key == '0':
+                self.reset_view()
         for e in self.window.get_events(ti.ui.RELEASE):
             if e.key == ti.ui.LMB:
                 self.drawing = False
 
 
-    def update(self):
+    def update(self, snapshot=None):
+        """
+        Renders a frame. By default reads the displayed channels from live substrate memory,
+        pass a snapshot from snapshot_channels() to render a copy published earlier (see RenderScheduler).
+        """
         current_time = time.time()
         current_pos = self.window.get_cursor_pos()
         if not self.paused:
             self.check_events()
             if self.drawing and ((current_time - self.prev_time) > 0.1): # or (current_pos != self.prev_pos)):
-                self.add_val_to_loc(self.val_to_paint, current_pos[0], current_pos[1], self.brush_radius, self.channel_to_paint, self.substrate.mem)
+                ind_x, ind_y = self.screen_to_cell(current_pos)
+                self.add_val_to_loc(self.val_to_paint, ind_x, ind_y, self.brush_radius, self.channel_to_paint, self.substrate.mem)
                 self.prev_time = current_time  # Update the time of the last action
                 self.prev_pos = current_pos
 
-            max_vals = torch.tensor([self.substrate.mem[0, ch].max() for ch in self.chinds])
-            self.write_to_renderer(self.substrate.mem, max_vals, self.chinds)
+            self.render(snapshot)
         self.render_opt_window()
+        if self.profiler is not None and self.profiler.enabled:
+            self.render_profiler_window()
         self.canvas.set_image(self.image)
         self.window.show()
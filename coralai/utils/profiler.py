@@ -0,0 +1,89 @@
+import time
+import contextlib
+from collections import deque
+import numpy as np
+import torch
+import taichi as ti
+
+
+class StageProfiler:
+    """
+    Opt-in wall clock timing of named stages of the simulation loop (forward, explore, render, ...).
+
+    Each stage is synchronized (Taichi, and the torch device) before and after it is timed, so queued
+    kernels are charged to the stage that launched them. The last `window` timings of every stage are kept
+    for rolling stats and histograms. When disabled, stage() returns a shared no-op context and costs a
+    single attribute check, so the hooks can stay in the loop.
+
+    Usage:
+    - profiler = StageProfiler(torch_device)
+    - evolver.set_profiler(profiler); vis.profiler = profiler
+    - with profiler.stage("explore"): ...
+    - profiler.stats()["explore"]["mean_ms"], profiler.report()
+    """
+    def __init__(self, torch_device=None, window=256, enabled=True):
+        self.torch_device = None if torch_device is None else torch.device(torch_device)
+        self.window = window
+        self.enabled = enabled
+        self.timings = {}
+        self._null = contextlib.nullcontext()
+
+    def sync(self):
+        ti.sync()
+        if self.torch_device is None:
+            return
+        if self.torch_device.type == "cuda":
+            torch.cuda.synchronize(self.torch_device)
+        elif self.torch_device.type == "mps":
+            torch.mps.synchronize()
+
+    def stage(self, name):
+        if not self.enabled:
+            return self._null
+        return self._timed(name)
+
+    @contextlib.contextmanager
+    def _timed(self, name):
+        self.sync()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.sync()
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        if name not in self.timings:
+            self.timings[name] = deque(maxlen=self.window)
+        self.timings[name].append(seconds)
+
+    def reset(self):
+        self.timings = {}
+
+    def stats(self):
+        """Rolling stats in milliseconds per stage, in the order stages were first seen."""
+        stats = {}
+        for name, times in self.timings.items():
+            ms = np.asarray(times) * 1000
+            stats[name] = {
+                "count": len(ms),
+                "mean_ms": float(ms.mean()),
+                "p50_ms": float(np.percentile(ms, 50)),
+                "p95_ms": float(np.percentile(ms, 95)),
+                "max_ms": float(ms.max()),
+            }
+        return stats
+
+    def histogram(self, name, bins=10):
+        """Returns (counts, bin_edges_ms) of the rolling window of a stage."""
+        return np.histogram(np.asarray(self.timings[name]) * 1000, bins=bins)
+
+    def report(self):
+        lines = []
+        for name, s in self.stats().items():
+            lines.append(f"{name:>12}: mean {s['mean_ms']:8.3f} ms, p95 {s['p95_ms']:8.3f} ms, max {s['max_ms']:8.3f} ms")
+        return "\n".join(lines)
+
+
+# Default for objects without a profiler, so the stage hooks never need a None check
+NULL_PROFILER = StageProfiler(enabled=False)
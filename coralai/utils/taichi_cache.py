@@ -0,0 +1,18 @@
+import os
+import taichi as ti
+
+DEFAULT_CACHE_DIR = os.path.join("history", "ti_cache")
+
+
+def init_taichi(arch=None, cache_dir=DEFAULT_CACHE_DIR, **kwargs):
+    """
+    ti.init with Taichi's offline cache kept in a project-controlled folder, so compiled kernels survive
+    across processes (short evaluation jobs, workers) instead of being JIT compiled on every start.
+    TI_OFFLINE_CACHE_FILE_PATH overrides cache_dir, cache_dir=None disables the offline cache.
+    """
+    arch = ti.cpu if arch is None else arch
+    if cache_dir is None:
+        return ti.init(arch=arch, offline_cache=False, **kwargs)
+    cache_dir = os.path.abspath(os.environ.get("TI_OFFLINE_CACHE_FILE_PATH", cache_dir))
+    os.makedirs(cache_dir, exist_ok=True)
+    return ti.init(arch=arch, offline_cache=True, offline_cache_file_path=cache_dir, **kwargs)
@@ -4,6 +4,32 @@ import taichi as ti
 
 os.environ["TI_WARN_ON_TYPE_CAST"] = "0"
 
+# Built fields by (layout, values). Kernels taking a struct field as ti.template() are compiled per field
+# object, so handing out the same field for the same layout lets new substrates reuse compiled kernels.
+_built_fields = {}
+_built_fields_prog = None
+
+
+def type_signature(dtype):
+    """Hashable description of a taichi type: the type objects themselves are created anew on every call."""
+    if hasattr(dtype, "n") and hasattr(dtype, "m"):
+        return ("matrix", dtype.n, dtype.m, type_signature(dtype.dtype))
+    if hasattr(dtype, "n"):
+        return ("vector", dtype.n, type_signature(dtype.dtype))
+    return str(dtype)
+
+
+def value_signature(val):
+    if isinstance(val, (np.ndarray, list, tuple)):
+        return tuple(np.asarray(val).flatten().tolist())
+    if hasattr(val, "to_numpy"):
+        return tuple(val.to_numpy().flatten().tolist())
+    return val
+
+
+def clear_build_cache():
+    _built_fields.clear()
+
 
 class TaichiStructFactory:
     """This class is a factory for creating Taichi structures."""
@@ -41,11 +67,26 @@ class TaichiStructFactory:
     def add_timat_i(self, name, val):
         self.add(name, val, ti.types.matrix(n=val.n, m=val.m, dtype=ti.i32))
 
+    def signature(self):
+        return tuple((k, type_signature(self.type_dict[k]), value_signature(self.val_dict[k]))
+                     for k in self.type_dict)
+
     def build(self):
+        global _built_fields_prog
+        # Fields from a previous ti.init/ti.reset are invalid
+        prog = ti.lang.impl.get_runtime().prog
+        if prog is not _built_fields_prog:
+            _built_fields.clear()
+        key = self.signature()
+        if prog is not None and key in _built_fields:
+            self.struct_type, val_field = _built_fields[key]
+            return val_field
         struct_type = ti.types.struct(**self.type_dict)
         val_field = struct_type.field(shape=())
         for k, v in self.val_dict.items():
             val_field[None][k] = v
         self.struct_type = struct_type
+        _built_fields_prog = ti.lang.impl.get_runtime().prog
+        _built_fields[key] = (struct_type, val_field)
         return val_field
 
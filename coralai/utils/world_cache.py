@@ -0,0 +1,169 @@
+import os
+import json
+import time
+import pickle
+import random
+import shutil
+import hashlib
+import warnings
+import numpy as np
+import torch
+
+
+class WorldCache:
+    """
+    Content-addressed on-disk cache for procedurally generated channels (obstacles, ports, etc).
+
+    Entries are keyed by (generator, params, shape, seed). Array outputs of the generator are stored
+    as .npy files and reloaded memory-mapped (numpy) or as cpu tensors (torch); non-array outputs are
+    pickled alongside them.
+    The cache is bounded by total size on disk and evicts the least recently used entries first.
+
+    Usage:
+    - cache = WorldCache("history/world_cache", max_bytes=2**30)
+    - obstacles = cache.get(init_obstacles, shape, {"octaves": 4, "threshold": 0.2}, seed=3)
+    """
+    def __init__(self, cache_dir="history/world_cache", max_bytes=2 * 2**30):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def generator_name(generator):
+        return f"{generator.__module__}.{generator.__qualname__}"
+
+    def key(self, generator, shape, params, seed):
+        desc = {
+            "generator": self.generator_name(generator),
+            "params": params,
+            "shape": list(shape),
+            "seed": seed,
+        }
+        try:
+            desc = json.dumps(desc, sort_keys=True)
+        except TypeError as e:
+            # str() of an arbitrary object can embed its address, which would key the same world differently per run
+            raise ValueError(f"WorldCache: Generator params must be JSON serializable to key the cache: {e}") from e
+        return hashlib.sha256(desc.encode("utf-8")).hexdigest()[:32]
+
+    def get(self, generator, shape, params, seed):
+        """
+        Returns the outputs of generator(shape, params) run with all RNGs seeded by seed.
+        Numpy arrays come back as read-only np.memmaps and torch tensors as cpu tensors, on a hit and on a miss
+        alike. A single output is returned unwrapped.
+        """
+        key = self.key(generator, shape, params, seed)
+        entry_dir = os.path.join(self.cache_dir, key)
+        if os.path.isdir(entry_dir):
+            try:
+                outputs = self._load_entry(entry_dir)
+                os.utime(entry_dir)
+                self.hits += 1
+                return outputs
+            except (OSError, ValueError, pickle.UnpicklingError) as e:
+                warnings.warn(f"WorldCache: Dropping unreadable entry {key}: {e}", stacklevel=2)
+                shutil.rmtree(entry_dir, ignore_errors=True)
+
+        self.misses += 1
+        outputs = self._generate_seeded(generator, shape, params, seed)
+        if self._store_entry(entry_dir, outputs):
+            self.evict(keep=key)
+            return self._load_entry(entry_dir)
+        return outputs
+
+    def _generate_seeded(self, generator, shape, params, seed):
+        # Forks the global RNGs so that a hit and a miss leave them in the same state
+        py_state = random.getstate()
+        np_state = np.random.get_state()
+        torch_state = torch.get_rng_state()
+        try:
+            random.seed(seed)
+            np.random.seed(seed)
+            torch.manual_seed(seed)
+            return generator(shape, params)
+        finally:
+            random.setstate(py_state)
+            np.random.set_state(np_state)
+            torch.set_rng_state(torch_state)
+
+    def _store_entry(self, entry_dir, outputs):
+        single = not isinstance(outputs, tuple)
+        outputs = (outputs,) if single else outputs
+        tmp_dir = f"{entry_dir}.tmp-{os.getpid()}"
+        os.makedirs(tmp_dir, exist_ok=True)
+        layout = []
+        extras = {}
+        try:
+            for i, out in enumerate(outputs):
+                if isinstance(out, torch.Tensor):
+                    np.save(os.path.join(tmp_dir, f"{i}.npy"), out.detach().cpu().numpy())
+                    layout.append("torch")
+                elif isinstance(out, np.ndarray):
+                    np.save(os.path.join(tmp_dir, f"{i}.npy"), out)
+                    layout.append("numpy")
+                else:
+                    extras[i] = out
+                    layout.append("extra")
+            if extras:
+                with open(os.path.join(tmp_dir, "extras.pkl"), "wb") as f:
+                    pickle.dump(extras, f, protocol=pickle.HIGHEST_PROTOCOL)
+            with open(os.path.join(tmp_dir, "layout.json"), "w") as f:
+                json.dump({"single": single, "layout": layout, "created": time.time()}, f)
+        except (pickle.PicklingError, AttributeError, TypeError) as e:
+            warnings.warn(f"WorldCache: Outputs of {os.path.basename(entry_dir)} are not cacheable: {e}", stacklevel=3)
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return False
+        try:
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            # Another process stored the same entry first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        return True
+
+    def _load_entry(self, entry_dir):
+        with open(os.path.join(entry_dir, "layout.json"), "r") as f:
+            info = json.load(f)
+        extras = {}
+        if "extra" in info["layout"]:
+            with open(os.path.join(entry_dir, "extras.pkl"), "rb") as f:
+                extras = pickle.load(f)
+        outputs = []
+        for i, kind in enumerate(info["layout"]):
+            if kind == "extra":
+                outputs.append(extras[i])
+            elif kind == "torch":
+                outputs.append(torch.from_numpy(np.load(os.path.join(entry_dir, f"{i}.npy"))))
+            else:
+                outputs.append(np.load(os.path.join(entry_dir, f"{i}.npy"), mmap_mode="r"))
+        if info["single"]:
+            return outputs[0]
+        return tuple(outputs)
+
+    def entries(self):
+        """Returns (key, last_used, n_bytes) for every complete entry, least recently used first."""
+        entries = []
+        for key in os.listdir(self.cache_dir):
+            entry_dir = os.path.join(self.cache_dir, key)
+            if ".tmp-" in key or not os.path.isdir(entry_dir):
+                continue
+            n_bytes = sum(e.stat().st_size for e in os.scandir(entry_dir) if e.is_file())
+            entries.append((key, os.stat(entry_dir).st_mtime, n_bytes))
+        entries.sort(key=lambda e: e[1])
+        return entries
+
+    def evict(self, keep=None):
+        entries = self.entries()
+        total = sum(e[2] for e in entries)
+        for key, _, n_bytes in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(os.path.join(self.cache_dir, key), ignore_errors=True)
+            total -= n_bytes
+
+    def clear(self):
+        for key, _, _ in self.entries():
+            shutil.rmtree(os.path.join(self.cache_dir, key), ignore_errors=True)
@@ -0,0 +1,35 @@
+import pytest
+import torch
+import taichi as ti
+
+from coralai.instances.coral.coral_layout import CHANNELS, KERNELS
+from coralai.substrate.substrate import Substrate
+
+N_GENOMES = 4
+
+
+@pytest.fixture(scope="session", autouse=True)
+def taichi_cpu():
+    # One Taichi program for the session, re-initializing would invalidate every substrate's fields
+    ti.init(ti.cpu)
+
+
+def make_coral_substrate(shape=(24, 20), live_fraction=0.3, seed=0):
+    """A coral substrate (coral_layout.CHANNELS) with random state and a fraction of the cells alive."""
+    torch.manual_seed(seed)
+    substrate = Substrate(shape, torch.float32, "cpu", CHANNELS)
+    substrate.malloc()
+    inds = substrate.ti_indices[None]
+    mem = substrate.mem
+    mem[0] = torch.randn_like(mem[0])
+    mem[0, inds.energy] = torch.rand_like(mem[0, inds.energy]) * 2 + 0.01
+    mem[0, inds.infra] = torch.rand_like(mem[0, inds.infra]) * 2 + 0.01
+    mem[0, inds.rot] = torch.randint_like(mem[0, inds.rot], 0, len(KERNELS[9]) - 1)
+    mem[0, inds.genome] = torch.where(torch.rand_like(mem[0, inds.genome]) < live_fraction,
+                                      torch.randint_like(mem[0, inds.genome], 0, N_GENOMES), -1)
+    return substrate
+
+
+@pytest.fixture
+def coral_substrate():
+    return make_coral_substrate()
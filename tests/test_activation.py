@@ -0,0 +1,63 @@
+import torch
+
+from coralai.instances.coral.coral_physics import ActivationSpec, activate_outputs, SOFTMAX, NORM_SIGMOID
+from conftest import make_coral_substrate
+
+
+def reference_activate_outputs(substrate):
+    # The unfused torch implementation the fused kernel replaced
+    inds = substrate.ti_indices[None]
+    mem = substrate.mem
+    com = mem[:, inds.com]
+    var, mean = torch.var_mean(com, dim=(0, 2, 3), keepdim=True, unbiased=False)
+    mem[:, inds.com] = torch.sigmoid((com - mean) / torch.sqrt(var + 1e-5))
+    mem[:, [inds.acts_invest, inds.acts_liquidate]] = torch.softmax(mem[0, [inds.acts_invest, inds.acts_liquidate]], dim=0)
+    mem[:, inds.acts_explore] = torch.relu(mem[:, inds.acts_explore])
+    mem[0, inds.acts_explore[0]] = torch.mean(mem[0, inds.acts_explore], dim=0)
+    mem[0, inds.acts_explore] = torch.softmax(mem[0, inds.acts_explore], dim=0)
+    mem[0, inds.acts] = torch.where(mem[0, inds.genome] < 0, 0, mem[0, inds.acts])
+
+
+def test_fused_activation_matches_torch():
+    fused = make_coral_substrate((37, 29))
+    reference = make_coral_substrate((37, 29))
+
+    activate_outputs(fused)
+    reference_activate_outputs(reference)
+
+    assert torch.allclose(fused.mem, reference.mem, atol=1e-6)
+
+
+def test_fused_activation_masks_empty_cells(coral_substrate):
+    activate_outputs(coral_substrate)
+    inds = coral_substrate.ti_indices[None]
+    empty = coral_substrate.mem[0, inds.genome] < 0
+
+    assert empty.any()
+    assert (coral_substrate.mem[0, inds.acts][:, empty] == 0).all()
+    assert torch.allclose(coral_substrate.mem[0, inds.acts_explore][:, ~empty].sum(dim=0), torch.tensor(1.0))
+
+
+def test_custom_spec():
+    substrate = make_coral_substrate()
+    inds = substrate.ti_indices[None]
+    original = substrate.mem.clone()
+    spec = ActivationSpec(substrate, groups=[(SOFTMAX, "com"), (NORM_SIGMOID, "energy")], masked="com")
+
+    activate_outputs(substrate, spec)
+
+    live = substrate.mem[0, inds.genome] >= 0
+    expected_com = torch.where(live, torch.softmax(original[0, inds.com], dim=0), 0)
+    assert torch.allclose(substrate.mem[0, inds.com], expected_com, atol=1e-6)
+    energy = original[0, inds.energy]
+    var, mean = torch.var_mean(energy, unbiased=False)
+    assert torch.allclose(substrate.mem[0, inds.energy], torch.sigmoid((energy - mean) / torch.sqrt(var + 1e-5)), atol=1e-6)
+    assert torch.equal(substrate.mem[0, inds.acts], original[0, inds.acts])
+
+
+def test_specs_share_compiled_kernels():
+    a = make_coral_substrate((8, 8))
+    b = make_coral_substrate((16, 12))
+
+    assert ActivationSpec(a).kernel is ActivationSpec(b).kernel
+    assert ActivationSpec(a).kernel is not ActivationSpec(a, groups=[(SOFTMAX, "com")]).kernel
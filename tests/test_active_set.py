@@ -0,0 +1,81 @@
+import pytest
+import torch
+
+from coralai.instances.coral.coral_layout import KERNELS, SENSE_CHS, ACT_CHS
+from coralai.instances.coral.coral_physics import (apply_weights_and_biases, apply_weights_and_biases_active,
+                                                   compact_active_cells, explore_physics)
+from conftest import N_GENOMES, make_coral_substrate
+
+# One entry per directional neighbor, so the forward kernels never index past dir_order
+DIR_ORDERS = {5: [0, -1, 1, 2], 9: [0, -1, 1, -2, 2, -3, 3, 4]}
+
+
+def active_set(substrate, kernel):
+    active_cells = torch.zeros((substrate.w * substrate.h, 2), dtype=torch.int32)
+    n_active = torch.zeros(1, dtype=torch.int32)
+    compact_active_cells(substrate.mem, active_cells, n_active, kernel, substrate.ti_indices)
+    return active_cells, n_active
+
+
+def forward(substrate, kernel, dir_order, sparse):
+    sense_chinds = torch.tensor(substrate.windex[SENSE_CHS])
+    act_chinds = substrate.windex[ACT_CHS]
+    torch.manual_seed(1)
+    weights = torch.randn((N_GENOMES, 1, len(act_chinds), len(sense_chinds) * kernel.shape[0]))
+    biases = torch.randn((N_GENOMES, 1, len(act_chinds), 1))
+    out_mem = torch.zeros_like(substrate.mem[0, act_chinds])
+    if sparse:
+        active_cells, n_active = active_set(substrate, kernel)
+        apply_weights_and_biases_active(substrate.mem, out_mem, sense_chinds, weights, biases, kernel[1:], dir_order,
+                                        active_cells, n_active, substrate.ti_indices)
+    else:
+        apply_weights_and_biases(substrate.mem, out_mem, sense_chinds, weights, biases, kernel[1:], dir_order,
+                                 substrate.ti_indices)
+    return out_mem
+
+
+@pytest.mark.parametrize("kernel_size", [5, 9])
+@pytest.mark.parametrize("live_fraction", [0.0, 0.05, 0.3, 1.0])
+def test_compact_active_cells(kernel_size, live_fraction):
+    substrate = make_coral_substrate(live_fraction=live_fraction)
+    kernel = torch.tensor(KERNELS[kernel_size])
+    active_cells, n_active = active_set(substrate, kernel)
+
+    live = substrate.mem[0, substrate.ti_indices[None].genome] >= 0
+    expected = torch.zeros_like(live)
+    for dx, dy in KERNELS[kernel_size]:
+        # cell (i, j) is active if (i + dx, j + dy) is live
+        expected |= torch.roll(live, shifts=(-dx, -dy), dims=(0, 1))
+    n = n_active.item()
+    listed = torch.zeros_like(live)
+    listed[active_cells[:n, 0].long(), active_cells[:n, 1].long()] = True
+    assert n == expected.sum().item()
+    assert torch.equal(listed, expected)
+
+
+@pytest.mark.parametrize("kernel_size", [5, 9])
+@pytest.mark.parametrize("live_fraction", [0.0, 0.05, 0.3, 1.0])
+def test_sparse_forward_matches_dense(kernel_size, live_fraction):
+    substrate = make_coral_substrate(live_fraction=live_fraction)
+    kernel = torch.tensor(KERNELS[kernel_size])
+    dir_order = torch.tensor(DIR_ORDERS[kernel_size])
+
+    dense = forward(substrate, kernel, dir_order, sparse=False)
+    sparse = forward(substrate, kernel, dir_order, sparse=True)
+
+    assert torch.equal(sparse, dense)
+
+
+@pytest.mark.parametrize("kernel_size", [5, 9])
+@pytest.mark.parametrize("live_fraction", [0.0, 0.05, 0.3, 1.0])
+def test_sparse_explore_matches_dense(kernel_size, live_fraction):
+    dense = make_coral_substrate(live_fraction=live_fraction)
+    sparse = make_coral_substrate(live_fraction=live_fraction)
+    kernel = torch.tensor(KERNELS[kernel_size])
+    dir_order = torch.tensor(DIR_ORDERS[kernel_size])
+
+    explore_physics(dense, kernel, dir_order)
+    active_cells, n_active = active_set(sparse, kernel)
+    explore_physics(sparse, kernel, dir_order, active_cells, n_active)
+
+    assert torch.equal(sparse.mem, dense.mem)
@@ -0,0 +1,57 @@
+import pytest
+import torch
+
+from coralai.instances.coral.coral_layout import KERNELS
+from coralai.instances.coral.coral_physics import ActivityTiles, distribute_energy, energy_physics
+from conftest import make_coral_substrate
+
+MAX_INFRA = 10
+MAX_ENERGY = 1.5
+
+
+def hot_substrate(shape, seed=0):
+    substrate = make_coral_substrate(shape, seed=seed)
+    inds = substrate.ti_indices[None]
+    infra = substrate.mem[0, inds.infra]
+    # energy is uniform in (0, 2), so about a quarter of the cells are above MAX_ENERGY; add a few hot infra spots
+    infra[torch.rand_like(infra) < 0.02] = 3 * MAX_INFRA
+    return substrate
+
+
+@pytest.mark.parametrize("shape, tile_size", [((24, 20), 8), ((37, 29), 8), ((40, 40), 16), ((10, 7), 16)])
+@pytest.mark.parametrize("kernel_size", [5, 9])
+def test_tiled_energy_physics_matches_dense(shape, tile_size, kernel_size):
+    dense = hot_substrate(shape)
+    tiled = hot_substrate(shape)
+    kernel = torch.tensor(KERNELS[kernel_size])
+    tiles = ActivityTiles(tiled, tile_size)
+
+    for _ in range(3):
+        energy_physics(dense, kernel, MAX_INFRA, MAX_ENERGY)
+        energy_physics(tiled, kernel, MAX_INFRA, MAX_ENERGY, tiles=tiles)
+
+    assert torch.allclose(tiled.mem, dense.mem, atol=1e-5)
+
+
+def test_verify_checks_against_dense():
+    substrate = hot_substrate((37, 29))
+    energy_physics(substrate, torch.tensor(KERNELS[9]), MAX_INFRA, MAX_ENERGY, tiles=ActivityTiles(substrate, 8, verify=True))
+
+
+def test_quiescent_tiles_are_skipped():
+    substrate = make_coral_substrate((40, 40))
+    inds = substrate.ti_indices[None]
+    energy = substrate.mem[0, inds.energy]
+    energy.clamp_(max=MAX_ENERGY)
+    energy[5, 5] = 2 * MAX_ENERGY
+    energy[33, 17] = 2 * MAX_ENERGY
+    kernel = torch.tensor(KERNELS[9])
+    tiles = ActivityTiles(substrate, 8)
+
+    out = tiles.distribute(substrate, inds.energy, MAX_ENERGY, kernel, distribute_energy)
+
+    assert tiles.hot_fraction() == 2 / 25
+    dense_out = torch.zeros_like(out)
+    distribute_energy(substrate.mem, dense_out, MAX_ENERGY, kernel, substrate.ti_indices)
+    assert torch.allclose(out, dense_out, atol=1e-6)
+    assert torch.isclose(out.sum(), energy.sum())
@@ -0,0 +1,140 @@
+import random
+
+import numpy as np
+import pytest
+import torch
+
+pytest.importorskip("pytorch_neat")
+
+from coralai.instances.coral.coral_layout import make_evolver
+from coralai.evolution.space_evolver import SpaceEvolver
+
+
+def genome_summary(genome):
+    return genome.key, sorted((k, c.weight, c.enabled) for k, c in genome.connections.items())
+
+
+def assert_same_evolver(restored, evolver):
+    assert torch.equal(restored.substrate.mem, evolver.substrate.mem)
+    assert restored.substrate.windex.index_tree == evolver.substrate.windex.index_tree
+    assert restored.genome_ids == evolver.genome_ids
+    assert restored.next_genome_id == evolver.next_genome_id
+    assert [genome_summary(g) for g in restored.genomes] == [genome_summary(g) for g in evolver.genomes]
+    assert all(torch.equal(a, b) for a, b in zip(restored.combined_weights, evolver.combined_weights))
+    assert all(torch.equal(a, b) for a, b in zip(restored.combined_biases, evolver.combined_biases))
+    assert restored.ages == evolver.ages
+    assert restored.timestep == evolver.timestep
+    assert restored.time_last_cull == evolver.time_last_cull
+
+
+def draw_rngs():
+    return random.random(), np.random.rand(), torch.rand(4)
+
+
+def assert_same_draws(a, b):
+    assert a[0] == b[0] and a[1] == b[1] and torch.equal(a[2], b[2])
+
+
+def advance(evolver, steps=3):
+    # Stands in for simulation steps: changes memory and ages and consumes random numbers
+    inds = evolver.substrate.ti_indices[None]
+    for _ in range(steps):
+        evolver.timestep += 1
+        evolver.ages = [age + 1 for age in evolver.ages]
+        evolver.apply_forcing()
+        evolver.substrate.mem[0, inds.com] = torch.randn_like(evolver.substrate.mem[0, inds.com])
+
+
+@pytest.fixture
+def evolver():
+    torch.manual_seed(0)
+    random.seed(0)
+    np.random.seed(0)
+    evolver = make_evolver(16, 6, 9, "cpu")
+    advance(evolver)
+    return evolver
+
+
+def test_checkpoint_resume(evolver, tmp_path):
+    evolver.save_checkpoint(str(tmp_path / "step_3"), blocking=True)
+    expected_draws = draw_rngs()
+
+    restored = SpaceEvolver.from_checkpoint(str(tmp_path / "step_3"))
+
+    assert_same_evolver(restored, evolver)
+    assert_same_draws(draw_rngs(), expected_draws)
+
+
+def test_checkpoint_resume_continues_identically(evolver, tmp_path):
+    evolver.save_checkpoint(str(tmp_path / "step_3"), blocking=True)
+    advance(evolver)
+
+    restored = SpaceEvolver.from_checkpoint(str(tmp_path / "step_3"))
+    advance(restored)
+
+    assert_same_evolver(restored, evolver)
+
+
+def test_checkpoint_is_taken_when_saved(evolver, tmp_path):
+    # The write happens on a background thread, from a copy taken on the calling thread
+    mem = evolver.substrate.mem.clone()
+    evolver.save_checkpoint(str(tmp_path / "step_3"))
+    evolver.substrate.mem += 1
+    evolver.wait_for_checkpoint()
+
+    assert torch.equal(SpaceEvolver.from_checkpoint(str(tmp_path / "step_3")).substrate.mem, mem)
+
+
+def test_delta_chain_resume(evolver, tmp_path):
+    evolver.save_checkpoint(str(tmp_path / "step_3"), blocking=True)
+    advance(evolver)
+    evolver.reduce_population_to_threshold(4)
+    evolver.save_checkpoint(str(tmp_path / "step_6"), blocking=True, delta=True)
+    mem_6, genome_ids_6 = evolver.substrate.mem.clone(), list(evolver.genome_ids)
+    advance(evolver)
+    evolver.add_organism_get_key(evolver.genomes[0])
+    evolver.save_checkpoint(str(tmp_path / "step_9"), blocking=True, delta=True)
+    expected_draws = draw_rngs()
+
+    assert "delta" in SpaceEvolver.load_checkpoint_state(str(tmp_path / "step_9"))
+    restored = SpaceEvolver.from_checkpoint(str(tmp_path / "step_9"))
+    assert_same_evolver(restored, evolver)
+    assert_same_draws(draw_rngs(), expected_draws)
+    assert restored.n_since_keyframe == 2
+
+    middle = SpaceEvolver.from_checkpoint(str(tmp_path / "step_6"))
+    assert torch.equal(middle.substrate.mem, mem_6)
+    assert middle.genome_ids == genome_ids_6
+
+
+def test_delta_chain_continues_after_resume(evolver, tmp_path):
+    evolver.save_checkpoint(str(tmp_path / "step_3"), blocking=True)
+    advance(evolver)
+    evolver.save_checkpoint(str(tmp_path / "step_6"), blocking=True, delta=True)
+
+    restored = SpaceEvolver.from_checkpoint(str(tmp_path / "step_6"))
+    advance(restored)
+    restored.reduce_population_to_threshold(3)
+    restored.save_checkpoint(str(tmp_path / "step_9"), blocking=True, delta=True)
+
+    assert_same_evolver(SpaceEvolver.from_checkpoint(str(tmp_path / "step_9")), restored)
+
+
+class HeadlessVis:
+    running = True
+    next_generation = False
+
+    def update(self):
+        pass
+
+
+def test_keyframe_interval(evolver, tmp_path, monkeypatch):
+    monkeypatch.setattr(evolver, "step_sim", lambda weights, biases: evolver.apply_forcing())
+    evolver.checkpoint_dir = str(tmp_path)
+    evolver.run(6, HeadlessVis(), n_rad_spots=0, radiate_interval=1000, cull_max_pop=100,
+                checkpoint_interval=1, keyframe_interval=3)
+    evolver.wait_for_checkpoint()
+
+    deltas = ["delta" in SpaceEvolver.load_checkpoint_state(str(tmp_path / f"step_{t}")) for t in range(4, 10)]
+    assert deltas == [False, True, True, False, True, True]
+    assert_same_evolver(SpaceEvolver.from_checkpoint(str(tmp_path / "step_9")), evolver)
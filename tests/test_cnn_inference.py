@@ -0,0 +1,55 @@
+import pytest
+import torch
+
+from coralai.instances.coral.coral_layout import ACT_CHS, KERNELS, SENSE_CHS
+from coralai.instances.coral.coral_organism_cnn import CoralOrganism
+from coralai.instances.nca.nca_organism_cnn import NCAOrganismCNN
+from conftest import make_coral_substrate
+
+
+def make_coral(substrate):
+    return CoralOrganism(substrate, KERNELS[9], SENSE_CHS, ACT_CHS, "cpu"), substrate.mem
+
+
+def make_nca(substrate):
+    # NCAOrganismCNN.forward takes the sensed channels only
+    organism = NCAOrganismCNN(substrate, KERNELS[9], SENSE_CHS, ACT_CHS, "cpu")
+    return organism, substrate.mem[:, organism.sense_chinds].contiguous()
+
+
+def eager_forward(organism, x):
+    inference, organism.inference = organism.inference, None
+    try:
+        return organism.forward(x)
+    finally:
+        organism.inference = inference
+
+
+def compiled_forward(organism, x):
+    try:
+        return organism.forward(x)
+    except Exception as e:  # torch.compile needs a working inductor backend (C++ compiler)
+        pytest.skip(f"torch.compile unavailable: {type(e).__name__}")
+
+
+@pytest.mark.parametrize("make_organism", [make_coral, make_nca], ids=["coral", "nca"])
+@pytest.mark.parametrize("channels_last", [False, True])
+# compile traces the padded graph, fuse_padding only applies to the eager engine
+@pytest.mark.parametrize("compile, fuse_padding", [(False, True), (False, False), (True, False)],
+                         ids=["buffered", "padded", "compiled"])
+def test_matches_eager_forward(make_organism, channels_last, compile, fuse_padding):
+    torch.manual_seed(0)
+    organism, x = make_organism(make_coral_substrate((20, 16)))
+    expected = eager_forward(organism, x)
+
+    organism.compile_inference(compile=compile, channels_last=channels_last, fuse_padding=fuse_padding)
+    out = compiled_forward(organism, x)
+
+    assert out.shape == expected.shape
+    assert torch.allclose(out, expected, atol=1e-5)
+
+    # The engine reads the live weights, so a mutation after compile_inference shows up without a rebuild
+    organism.mutate(0.5)
+    mutated = eager_forward(organism, x)
+    assert not torch.allclose(mutated, expected, atol=1e-3)
+    assert torch.allclose(compiled_forward(organism, x), mutated, atol=1e-5)
@@ -0,0 +1,64 @@
+import pytest
+import torch
+
+from coralai.evolution.es_evaluator import ESEvaluator
+from coralai.instances.coral.coral_layout import ACT_CHS, KERNELS, SENSE_CHS
+from coralai.instances.coral.coral_organism_cnn import CoralOrganism
+from conftest import make_coral_substrate
+
+N_PERTURBATIONS = 4
+SIGMA = 0.1
+
+
+def make_organism(running_norm=False):
+    torch.manual_seed(0)
+    substrate = make_coral_substrate((20, 16))
+    return CoralOrganism(substrate, KERNELS[9], SENSE_CHS, ACT_CHS, "cpu", running_norm=running_norm), substrate.mem
+
+
+def senses(organism, mem):
+    return mem[:, organism.sense_chinds].expand(N_PERTURBATIONS, -1, -1, -1)
+
+
+def test_zero_noise_matches_organism_forward():
+    organism, mem = make_organism()
+    es = ESEvaluator(organism, N_PERTURBATIONS, sigma=SIGMA)
+    noise = [torch.zeros_like(eps) for eps in es.sample()]
+
+    out = es.forward(senses(organism, mem), noise)
+
+    expected = organism.forward(mem)
+    for k in range(N_PERTURBATIONS):
+        assert torch.allclose(out[k], expected[0], atol=1e-5)
+
+
+def test_replicas_use_their_perturbed_weights():
+    organism, mem = make_organism()
+    es = ESEvaluator(organism, N_PERTURBATIONS, sigma=SIGMA)
+    noise = es.sample()
+
+    out = es.forward(senses(organism, mem), noise)
+
+    layers = organism.conv_layers()
+    weights = [conv.weight.data.clone() for conv, _ in layers]
+    for k in range(N_PERTURBATIONS):
+        for (conv, _), weight, eps in zip(layers, weights, noise):
+            conv.weight.data = weight + SIGMA * eps[k]
+        assert torch.allclose(out[k], organism.forward(mem)[0], atol=1e-5)
+
+
+def test_antithetic_pairs():
+    organism, _ = make_organism()
+    es = ESEvaluator(organism, N_PERTURBATIONS, sigma=SIGMA)
+    half = N_PERTURBATIONS // 2
+
+    for eps in es.sample():
+        assert eps.shape[0] == N_PERTURBATIONS
+        assert torch.equal(eps[half:], -eps[:half])
+        assert not torch.equal(eps[0], eps[1])
+
+
+def test_rejects_running_norm():
+    organism, _ = make_organism(running_norm=True)
+    with pytest.raises(ValueError):
+        ESEvaluator(organism, N_PERTURBATIONS)
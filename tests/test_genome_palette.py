@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+import torch
+
+from coralai.substrate.genome_palette import GenomePalette, hash_colors
+from coralai.substrate.headless import HeadlessRenderer
+
+
+def colors_by_id(palette):
+    return {genome_id: palette.lut[i].tolist() for i, genome_id in enumerate(palette.genome_ids)}
+
+
+def test_colors_follow_ids_across_renumbering():
+    palette = GenomePalette("cpu", capacity=4)
+    palette.update([0, 1, 2, 3])
+    before = colors_by_id(palette)
+    # Cull genomes 0 and 2: the survivors are renumbered to indices 0 and 1, then new genomes are appended
+    palette.update([1, 3])
+    palette.update([1, 3, 4, 5, 6])
+
+    after = colors_by_id(palette)
+    assert after[1] == before[1] and after[3] == before[3]
+    assert palette.n_colors == 5
+    assert palette.lut.shape[0] >= 5
+    assert torch.equal(palette.lut[:5], hash_colors([1, 3, 4, 5, 6], "cpu"))
+
+
+def test_distinct_ids_get_distinct_colors():
+    colors = hash_colors(list(range(256)), "cpu")
+
+    assert ((colors >= 0) & (colors <= 1)).all()
+    assert len({tuple(c) for c in colors.tolist()}) == 256
+
+
+def test_cull_keeps_rendered_colors():
+    pytest.importorskip("pytorch_neat")
+    from coralai.instances.coral.coral_layout import make_evolver
+
+    torch.manual_seed(0)
+    evolver = make_evolver(16, 6, 9, "cpu")
+    inds = evolver.substrate.ti_indices[None]
+    palette = GenomePalette("cpu")
+    evolver.set_genome_palette(palette)
+    renderer = HeadlessRenderer(evolver.substrate, ["energy", "infra", "genome"])
+    renderer.set_genome_palette(palette)
+
+    genome_ids = list(evolver.genome_ids)
+    ids_before = [[genome_ids[int(g)] if g >= 0 else -1 for g in row] for row in evolver.substrate.mem[0, inds.genome].tolist()]
+    frame_before = renderer.update().copy()
+    evolver.reduce_population_to_threshold(3)
+    frame_after = renderer.update().copy()
+
+    genome = evolver.substrate.mem[0, inds.genome]
+    assert len(evolver.genomes) == 3 and genome.max() == 2
+    # Frames are (h, w) top row first, memory is (w, h)
+    survived = np.flipud((genome >= 0).numpy().T)
+    assert survived.any()
+    assert np.array_equal(frame_after[survived], frame_before[survived])
+    assert (frame_after[~survived] == 0).all()
+    ids_after = [[evolver.genome_ids[int(g)] if g >= 0 else -1 for g in row] for row in genome.tolist()]
+    assert all(a == b for row_a, row_b in zip(ids_after, ids_before) for a, b in zip(row_a, row_b) if a >= 0)
@@ -0,0 +1,65 @@
+import torch
+
+from coralai.evolution.genome_routed_cnn import GenomeRoutedCNN
+from coralai.instances.coral.coral_layout import ACT_CHS, KERNELS, SENSE_CHS
+from coralai.instances.coral.coral_organism_cnn import CoralOrganism
+from conftest import make_coral_substrate
+
+
+def make_organisms(substrate, n):
+    return {key: CoralOrganism(substrate, KERNELS[9], SENSE_CHS, ACT_CHS, "cpu") for key in range(n)}
+
+
+def masked_reference(substrate, organisms):
+    """Every genome's layers convolve the whole grid, each genome keeps its own cells and normalizes over them."""
+    mem = substrate.mem
+    inds = substrate.ti_indices[None]
+    genome = mem[0, inds.genome]
+    x = mem[0, substrate.windex[SENSE_CHS]]
+    n_layers = len(next(iter(organisms.values())).conv_layers())
+    with torch.no_grad():
+        for layer_i in range(n_layers):
+            out = None
+            for key, organism in organisms.items():
+                conv, activated = organism.conv_layers()[layer_i]
+                y = conv(x[None])[0]
+                out = torch.zeros_like(y) if out is None else out
+                mask = genome == key
+                seg = y[:, mask]
+                if activated:
+                    seg = torch.relu(seg)
+                    var, mean = torch.var_mean(seg, dim=1, keepdim=True, unbiased=False)
+                    seg = torch.sigmoid((seg - mean) * torch.rsqrt(var + 1e-5))
+                out[:, mask] = seg
+            x = out
+    return x
+
+
+def test_single_genome_matches_organism_forward():
+    substrate = make_coral_substrate((20, 16))
+    inds = substrate.ti_indices[None]
+    substrate.mem[0, inds.genome] = 0
+    organism = make_organisms(substrate, 1)[0]
+    routed = GenomeRoutedCNN(substrate, SENSE_CHS, ACT_CHS)
+
+    out = routed.forward({0: organism})
+
+    assert torch.allclose(out, organism.forward(substrate.mem)[0], atol=1e-7)
+
+
+def test_cells_use_their_own_genome():
+    substrate = make_coral_substrate((20, 16))
+    inds = substrate.ti_indices[None]
+    genome = substrate.mem[0, inds.genome]
+    genome[:] = torch.where(genome >= 0, genome % 2, -1)
+    organisms = make_organisms(substrate, 2)
+    routed = GenomeRoutedCNN(substrate, SENSE_CHS, ACT_CHS)
+
+    out = routed.forward(organisms)
+
+    assert (genome == 0).any() and (genome == 1).any() and (genome < 0).any()
+    assert torch.allclose(out, masked_reference(substrate, organisms), atol=1e-6)
+    assert (out[:, genome < 0] == 0).all()
+    # Routing every cell through genome 0 gives different actions on genome 1's cells
+    same = routed.forward({0: organisms[0], 1: organisms[0]})
+    assert not torch.allclose(same[:, genome == 1], out[:, genome == 1], atol=1e-3)
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from coralai.substrate.headless import HeadlessRenderer, PNGSequenceWriter
+from coralai.substrate.visualization import Renderer, Visualization
+
+CHIDS = ["energy", "infra", "genome"]
+
+
+def image_to_rgb8(renderer):
+    # The (w, h) image field, y up, as the (h, w, 3) top-row-first uint8 frame a window would show
+    return (renderer.image.to_numpy()[:, ::-1].transpose(1, 0, 2) * 255).astype(np.uint8)
+
+
+def windowed_renderer(substrate):
+    try:
+        return Visualization(substrate, CHIDS)
+    except RuntimeError as e:  # GGUI needs Vulkan and a display
+        pytest.skip(f"no window available: {e}")
+
+
+@pytest.mark.parametrize("make_reference", [lambda s: Renderer(s, CHIDS), windowed_renderer])
+def test_frame_matches_windowed_image(coral_substrate, make_reference):
+    reference = make_reference(coral_substrate)
+    reference.render()
+    headless = HeadlessRenderer(coral_substrate, CHIDS)
+    frame = headless.update()
+
+    assert frame.shape == (coral_substrate.h, coral_substrate.w, 3)
+    assert frame.dtype == np.uint8
+    assert np.array_equal(frame, image_to_rgb8(reference))
+
+
+def test_frames_reach_the_sink(coral_substrate):
+    frames = []
+    headless = HeadlessRenderer(coral_substrate, CHIDS, sink=lambda frame, frame_n: frames.append((frame_n, frame.copy())))
+    expected = []
+    for _ in range(3):
+        coral_substrate.mem *= 1.5
+        expected.append(headless.update().copy())
+    headless.close()
+
+    assert [n for n, _ in frames] == [0, 1, 2]
+    assert all(np.array_equal(frame, e) for (_, frame), e in zip(frames, expected))
+
+
+def test_png_sequence(coral_substrate, tmp_path):
+    headless = HeadlessRenderer(coral_substrate, CHIDS, sink=PNGSequenceWriter(str(tmp_path)))
+    headless.update()
+    headless.update()
+    headless.close()
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["frame_000000.png", "frame_000001.png"]
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+import torch
+
+pytest.importorskip("pytorch_neat")
+
+from coralai.evolution.islands import decode_genome, encode_genome
+from coralai.instances.coral.coral_layout import make_evolver
+
+N_MIGRANTS = 3
+MAX_POPULATION = 5
+
+
+def cell_ids(evolver):
+    """Genome id (not index) held by each cell, -1 where empty."""
+    inds = evolver.substrate.ti_indices[None]
+    genome_ids = evolver.genome_ids
+    return [[genome_ids[int(g)] if g >= 0 else -1 for g in row] for row in evolver.substrate.mem[0, inds.genome].tolist()]
+
+
+def test_top_genomes_orders_by_cell_count():
+    torch.manual_seed(0)
+    evolver = make_evolver(16, 6, 9, "cpu")
+    counts = evolver.get_genome_cell_counts().tolist()
+    top = evolver.top_genomes(N_MIGRANTS)
+
+    assert len(top) == N_MIGRANTS
+    top_counts = [counts[evolver.genomes.index(g)] for g in top]
+    assert top_counts == sorted(counts, reverse=True)[:N_MIGRANTS]
+
+
+def test_migration_keeps_population_and_numbering_consistent():
+    torch.manual_seed(0)
+    np.random.seed(0)
+    src = make_evolver(16, 4, 9, "cpu")
+    dst = make_evolver(16, 4, 9, "cpu")
+    inds = dst.substrate.ti_indices[None]
+    migrants = src.top_genomes(N_MIGRANTS)
+    immigrants = [decode_genome(encode_genome(g), dst.neat_config.genome_config) for g in migrants]
+    n_before = len(dst.genomes)
+    next_id = dst.next_genome_id
+
+    keys = dst.add_immigrants(immigrants)
+
+    assert keys == list(range(n_before, n_before + N_MIGRANTS))
+    assert dst.genome_ids[n_before:] == list(range(next_id, next_id + N_MIGRANTS))
+    for key, immigrant, migrant in zip(keys, immigrants, migrants):
+        assert dst.genomes[key] is immigrant
+        assert immigrant.connections.keys() == migrant.connections.keys()
+        assert dst.get_genome_cell_counts()[key] > 0
+    assert len(set(dst.genome_ids)) == len(dst.genome_ids)
+
+    ids_before = cell_ids(dst)
+    dst.reduce_population_to_threshold(MAX_POPULATION)
+
+    genome = dst.substrate.mem[0, inds.genome]
+    assert len(dst.genomes) == MAX_POPULATION
+    assert len(dst.genome_ids) == len(dst.ages) == len(dst.combined_weights) == len(dst.combined_biases) == MAX_POPULATION
+    assert genome.max() < MAX_POPULATION and genome.min() >= -1
+    # Survivors keep their ids and the cells they held, culled genomes' cells are emptied
+    assert len(set(dst.genome_ids)) == MAX_POPULATION
+    for row_after, row_before in zip(cell_ids(dst), ids_before):
+        for a, b in zip(row_after, row_before):
+            assert a == (b if b in dst.genome_ids else -1)
+    assert dst.next_genome_id == next_id + N_MIGRANTS
@@ -0,0 +1,57 @@
+import random
+
+import neat
+import numpy as np
+import pytest
+import torch
+
+pytest.importorskip("pytorch_neat")
+
+from coralai.evolution.neat_evolver import NEATEvolver
+from coralai.instances.coral.coral_layout import CHANNELS, KERNELS, CONFIG_PATH, SENSE_CHS, ACT_CHS
+from coralai.substrate.substrate import Substrate
+
+N_TIMESTEPS = 5
+
+
+def make_neat_evolver():
+    substrate = Substrate((16, 16), torch.float32, "cpu", CHANNELS)
+    substrate.malloc()
+    return NEATEvolver(CONFIG_PATH, substrate, KERNELS[9], 0, SENSE_CHS, ACT_CHS)
+
+
+def make_genomes(evolver, n):
+    genomes = []
+    for i in range(n):
+        genome = neat.DefaultGenome(i)
+        genome.configure_new(evolver.neat_config.genome_config)
+        genomes.append((i, genome))
+    return genomes
+
+
+def eval_serial(genomes, seed):
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+    make_neat_evolver().eval_genomes(genomes, N_TIMESTEPS)
+    return [genome.fitness for _, genome in genomes]
+
+
+def test_parallel_matches_serial():
+    evolver = make_neat_evolver()
+    genomes = make_genomes(evolver, 4)
+    try:
+        parallel = evolver.eval_genomes_parallel(genomes, N_TIMESTEPS, n_workers=1, n_episodes=1, seed=7)
+        # Workers are reused, a second evaluation must not depend on what they ran before
+        again = evolver.eval_genomes_parallel(genomes, N_TIMESTEPS, n_workers=1, n_episodes=1, seed=7)
+        episodes = evolver.eval_genomes_parallel(genomes, N_TIMESTEPS, n_workers=2, n_episodes=2, seed=7)
+        assert [genome.fitness for _, genome in genomes] == episodes
+    finally:
+        evolver.close_eval_pool()
+
+    # Workers run Taichi single threaded, so float sums may round differently than here
+    serial = eval_serial(genomes, 7)
+    assert parallel == pytest.approx(serial, rel=1e-4, abs=1e-3)
+    assert again == parallel
+    expected_mean = np.mean([serial, eval_serial(genomes, 8)], axis=0)
+    assert episodes == pytest.approx(expected_mean, rel=1e-4, abs=1e-3)
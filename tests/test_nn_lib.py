@@ -0,0 +1,77 @@
+import torch
+
+from coralai.substrate.nn_lib import RunningChNorm, ch_norm
+
+
+def reference_norm(x):
+    # ch_norm before the fused reduction: separate mean and var passes, then a division by the std
+    mean = x.mean(dim=(0, 2, 3), keepdim=True)
+    var = x.var(dim=(0, 2, 3), keepdim=True, unbiased=False)
+    return (x - mean) / torch.sqrt(var + 1e-5)
+
+
+def batch_stats(x):
+    var, mean = torch.var_mean(x, dim=(0, 2, 3), keepdim=True, unbiased=False)
+    return mean, var
+
+
+def test_ch_norm_normalizes_a_view_in_place():
+    torch.manual_seed(0)
+    mem = torch.randn((1, 8, 16, 12)) * 3 + 2
+    before = mem.clone()
+    expected = reference_norm(mem[:, 2:6])
+
+    out = ch_norm(mem[:, 2:6])
+
+    assert out.data_ptr() == mem[:, 2:6].data_ptr()
+    assert torch.allclose(mem[:, 2:6], expected, atol=1e-5)
+    var, mean = torch.var_mean(mem[:, 2:6], dim=(0, 2, 3), unbiased=False)
+    assert torch.allclose(mean, torch.zeros(4), atol=1e-5)
+    assert torch.allclose(var, torch.ones(4), atol=1e-3)
+    # Channels outside the view are untouched
+    assert torch.equal(mem[:, :2], before[:, :2]) and torch.equal(mem[:, 6:], before[:, 6:])
+
+
+def test_running_stats_reduce_every_update_interval():
+    torch.manual_seed(0)
+    xs = [torch.randn((1, 3, 8, 8)) * (i + 1) + i for i in range(5)]
+    running = RunningChNorm(momentum=0.25, update_interval=3)
+
+    mean, inv_std = running.stats(xs[0])
+    mean0, var0 = batch_stats(xs[0])
+    assert torch.allclose(mean, mean0) and torch.allclose(inv_std, torch.rsqrt(var0 + 1e-5))
+
+    # The calls in between reuse the averages whatever their input
+    for x in xs[1:3]:
+        mean, inv_std = running.stats(x)
+        assert torch.allclose(mean, mean0) and torch.allclose(inv_std, torch.rsqrt(var0 + 1e-5))
+
+    mean, inv_std = running.stats(xs[3])
+    mean3, var3 = batch_stats(xs[3])
+    blended_var = var0 + 0.25 * (var3 - var0)
+    assert torch.allclose(mean, mean0 + 0.25 * (mean3 - mean0))
+    assert torch.allclose(inv_std, torch.rsqrt(blended_var + 1e-5))
+
+
+def test_running_stats_reset_on_channel_count_change():
+    torch.manual_seed(0)
+    running = RunningChNorm(update_interval=10)
+    running.stats(torch.randn((1, 3, 8, 8)))
+    x = torch.randn((1, 5, 8, 8)) * 2 + 1
+
+    mean, inv_std = running.stats(x)
+
+    mean_x, var_x = batch_stats(x)
+    assert mean.shape == (1, 5, 1, 1)
+    assert torch.allclose(mean, mean_x) and torch.allclose(inv_std, torch.rsqrt(var_x + 1e-5))
+
+
+def test_ch_norm_with_running_stats():
+    torch.manual_seed(0)
+    running = RunningChNorm(update_interval=2)
+    x = torch.randn((1, 4, 8, 8)) * 3 + 1
+    ch_norm(x.clone(), running)
+    y = torch.randn((1, 4, 8, 8))
+    mean, inv_std = running.mean.clone(), torch.rsqrt(running.var + running.eps)
+
+    assert torch.allclose(ch_norm(y.clone(), running), (y - mean) * inv_std)
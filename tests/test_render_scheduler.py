@@ -0,0 +1,79 @@
+import time
+
+from coralai.substrate.render_scheduler import RenderScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeVis:
+    """Snapshots are the value of a counter the test advances like simulation state."""
+    def __init__(self):
+        self.state = 0
+        self.rendered = []
+
+    def snapshot_channels(self, out=None):
+        return [self.state]
+
+    def update(self, snapshot=None):
+        self.rendered.append(snapshot[0])
+
+
+def test_frame_due_honors_the_fps_budget():
+    clock = FakeClock()
+    scheduler = RenderScheduler(FakeVis(), target_fps=10, clock=clock)
+
+    assert scheduler.frame_due()
+    assert scheduler.publish()
+    clock.now = 0.05
+    assert not scheduler.frame_due()
+    assert not scheduler.publish()
+    clock.now = 0.1
+    assert scheduler.frame_due()
+    assert scheduler.publish()
+    assert not scheduler.frame_due()
+
+
+def test_frames_track_the_budget_not_the_steps():
+    clock = FakeClock()
+    vis = FakeVis()
+    scheduler = RenderScheduler(vis, target_fps=16, clock=clock)
+    for step in range(100):
+        vis.state = step
+        scheduler.publish()
+        clock.now += 1 / 64
+
+    # one frame every 4 steps of 1/64 s (exact in binary, so the budget test doesn't hit rounding)
+    assert scheduler.n_published == scheduler.n_rendered == 25
+    assert vis.rendered == list(range(0, 100, 4))
+
+
+def test_force_publishes_regardless_of_budget():
+    scheduler = RenderScheduler(FakeVis(), target_fps=10, clock=FakeClock())
+    scheduler.publish()
+
+    assert not scheduler.publish()
+    assert scheduler.publish(force=True)
+    assert scheduler.n_published == 2
+
+
+def test_threaded_renders_latest_frame():
+    vis = FakeVis()
+    scheduler = RenderScheduler(vis, target_fps=1000, threaded=True)
+    try:
+        for step in range(5):
+            vis.state = step
+            scheduler.publish(force=True)
+            deadline = time.perf_counter() + 5
+            while scheduler.n_rendered + scheduler.n_skipped <= step and time.perf_counter() < deadline:
+                time.sleep(0.001)
+    finally:
+        scheduler.close()
+
+    assert scheduler.n_rendered + scheduler.n_skipped == 5
+    assert vis.rendered == sorted(vis.rendered) and len(vis.rendered) == scheduler.n_rendered
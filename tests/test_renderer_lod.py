@@ -0,0 +1,39 @@
+import pytest
+import torch
+import torch.nn.functional as F
+
+from coralai.substrate.visualization import Renderer
+from conftest import make_coral_substrate
+
+CHIDS = ["energy", "infra", ("acts", "invest")]
+
+
+def expected_image(chs, pool, pool_max):
+    pooled = F.max_pool2d(chs, pool) if pool_max else F.avg_pool2d(chs, pool)
+    lo = pooled.amin(dim=(2, 3), keepdim=True)
+    hi = pooled.amax(dim=(2, 3), keepdim=True)
+    # (w, h, 3), normalized by the frame's range as on a first frame
+    return ((pooled - lo) / (hi - lo))[0].permute(1, 2, 0)
+
+
+@pytest.mark.parametrize("pool_max", [False, True])
+def test_pooled_lod(pool_max):
+    substrate = make_coral_substrate((64, 48))
+    renderer = Renderer(substrate, CHIDS, image_res=(16, 12), pool_max=pool_max)
+    renderer.render()
+
+    assert renderer.pool_size == 4
+    image = renderer.image.to_numpy()
+    assert image.shape == (16, 12, 3)
+    assert torch.allclose(torch.from_numpy(image), expected_image(substrate.mem[:, substrate.windex[CHIDS]], 4, pool_max), atol=1e-5)
+
+
+def test_zoomed_in_reads_single_cells():
+    substrate = make_coral_substrate((64, 48))
+    renderer = Renderer(substrate, CHIDS, image_res=(16, 12))
+    renderer.zoom(4, pos=(0, 0))
+    renderer.render()
+
+    assert renderer.pool_size == 1
+    visible = substrate.mem[:, substrate.windex[CHIDS], :16, :12]
+    assert torch.allclose(torch.from_numpy(renderer.image.to_numpy()), expected_image(visible, 1, False), atol=1e-5)
@@ -0,0 +1,37 @@
+import pytest
+import torch
+
+pytest.importorskip("pytorch_neat")
+
+from coralai.evolution.shards import ShardedWorld
+from coralai.instances.coral.coral_layout import make_evolver
+
+# One entry per directional neighbor, the forward kernel reads dir_order at every neighbor offset
+DIR_ORDER_9 = [0, -1, 1, -2, 2, -3, 3, 4]
+N_STEPS = 5
+
+
+def test_interior_matches_unsharded_run():
+    torch.manual_seed(0)
+    evolver = make_evolver(32, 4, 9, "cpu", dir_order=DIR_ORDER_9)
+    weights = torch.stack(evolver.combined_weights, dim=0)
+    biases = torch.stack(evolver.combined_biases, dim=0)
+    initial = evolver.substrate.mem.clone()
+    # Starts off the kill chunk timesteps (multiples of 50), forcing is off on both sides
+    for t in range(1, 1 + N_STEPS):
+        evolver.timestep = t
+        evolver.forward(weights, biases)
+    expected = evolver.substrate.mem.clone()
+
+    evolver.substrate.mem.copy_(initial)
+    evolver.timestep = 1
+    world = ShardedWorld(evolver, shards=(2, 2), forcing=False)
+    try:
+        world.start()
+        world.step(N_STEPS)
+    finally:
+        world.close()
+
+    assert evolver.timestep == 1 + N_STEPS
+    assert not torch.equal(expected, initial)
+    assert torch.allclose(evolver.substrate.mem, expected, atol=1e-5)
@@ -0,0 +1,64 @@
+import json
+import os
+
+import pytest
+import torch
+import taichi as ti
+
+from coralai.substrate.substrate import Substrate
+
+
+def test_snapshot_round_trip(coral_substrate, tmp_path):
+    coral_substrate.save_snapshot(tmp_path / "snap")
+    loaded = Substrate.load(tmp_path / "snap")
+
+    assert torch.equal(loaded.mem, coral_substrate.mem)
+    assert loaded.windex.index_tree == coral_substrate.windex.index_tree
+    assert loaded.torch_dtype == coral_substrate.torch_dtype
+    inds, loaded_inds = coral_substrate.ti_indices[None], loaded.ti_indices[None]
+    assert loaded_inds.genome == inds.genome
+    assert list(loaded_inds.acts_explore) == list(inds.acts_explore)
+
+
+def test_snapshot_keeps_lims_and_metadata(tmp_path):
+    substrate = Substrate((8, 6), torch.float32, "cpu", {
+        "energy": {"ti_dtype": ti.f32, "lims": [0, 5], "description": "free energy"},
+        "com": ti.types.vector(n=3, dtype=ti.f32),
+    })
+    substrate.malloc()
+    substrate.mem[0] = torch.randn_like(substrate.mem[0])
+    substrate.save_snapshot(tmp_path / "snap")
+    loaded = Substrate.load(tmp_path / "snap")
+
+    assert loaded.channels["energy"].lims.tolist() == [0, 5]
+    assert loaded.channels["energy"].metadata["description"] == "free energy"
+    assert torch.equal(loaded["com"], substrate["com"])
+
+
+def test_snapshot_of_passed_mem(coral_substrate, tmp_path):
+    mem = coral_substrate.mem.clone()
+    coral_substrate.mem += 1
+    coral_substrate.save_snapshot(tmp_path / "snap", mem=mem)
+
+    assert torch.equal(Substrate.load(tmp_path / "snap").mem, mem)
+
+
+@pytest.mark.parametrize("key", ["energy", "com", ("acts", "explore"), ("acts", ["invest", "liquidate"]), ["energy", "genome"]])
+def test_load_channels(coral_substrate, tmp_path, key):
+    coral_substrate.save_snapshot(tmp_path / "snap")
+    chs = Substrate.load_channels(tmp_path / "snap", key)
+
+    assert torch.equal(chs, coral_substrate.mem[:, coral_substrate.windex[key]])
+
+
+def test_load_rejects_other_versions(coral_substrate, tmp_path):
+    coral_substrate.save_snapshot(tmp_path / "snap")
+    header_path = os.path.join(tmp_path, "snap", "header.json")
+    with open(header_path) as f:
+        header = json.load(f)
+    header["version"] = -1
+    with open(header_path, "w") as f:
+        json.dump(header, f)
+
+    with pytest.raises(ValueError):
+        Substrate.load(tmp_path / "snap")
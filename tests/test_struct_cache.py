@@ -0,0 +1,60 @@
+import torch
+import taichi as ti
+
+from coralai.instances.coral.coral_layout import CHANNELS
+from coralai.substrate.substrate import Substrate
+from coralai.utils.ti_struct_factory import TaichiStructFactory
+
+
+def make_substrate(shape, channels):
+    substrate = Substrate(shape, torch.float32, "cpu", channels)
+    substrate.malloc()
+    return substrate
+
+
+def test_same_layout_shares_fields():
+    a = make_substrate((8, 8), CHANNELS)
+    b = make_substrate((32, 16), CHANNELS)
+
+    assert a.ti_indices is b.ti_indices
+    assert a.ti_lims is b.ti_lims
+
+
+def test_different_layouts_get_their_own_fields():
+    reordered = {"genome": CHANNELS["genome"], **{k: v for k, v in CHANNELS.items() if k != "genome"}}
+    wider = dict(CHANNELS, acts=ti.types.struct(invest=ti.f32, liquidate=ti.f32,
+                                                explore=ti.types.vector(n=8, dtype=ti.f32)))
+    substrates = [make_substrate((8, 8), channels) for channels in (CHANNELS, reordered, wider)]
+
+    assert len({id(s.ti_indices) for s in substrates}) == 3
+    for s in substrates:
+        inds = s.ti_indices[None]
+        assert inds.genome == s.windex["genome"][0]
+        assert inds.rot == s.windex["rot"][0]
+        assert list(inds.acts_explore) == list(s.windex[("acts", "explore")])
+
+
+def test_different_lims_get_their_own_fields():
+    a = make_substrate((8, 8), dict(CHANNELS, energy={"ti_dtype": ti.f32, "lims": [0, 1]}))
+    b = make_substrate((8, 8), dict(CHANNELS, energy={"ti_dtype": ti.f32, "lims": [0, 10]}))
+
+    assert a.ti_indices is b.ti_indices
+    assert a.ti_lims is not b.ti_lims
+    assert list(a.ti_lims[None].energy) == [0, 1]
+    assert list(b.ti_lims[None].energy) == [0, 10]
+
+
+def test_factory_keys_on_types_and_values():
+    def build(val, dtype):
+        factory = TaichiStructFactory()
+        factory.add_i("a", 1)
+        factory.add("b", val, dtype)
+        return factory.build()
+
+    vec2 = ti.types.vector(n=2, dtype=ti.i32)
+    vec3 = ti.types.vector(n=3, dtype=ti.i32)
+    assert build([1, 2], vec2) is build([1, 2], ti.types.vector(n=2, dtype=ti.i32))
+    assert build([1, 2], vec2) is not build([1, 3], vec2)
+    assert build([1, 2, 3], vec3) is not build([1, 2], vec2)
+    assert build(2, ti.i32) is not build(2, ti.f32)
+    assert build(2, ti.f32)[None].b == 2.0
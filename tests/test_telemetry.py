@@ -0,0 +1,74 @@
+import pytest
+import torch
+
+from coralai.substrate.render_scheduler import RenderScheduler
+from coralai.substrate.telemetry import Telemetry
+
+
+class CountingTelemetry(Telemetry):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.n_records = 0
+
+    def record(self, timestep, force=False, **kwargs):
+        recorded = super().record(timestep, force=force, **kwargs)
+        self.n_records += recorded
+        return recorded
+
+
+class HeadlessVis:
+    running = True
+    next_generation = False
+
+    def __init__(self, substrate):
+        self.substrate = substrate
+
+    def snapshot_channels(self, out=None):
+        return self.substrate.mem.clone()
+
+    def update(self, snapshot=None):
+        pass
+
+
+def test_stats(coral_substrate):
+    telemetry = Telemetry(coral_substrate, ["energy", "infra"], genome_chid="genome")
+    telemetry.set_probe(3, 5)
+    telemetry.record(7, n_genomes=4, population=4)
+    stats = telemetry.latest()
+
+    mem = coral_substrate.mem[0]
+    inds = coral_substrate.ti_indices[None]
+    assert stats["timestep"] == 7 and stats["population"] == 4
+    assert stats["total"]["energy"] == pytest.approx(mem[inds.energy].sum().item(), rel=1e-5)
+    assert stats["probe"]["infra"] == pytest.approx(mem[inds.infra, 3, 5].item())
+    assert stats["probe_genome"] == mem[inds.genome, 3, 5].item()
+    assert stats["genome_cells"] == [mem[inds.genome].eq(i).sum().item() for i in range(4)]
+
+
+def test_records_track_drawn_frames(monkeypatch):
+    pytest.importorskip("pytorch_neat")
+    from coralai.evolution import space_evolver
+    from coralai.instances.coral.coral_layout import make_evolver
+
+    torch.manual_seed(0)
+    evolver = make_evolver(16, 4, 9, "cpu")
+    now = [0.0]
+    schedulers = []
+
+    def make_scheduler(vis, target_fps):
+        schedulers.append(RenderScheduler(vis, target_fps=target_fps, clock=lambda: now[0]))
+        return schedulers[-1]
+
+    def step_sim(weights, biases):
+        # 1/64 s per step, exact in binary
+        now[0] += 1 / 64
+        evolver.apply_forcing()
+
+    monkeypatch.setattr(space_evolver, "RenderScheduler", make_scheduler)
+    monkeypatch.setattr(evolver, "step_sim", step_sim)
+    telemetry = CountingTelemetry(evolver.substrate, ["energy", "infra"], genome_chid="genome")
+    evolver.run(64, HeadlessVis(evolver.substrate), n_rad_spots=0, radiate_interval=1000, cull_max_pop=100,
+                render_fps=16, telemetry=telemetry)
+
+    assert schedulers[0].n_rendered == 16
+    assert telemetry.n_records == schedulers[0].n_rendered
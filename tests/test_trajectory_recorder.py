@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+import torch
+
+from coralai.substrate.trajectory_recorder import TrajectoryRecorder, TrajectoryReader
+
+
+def test_record_then_read(coral_substrate, tmp_path):
+    chids = ["genome", ("acts", "explore")]
+    chinds = coral_substrate.windex[chids]
+    expected = {}
+    # A ring larger than the number of frames, so none are dropped however slow the writer is
+    with TrajectoryRecorder(coral_substrate, chids, str(tmp_path), interval=3, chunk_size=4, ring_size=16) as recorder:
+        for timestep in range(25):
+            coral_substrate.mem += torch.randn_like(coral_substrate.mem)
+            if recorder.record(timestep):
+                expected[timestep] = coral_substrate.mem[0, chinds].clone().numpy()
+    assert recorder.n_dropped == 0
+
+    reader = TrajectoryReader(str(tmp_path))
+    assert reader.timesteps == list(range(0, 25, 3))
+    assert reader.chnames == [coral_substrate.index_to_chname(i) for i in chinds]
+    assert len(reader.chunks) == 3
+    for timestep in reversed(reader.timesteps):
+        assert np.array_equal(reader[timestep], expected[timestep])
+    for timestep in (1, 25, -3):
+        with pytest.raises(KeyError):
+            reader[timestep]
+
+
+def test_forced_frames(coral_substrate, tmp_path):
+    with TrajectoryRecorder(coral_substrate, ["energy"], str(tmp_path), interval=10) as recorder:
+        recorder.record(0)
+        recorder.record(7)
+        recorder.record(7, force=True)
+
+    assert TrajectoryReader(str(tmp_path)).timesteps == [0, 7]
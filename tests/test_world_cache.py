@@ -0,0 +1,81 @@
+import random
+import time
+
+import numpy as np
+import pytest
+import torch
+
+from coralai.utils.world_cache import WorldCache
+
+
+def numpy_world(shape, params):
+    return np.random.rand(*shape) * params["scale"]
+
+
+def torch_world(shape, params):
+    return torch.rand(shape) * params["scale"], {"n_ports": random.randint(0, 100)}
+
+
+def draw_rngs():
+    return random.random(), np.random.rand(), torch.rand(1).item()
+
+
+@pytest.mark.parametrize("generator", [numpy_world, torch_world])
+def test_miss_then_hit(tmp_path, generator):
+    cache = WorldCache(str(tmp_path))
+    miss = cache.get(generator, (8, 6), {"scale": 2.0}, seed=3)
+    hit = cache.get(generator, (8, 6), {"scale": 2.0}, seed=3)
+
+    assert (cache.misses, cache.hits) == (1, 1)
+    if generator is numpy_world:
+        assert isinstance(miss, np.ndarray) and isinstance(hit, np.ndarray)
+        assert np.array_equal(miss, hit)
+    else:
+        assert isinstance(miss[0], torch.Tensor) and isinstance(hit[0], torch.Tensor)
+        assert torch.equal(miss[0], hit[0])
+        assert miss[1] == hit[1]
+
+
+def test_seeded_like_a_fresh_run(tmp_path):
+    cache = WorldCache(str(tmp_path))
+    np.random.seed(3)
+    expected = numpy_world((8, 6), {"scale": 2.0})
+
+    assert np.array_equal(cache.get(numpy_world, (8, 6), {"scale": 2.0}, seed=3), expected)
+    assert not np.array_equal(cache.get(numpy_world, (8, 6), {"scale": 2.0}, seed=4), expected)
+
+
+def test_global_rng_state_is_unchanged(tmp_path):
+    cache = WorldCache(str(tmp_path))
+    for _ in range(2):  # miss, then hit
+        random.seed(0)
+        np.random.seed(0)
+        torch.manual_seed(0)
+        cache.get(torch_world, (8, 6), {"scale": 2.0}, seed=3)
+        after_get = draw_rngs()
+        random.seed(0)
+        np.random.seed(0)
+        torch.manual_seed(0)
+        assert after_get == draw_rngs()
+
+
+def test_lru_eviction(tmp_path):
+    entry_bytes = 8 * 64 * 64
+    cache = WorldCache(str(tmp_path), max_bytes=int(2.5 * entry_bytes))
+    cache.get(numpy_world, (64, 64), {"scale": 1.0}, seed=0)
+    time.sleep(0.01)
+    cache.get(numpy_world, (64, 64), {"scale": 1.0}, seed=1)
+    time.sleep(0.01)
+    cache.get(numpy_world, (64, 64), {"scale": 1.0}, seed=0)  # hit, now the most recently used
+    time.sleep(0.01)
+    cache.get(numpy_world, (64, 64), {"scale": 1.0}, seed=2)
+
+    keys = {key for key, _, _ in cache.entries()}
+    assert keys == {cache.key(numpy_world, (64, 64), {"scale": 1.0}, seed) for seed in (0, 2)}
+    assert sum(n_bytes for _, _, n_bytes in cache.entries()) <= cache.max_bytes
+
+
+def test_rejects_non_json_params(tmp_path):
+    cache = WorldCache(str(tmp_path))
+    with pytest.raises(ValueError):
+        cache.get(numpy_world, (8, 6), {"scale": 2.0, "mask": object()}, seed=3)